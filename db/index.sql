@@ -0,0 +1,8 @@
+/*
+        生成电子书时按以下条件筛选、排序答案，为其建立对应索引
+        该文件在每次启动时都会执行，新增索引时务必使用IF NOT EXISTS
+*/
+CREATE INDEX IF NOT EXISTS AnswerQuestionAgree ON Answer (question_id, agree);
+CREATE INDEX IF NOT EXISTS AnswerAuthorAgree ON Answer (author_id, agree);
+CREATE INDEX IF NOT EXISTS AnswerEditDate ON Answer (edit_date);
+CREATE INDEX IF NOT EXISTS ArticleColumnPublishDate ON Article (column_id, publish_date);
@@ -20,6 +20,9 @@ CREATE TABLE Answer (
 
   agree          INT(8)        NOT NULL    DEFAULT 0,
   content        longtext      NOT NULL    DEFAULT '',
+  content_format INT(1)        NOT NULL    DEFAULT 0,
+  content_length INT(8)                    DEFAULT NULL,
+  fingerprint    VARCHAR(32)   NOT NULL    DEFAULT '',
   question_id    INT(8)        NOT NULL    DEFAULT 0,
   answer_id      INT(8)        NOT NULL    DEFAULT 0,
   commit_date    DATE          NOT NULL    DEFAULT '2000-01-01',
@@ -130,6 +133,9 @@ CREATE TABLE Article (
   title        VARCHAR(2000) NOT NULL    DEFAULT '',
   title_image  VARCHAR(255)  NOT NULL    DEFAULT '',
   content      longtext      NOT NULL    DEFAULT '',
+  content_format INT(1)      NOT NULL    DEFAULT 0,
+  content_length INT(8)                  DEFAULT NULL,
+  fingerprint  VARCHAR(32)   NOT NULL    DEFAULT '',
   comment      INT(20)       NOT NULL    DEFAULT 0,
   agree        INT(20)       NOT NULL    DEFAULT 0,
   publish_date DATE          NOT NULL    DEFAULT '2000-01-01',
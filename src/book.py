@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
-import copy
-
 from src.container.initialbook import HtmlBookPackage
 from src.container.image import ImageContainer
+from src.container.page import Page
 from src.lib.epub.epub import Epub
 from src.tools.config import Config
 from src.tools.html_creator import HtmlCreator
+from src.tools.image_pool import ImagePool
 from src.tools.match import Match
+from src.tools.metrics import Metrics
+from src.tools.page_cache import PageCache
 from src.tools.path import Path
 from src.tools.template_config import TemplateConfig
 from src.tools.type import Type
@@ -18,9 +20,11 @@ class Book(object):
     """
 
     def __init__(self, raw_sql_book_list):
+        u"""
+        此处只读取答案的元数据并完成分卷，正文在create中逐卷读取、渲染
+        """
         raw_book_list = [book.catch_data() for book in self.flatten(raw_sql_book_list)]
-        book_list = self.volume_book(raw_book_list)
-        self.book_list = [self.create_book_package(book) for book in book_list]
+        self.book_list = self.volume_book(raw_book_list)
         return
 
     @staticmethod
@@ -33,48 +37,55 @@ class Book(object):
 
     @staticmethod
     def volume_book(raw_book_list):
-        def split(raw_book, surplus, index=1):
-            if (raw_book.epub.answer_count <= surplus) or (raw_book.epub.article_count <= 1):
-                raw_book.epub.split_index = index
-                return [raw_book]
-            article_list = []
-            while surplus > 0:
-                article = raw_book.article_list[0]
-                raw_book.article_list = raw_book.article_list[1:]
-                article_list.append(article)
-                surplus -= article['answer_count']
-                raw_book.epub.answer_count -= article['answer_count']
-            book = copy.deepcopy(raw_book)
-            book.set_article_list(article_list)
-            book.epub.split_index = index
-            return [book] + split(raw_book, Config.max_answer, index + 1)
-
-        counter = 0
+        u"""
+        按Config.max_answer对电子书进行分卷
+        答案数不足max_answer的书依次并入当前分卷，达到或超过max_answer的书按split_book切分，
+        切分出的每一卷（除最后一卷外）都会结束当前分卷
+        """
         book = []
         book_list = []
-        raw_book_list.reverse()  # 后边要使用pop，所以提前反转一下，以保证顺序不变
-        while len(raw_book_list):
-            raw_book = raw_book_list.pop()
+        for raw_book in raw_book_list:
             if not raw_book.epub.answer_count:
                 # 若书中没有答案则直接跳过
                 continue
-            if (counter + raw_book.epub.answer_count) < Config.max_answer:
-                book.append(raw_book)
-            elif (counter + raw_book.epub.answer_count) == Config.max_answer:
+            if raw_book.epub.answer_count < Config.max_answer:
                 book.append(raw_book)
+                continue
+            split_list = Book.split_book(raw_book, Config.max_answer)
+            for split_book in split_list[:-1]:
+                book.append(split_book)
                 book_list.append(book)
                 book = []
-                counter = 0
-            elif (counter + raw_book.epub.answer_count) > Config.max_answer:
-                split_list = split(raw_book, Config.max_answer - counter)
-                book.append(split_list[0])
+            book.append(split_list[-1])
+            if split_list[-1].epub.answer_count >= Config.max_answer:
                 book_list.append(book)
                 book = []
-                counter = 0
-                raw_book_list = split_list[1:] + raw_book_list
         book_list.append(book)
         return book_list
 
+    @staticmethod
+    def split_book(raw_book, max_answer):
+        u"""
+        将raw_book按max_answer切分为多卷
+        只记录每卷在article_list中的起止位置，一次遍历完成切分，各卷均为raw_book的浅拷贝
+        """
+        if (raw_book.epub.answer_count <= max_answer) or (raw_book.epub.article_count <= 1):
+            if raw_book.epub.answer_count > max_answer:
+                raw_book.epub.split_index = 1
+            return [raw_book]
+        split_list = []
+        start = 0
+        counter = 0
+        for index, article in enumerate(raw_book.article_list):
+            counter += article['answer_count']
+            if counter >= max_answer:
+                split_list.append(raw_book.create_volume(start, index + 1, len(split_list) + 1))
+                start = index + 1
+                counter = 0
+        if start < len(raw_book.article_list):
+            split_list.append(raw_book.create_volume(start, len(raw_book.article_list), len(split_list) + 1))
+        return split_list
+
     def book_to_html(self, book, index, creator):
         if book.epub.split_index:
             book.epub.title += "_({})".format(book.epub.split_index)
@@ -83,14 +94,65 @@ class Book(object):
 
         page = creator.create_info_page(book)
         book.page_list.append(page)
-        for article in book.article_list:
-            if book.kind in Type.article_type_list:
-                page = creator.create_article(article, index)
-            else:
-                page = creator.create_question(article, index)
-            book.page_list.append(page)
+        template_version = PageCache.get_template_version()
+        key_list = [self.get_cache_key(book, article, template_version) for article in book.article_list]
+        cache = PageCache.get_batch(key_list)
+        with Metrics.timer('book.catch_content'):
+            # 只为需要重新渲染的页面读取正文
+            book.catch_content([article for (article, key) in zip(book.article_list, key_list) if key not in cache])
+        with Metrics.timer('html.render'):
+            for (article, key) in zip(book.article_list, key_list):
+                if key in cache:
+                    page = self.create_cached_page(book, article, index, cache[key], creator)
+                else:
+                    page = self.render_page(book, article, index, key, creator)
+                book.page_list.append(page)
+        PageCache.commit()
+        book.release_content()
         return book
 
+    @staticmethod
+    def get_cache_key(book, article, template_version):
+        if book.kind in Type.article_type_list:
+            return PageCache.get_key('article', article['article_id'], [article], template_version)
+        question = article['question']
+        return PageCache.get_key('question', question['question_id'], [question] + article['answer_list'],
+                                 template_version)
+
+    @staticmethod
+    def render_page(book, article, index, key, creator):
+        u"""
+        渲染页面并写入缓存，页面中的图片先记录在单独的ImageContainer中，以便与页面一同缓存
+        """
+        page_creator = HtmlCreator(ImageContainer())
+        if book.kind in Type.article_type_list:
+            page = page_creator.create_article(article, index)
+        else:
+            page = page_creator.create_question(article, index)
+        href_list = page_creator.image_container.get_href_list()
+        for href in href_list:
+            creator.image_container.add(href)
+        PageCache.put(key, page.content, href_list)
+        return page
+
+    @staticmethod
+    def create_cached_page(book, article, index, cache, creator):
+        u"""
+        以缓存的渲染结果生成页面，文件名与标题的规则与HtmlCreator.create_question/create_article一致
+        """
+        content, href_list = cache
+        for href in href_list:
+            creator.image_container.add(href)
+        if book.kind in Type.article_type_list:
+            item, item_id = article, article['article_id']
+        else:
+            item, item_id = article['question'], article['question']['question_id']
+        page = Page()
+        page.content = content
+        page.filename = str(index) + '_' + str(item_id) + '.xhtml'
+        page.title = item['title']
+        return page
+
     def create_book_package(self, book_list):
         index = 0
         epub_book_list = []
@@ -108,17 +170,23 @@ class Book(object):
         return book_package
 
     def create_book(self, book_package):
-        book_package.image_container.set_save_path(Path.image_pool_path)
+        u"""
+        *   返回
+            *   生成的电子书文件名列表
+        """
         book_package.image_container.start_download()
+        image_map = book_package.image_container.get_image_map()
+        for book in book_package.book_list:
+            for page in book.page_list:
+                page.content = HtmlCreator.replace_image_filename(page.content, image_map)
         title = book_package.get_title()
         if not title:
             # 电子书题目为空时自动跳过
             # 否则会发生『rm -rf / 』的惨剧
-            return
+            return []
         Path.chdir(Path.base_path + u'/知乎电子书临时资源库/')
         epub = Epub(title)
         html_tmp_path = Path.html_pool_path + u'/'
-        image_tmp_path = Path.image_pool_path + u'/'
         epub.set_creator(u'ZhihuHelp1.7.0')
         epub.set_language(u'zh')
         epub.set_book_id()
@@ -139,18 +207,27 @@ class Book(object):
                     html.write(page.content)
                 epub.add_html(html_tmp_path + page.filename, page.title)
             epub.finish_chapter()
-        for image in book_package.image_list:
-            epub.add_image(image_tmp_path + image['filename'])
-        epub.create()
+        # 内容相同的图片在电子书中只保留一份
+        image_list = sorted(set(image_map.values()))
+        for filename in image_list:
+            epub.add_image(ImagePool.get_path(filename))
+        with Metrics.timer('epub.create'):
+            epub.create()
         Path.reset_path()
-        return
+        ImagePool.touch(image_list)
+        ImagePool.evict()
+        return [title + u'.epub']
 
     def create_single_html_book(self, book_package):
+        u"""
+        *   返回
+            *   生成的网页版目录名列表
+        """
         title = book_package.get_title()
         if not title:
             # 电子书题目为空时自动跳过
             # 否则会发生『rm -rf / 』的惨剧
-            return
+            return []
         Path.reset_path()
         Path.chdir(Path.result_path)
         Path.rmdir(u'./' + title)
@@ -169,10 +246,18 @@ class Book(object):
         Path.copy(Path.www_css + u'/markdown.css', u'./markdown.css')
         Path.copy(Path.www_css + u'/normalize.css', u'./normalize.css')
         Path.reset_path()
-        return
+        return [title]
 
     def create(self):
-        for book_package in self.book_list:
-            self.create_book(book_package)
-            self.create_single_html_book(book_package)
-        return
+        u"""
+        *   返回
+            *   Path.result_path下生成的文件名列表，包括各卷电子书与网页版目录
+        """
+        result_list = []
+        for book in self.book_list:
+            # 逐卷渲染，当前卷生成完毕后即可释放其页面内容
+            book_package = self.create_book_package(book)
+            result_list += self.create_book(book_package)
+            result_list += self.create_single_html_book(book_package)
+        PageCache.evict()
+        return result_list
@@ -1,25 +1,28 @@
 # -*- coding: utf-8 -*-
 import hashlib
-import os.path
+import os
+import threading
+from multiprocessing.dummy import Pool as ThreadPool
 
 from src.tools.config import Config
 from src.tools.controler import Control
 from src.tools.debug import Debug
 from src.tools.extra_tools import ExtraTools
 from src.tools.http import Http
+from src.tools.image_pool import ImagePool
+from src.tools.metrics import Metrics
 
 
 class ImageContainer(object):
-    def __init__(self, save_path=''):
-        self.save_path = save_path
+    prefetch_pool = None  # 预下载图片所用的线程池，首次预下载时创建，与抓取网页的线程池互不占用
+    prefetch_task = {}  # 图片地址 => 尚未完成的预下载任务，任务结束后即移除
+    prefetch_lock = threading.Lock()
+
+    def __init__(self):
         self.container = {}
         self.md5 = hashlib.md5()
         return
 
-    def set_save_path(self, save_path):
-        self.save_path = save_path
-        return
-
     def add(self, href):
         self.container[href] = self.create_image(href)
         return self.get_filename(href)
@@ -37,19 +40,25 @@ class ImageContainer(object):
     def get_filename_list(self):
         return self.container.values()
 
+    def get_href_list(self):
+        return self.container.keys()
+
+    def get_image_map(self):
+        u"""
+        下载完成后，返回 页面中引用的文件名 => 图片池中的实际文件名，内容相同的图片对应同一个文件
+        未能下载的图片保持原文件名
+        """
+        image_map = {}
+        for image in self.container.values():
+            image_map[image['filename']] = ImagePool.resolve(image['filename']) or image['filename']
+        return image_map
+
     def download(self, index):
         image = self.container[index]
-        filename = image['filename']
-        href = image['href']
-
-        if os.path.isfile(self.save_path + '/' + filename):
-            return
-        Debug.print_in_single_line(u'开始下载图片{}'.format(href))
-        content = Http.get_content(url=href, timeout=Config.timeout_download_picture)
-        if not content:
-            return
-        with open(self.save_path + '/' + filename, 'wb') as image:
-            image.write(content)
+        with Metrics.timer('image.download'):
+            # 预下载尚未完成时先等待，避免把写了一半的图片当作已下载
+            ImageContainer.wait_prefetch(image['href'])
+            ImageContainer.save_image(image['href'], image['filename'])
         return
 
     def start_download(self):
@@ -62,6 +71,73 @@ class ImageContainer(object):
         image = {'filename': self.create_filename(href), 'href': href}
         return image
 
-    def create_filename(self, href):
+    @staticmethod
+    def create_filename(href):
         filename = ExtraTools.md5(href) + '.jpg'
         return filename
+
+    @staticmethod
+    def save_image(href, filename):
+        if ImagePool.contains(filename):
+            return
+        Debug.print_in_single_line(u'开始下载图片{}'.format(href))
+        # 先下载至临时文件，中断后可以续传，完成后再由图片池按内容去重后移入
+        file_path = ImagePool.get_path(filename) + '.part'
+        with Metrics.timer('image.fetch'):
+            succeed = Http.download(href, file_path, timeout=Config.timeout_download_picture)
+        if not succeed:
+            Metrics.count('image.failed')
+            return
+        Metrics.count('image.fetched')
+        Metrics.count('image.bytes', os.path.getsize(file_path))
+        ImagePool.add_file(filename, file_path)
+        return
+
+    @staticmethod
+    def prefetch(href_list):
+        u"""
+        在解析网页时即开始在后台将图片下载至图片池
+        *   生成电子书时，ImageContainer.download会等待对应的预下载完成，失败的图片会在那时重新下载
+        """
+        if not Config.prefetch_image:
+            return
+        with ImageContainer.prefetch_lock:
+            if not ImageContainer.prefetch_pool:
+                ImageContainer.prefetch_pool = ThreadPool(Config.max_thread)
+            for href in href_list:
+                if href in ImageContainer.prefetch_task:
+                    continue
+                ImageContainer.prefetch_task[href] = ImageContainer.prefetch_pool.apply_async(
+                    ImageContainer.prefetch_image, (href,))
+        return
+
+    @staticmethod
+    def prefetch_image(href):
+        try:
+            ImageContainer.save_image(href, ImageContainer.create_filename(href))
+        finally:
+            # 图片已存入图片池(或下载失败)，不再需要等待，移除任务以免长时间运行时不断累积
+            with ImageContainer.prefetch_lock:
+                ImageContainer.prefetch_task.pop(href, None)
+        return
+
+    @staticmethod
+    def finish_prefetch():
+        u"""
+        等待所有预下载完成并关闭线程池
+        *   worker进程不生成电子书，退出前需调用，否则下载到一半的图片会随进程退出而中断
+        """
+        with ImageContainer.prefetch_lock:
+            prefetch_pool, ImageContainer.prefetch_pool = ImageContainer.prefetch_pool, None
+        if prefetch_pool:
+            prefetch_pool.close()
+            prefetch_pool.join()
+        return
+
+    @staticmethod
+    def wait_prefetch(href):
+        with ImageContainer.prefetch_lock:
+            task = ImageContainer.prefetch_task.get(href)
+        if task:
+            task.wait()
+        return
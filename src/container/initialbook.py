@@ -1,22 +1,142 @@
 # -*- coding: utf-8 -*-
+import itertools
+
 from src.container.image import ImageContainer
 from src.tools.config import Config
+from src.tools.content_compressor import ContentCompressor
 from src.tools.db import DB
+from src.tools.debug import Debug
 from src.tools.extra_tools import ExtraTools
 from src.tools.match import Match
+from src.tools.search_index import SearchIndex
 from src.tools.type import Type
 
 
 class InitialBook(object):
     class Sql(object):
+        # 生成电子书时为答案/文章附加的扩展字段
+        extra_column = ('char_count', 'agree_count', 'update_date', 'answer_count',)
+        content_batch_size = 500  # 单条sql中最多绑定的href数，sqlite默认上限为999
+
+        # Config中的排序字段 => sql中的排序表达式，未知字段给出提示后按agree_count排序
+        # char_count为正文的字符数，旧数据没有content_length时length(content)对文本同样按字符计算
+        answer_order_column = {
+            'agree_count': 'Answer.agree',
+            'update_date': 'Answer.edit_date',
+            'char_count': 'ifnull(Answer.content_length, length(Answer.content))',
+        }
+        question_order_column = {
+            'agree_count': 'QuestionStat.agree_count',
+            'char_count': 'QuestionStat.char_count',
+            'answer_count': 'QuestionStat.answer_count',
+            'answer_id': 'QuestionStat.answer_id',
+        }
+        article_order_column = {
+            'agree_count': 'Article.agree',
+            'update_date': 'Article.publish_date',
+            'char_count': 'ifnull(Article.content_length, length(Article.content))',
+        }
+
         def __init__(self):
-            self.question = ''
-            self.answer = ''
+            self.answer = ''  # 用于筛选Answer/Article的where条件
             self.info = ''
+            self.search = ''  # search指令的关键词，不为空时只从全文索引的匹配结果中筛选
             return
 
-        def get_answer_sql(self):
-            return self.answer + Config.sql_extend_answer_filter
+        @staticmethod
+        def get_meta_column(table_name):
+            u"""
+            生成电子书时先只读取用于排序、分卷的字段，content在渲染对应分卷时再按href读取
+            """
+            return tuple(x for x in DB.get_column_list(table_name) if x != 'content')
+
+        @staticmethod
+        def get_order(order_column, order_by, desc, name=''):
+            u"""
+            *   name
+                *   order_by对应的配置项名，用于提示配置有误
+            """
+            if order_by not in order_column:
+                Debug.logger.info(u'配置项{}的值{}无效，可选值为{}，已按agree_count排序'.format(
+                    name, order_by, u'|'.join(sorted(order_column))))
+            column = order_column.get(order_by, order_column['agree_count'])
+            return '{} {}'.format(column, 'desc' if desc else 'asc')
+
+        def get_answer_sql(self, table):
+            u"""
+            将Config中的筛选条件编译为参数化的sql
+            *   返回
+                *   sql, 参数列表
+            """
+            date_column = 'publish_date' if table == 'Article' else 'edit_date'
+            source = table
+            condition_list = ['1']
+            parameter_list = []
+            if self.search:
+                source = SearchIndex.get_search_source(table, self.search)
+            if self.answer:
+                condition_list.append('({})'.format(self.answer))
+            if Config.answer_min_agree:
+                condition_list.append('agree >= ?')
+                parameter_list.append(Config.answer_min_agree)
+            if Config.answer_start_date:
+                condition_list.append('{} >= ?'.format(date_column))
+                parameter_list.append(Config.answer_start_date)
+            if Config.answer_end_date:
+                condition_list.append('{} <= ?'.format(date_column))
+                parameter_list.append(Config.answer_end_date)
+            if (table == 'Answer') and (not Config.show_private_answer):
+                condition_list.append('no_record_flag = 0')
+            sql = 'select * from {} as {} where {}'.format(source, table, ' and '.join(condition_list))
+            # sql_extend_answer_filter为旧版的自定义筛选语句，为兼容原有配置文件继续保留
+            return sql + Config.sql_extend_answer_filter, parameter_list
+
+        def get_question_sql(self, kind):
+            u"""
+            一次查出所有答案及其所属问题，结果已按问题、答案排好序，同一问题下的答案相邻
+            """
+            answer_sql, parameter_list = self.get_answer_sql('Answer')
+            column = ','.join(['Answer.' + x for x in self.get_meta_column('Answer')] +
+                              ['ifnull(Answer.content_length, length(Answer.content)) as char_count'] +
+                              ['Question.' + x for x in DB.get_column_list('Question')])
+            stat_column = ''
+            if kind == Type.search:
+                # 问题按其中最相关的答案排序，问题内的答案按相关度排序
+                stat_column = ', min(search_rank) as search_rank'
+                order_list = ['QuestionStat.search_rank asc', 'Answer.question_id', 'Answer.search_rank asc']
+            elif kind == Type.author:
+                desc = Config.author_answer_order_by_desc
+                order_list = [
+                    self.get_order(InitialBook.Sql.question_order_column, Config.author_answer_order_by, desc,
+                                   'author_answer_order_by'),
+                    self.get_order(InitialBook.Sql.question_order_column, 'answer_id', desc),
+                    'Answer.question_id',
+                    'Answer.answer_id',
+                ]
+            else:
+                order_list = [
+                    self.get_order(InitialBook.Sql.question_order_column, Config.question_order_by,
+                                   Config.question_order_by_desc, 'question_order_by'),
+                    'Answer.question_id',
+                    self.get_order(InitialBook.Sql.answer_order_column, Config.answer_order_by,
+                                   Config.answer_order_by_desc, 'answer_order_by'),
+                ]
+            sql = 'select {column} from ({answer}) as Answer join Question on Question.question_id = Answer.question_id join (select question_id, sum(agree) as agree_count, sum(ifnull(content_length, length(content))) as char_count, count(*) as answer_count, max(answer_id) as answer_id{stat_column} from ({answer}) group by question_id) as QuestionStat on QuestionStat.question_id = Answer.question_id order by {order}'.format(
+                column=column, answer=answer_sql, stat_column=stat_column, order=', '.join(order_list))
+            return sql, parameter_list * 2
+
+        def get_article_sql(self):
+            answer_sql, parameter_list = self.get_answer_sql('Article')
+            column = ','.join(['Article.' + x for x in self.get_meta_column('Article')] +
+                              ['ifnull(Article.content_length, length(Article.content)) as char_count'])
+            if self.search:
+                order = 'Article.search_rank asc'
+            else:
+                order = self.get_order(InitialBook.Sql.article_order_column, Config.article_order_by,
+                                       Config.article_order_by_desc, 'article_order_by')
+            sql = 'select {column} from ({answer}) as Article order by {order}, Article.article_id'.format(
+                column=column, answer=answer_sql, order=order)
+            return sql, parameter_list
 
     class Epub(object):
         def __init__(self):
@@ -44,10 +164,10 @@ class InitialBook(object):
     def catch_data(self):
         u"""
         从数据库中获取数据
+        排序与筛选均已在sql中完成
         """
         self.catch_info()
         self.get_article_list()
-        self.__sort()
         return self
 
     def catch_info(self):
@@ -58,22 +178,19 @@ class InitialBook(object):
             elif self.kind == Type.article:
                 info = self.catch_article_book_info(self.sql.info)
             else:
-                info = DB.cursor.execute(self.sql.info).fetchone()
-                info = DB.wrap(Type.info_table[self.kind], info)
+                info = DB.get_record_list(self.sql.info, Type.table_name[Type.info_table[self.kind]])[0]
         self.set_info(info)
         return
 
     def catch_question_book_info(self, sql):
-        info_list = DB.cursor.execute(self.sql.info).fetchall()
-        info_list = [DB.wrap(Type.question, item) for item in info_list]
+        info_list = DB.get_record_list(self.sql.info, Type.table_name[Type.question])
         info = {}
         info['title'] = '_'.join([str(item['title']) for item in info_list])
         info['id'] = '_'.join([str(item['question_id']) for item in info_list])
         return info
 
     def catch_article_book_info(self, sql):
-        info_list = DB.cursor.execute(self.sql.info).fetchall()
-        info_list = [DB.wrap(Type.article, item) for item in info_list]
+        info_list = DB.get_record_list(self.sql.info, Type.table_name[Type.article])
         info = {}
         info['title'] = '_'.join([str(item['title']) for item in info_list])
         info['id'] = '_'.join([str(item['article_id']) for item in info_list])
@@ -103,6 +220,12 @@ class InitialBook(object):
         if self.kind == Type.column:
             self.epub.title = u'专栏_{}({})'.format(info['name'], info['column_id'])
             self.epub.id = info['column_id']
+        if self.kind == Type.search:
+            self.epub.title = u'回答搜索_{}'.format(self.info['title'])
+            self.epub.id = u'search_{}'.format(self.info['id'])
+        if self.kind == Type.search_article:
+            self.epub.title = u'文章搜索_{}'.format(self.info['title'])
+            self.epub.id = u'search_article_{}'.format(self.info['id'])
         self.epub.title = Match.fix_filename(self.epub.title)
         return
 
@@ -115,45 +238,90 @@ class InitialBook(object):
         return
 
     def __get_question_list(self):
-        question_list = [DB.wrap('question', x) for x in DB.get_result_list(self.sql.question)]
-        answer_list = [DB.wrap('answer', x) for x in DB.get_result_list(self.sql.get_answer_sql())]
-
-        def merge_answer_into_question():
-            question_dict = {x['question_id']: {'question': x.copy(), 'answer_list': [], 'agree': 0} for x in
-                             question_list}
-            for answer in answer_list:
-                question_dict[answer['question_id']]['answer_list'].append(answer)
-            return question_dict.values()
-
-        def add_property(question):
-            agree_count = 0
-            char_count = 0
-            for answer in question['answer_list']:
-                answer['char_count'] = len(answer['content'])
-                answer['agree_count'] = answer['agree']
-                answer['update_date'] = answer['edit_date']
-                agree_count += answer['agree']
-                char_count += answer['char_count']
-            question['answer_count'] = len(question['answer_list'])
-            question['agree_count'] = agree_count
-            question['char_count'] = char_count
+        answer_column = InitialBook.Sql.get_meta_column('Answer') + ('char_count',)
+        answer_record = DB.get_record_type('Answer', InitialBook.Sql.extra_column)
+        question_record = DB.get_record_type('Question')
+        question_id_index = answer_column.index('question_id')
+
+        def create_question(row_list):
+            answer_list = []
+            for row in row_list:
+                answer = answer_record(row, answer_column)
+                answer.agree_count = answer.agree
+                answer.update_date = answer.edit_date
+                answer_list.append(answer)
+            question = {
+                'question': question_record(row[len(answer_column):]),
+                'answer_list': answer_list,
+                'answer_count': len(answer_list),
+                'agree_count': sum(answer.agree for answer in answer_list),
+                'char_count': sum(answer.char_count for answer in answer_list),
+            }
             return question
 
-        question_list = [add_property(x) for x in merge_answer_into_question() if len(x['answer_list'])]
+        sql, parameter_list = self.sql.get_question_sql(self.kind)
+        result = DB.get_result_iterator(sql, parameter_list)
+        question_list = [create_question(row_list) for (_, row_list) in
+                         itertools.groupby(result, key=lambda row: row[question_id_index])]
         return question_list
 
     def __get_article_list(self):
-        def add_property(article):
-            article['char_count'] = len(article['content'])
-            article['agree_count'] = article['agree']
-            article['update_date'] = article['publish_date']
-            article['answer_count'] = 1
+        column = InitialBook.Sql.get_meta_column('Article') + ('char_count',)
+        article_record = DB.get_record_type('Article', InitialBook.Sql.extra_column)
+
+        def create_article(row):
+            article = article_record(row, column)
+            article.agree_count = article.agree
+            article.update_date = article.publish_date
+            article.answer_count = 1
             return article
 
-        article_list = [DB.wrap(Type.article, x) for x in DB.get_result_list(self.sql.get_answer_sql())]
-        article_list = [add_property(x) for x in article_list]
+        sql, parameter_list = self.sql.get_article_sql()
+        article_list = [create_article(row) for row in DB.get_result_iterator(sql, parameter_list)]
         return article_list
 
+    def get_content_item_list(self, article_list=None):
+        u"""
+        返回本书中所有需要填充content的答案/文章
+        *   article_list
+            *   只返回其中的答案/文章，默认为全书
+        """
+        if article_list is None:
+            article_list = self.article_list
+        if self.kind in Type.article_type_list:
+            return article_list
+        item_list = []
+        for question in article_list:
+            item_list += question['answer_list']
+        return item_list
+
+    def catch_content(self, article_list=None):
+        u"""
+        按href分批读取本书（分卷）内答案/文章的正文
+        *   article_list
+            *   只读取其中的答案/文章，默认为全书，已有渲染缓存的页面不必读取正文
+        """
+        table = 'Article' if self.kind in Type.article_type_list else 'Answer'
+        item_list = self.get_content_item_list(article_list)
+        batch_size = InitialBook.Sql.content_batch_size
+        for start in range(0, len(item_list), batch_size):
+            batch = {item['href']: item for item in item_list[start:start + batch_size]}
+            sql = 'select href, content, content_format from {} where href in ({})'.format(
+                table, ','.join('?' * len(batch)))
+            for href, content, content_format in DB.cursor.execute(sql, tuple(batch.keys())):
+                batch[href]['content'] = ContentCompressor.decode(content, content_format)
+        for item in item_list:
+            item.setdefault('content', '')
+        return
+
+    def release_content(self):
+        u"""
+        分卷渲染完成后释放正文，保证内存中最多只保留一卷的正文
+        """
+        for item in self.get_content_item_list():
+            item.pop('content', None)
+        return
+
     def set_article_list(self, article_list):
         self.clear_property()
         for article in article_list:
@@ -164,6 +332,23 @@ class InitialBook(object):
         self.article_list = article_list
         return
 
+    def create_volume(self, start, end, split_index):
+        u"""
+        以article_list[start:end]生成一个分卷
+        分卷与原书共用kind/sql/info，只复制epub信息，不复制答案数据
+        """
+        volume = InitialBook()
+        volume.kind = self.kind
+        volume.sql = self.sql
+        volume.info = self.info
+        volume.prefix = self.prefix
+        volume.epub.title = self.epub.title
+        volume.epub.id = self.epub.id
+        volume.epub.prefix = self.epub.prefix
+        volume.set_article_list(self.article_list[start:end])
+        volume.epub.split_index = split_index
+        return volume
+
     def clear_property(self):
         self.epub.answer_count = 0
         self.epub.agree_count = 0
@@ -171,36 +356,6 @@ class InitialBook(object):
         self.epub.article_count = 0
         return
 
-    def __sort(self):
-        if self.kind in Type.article_type_list:
-            self.sort_article()
-        elif self.kind == Type.author:
-            self.sort_author_answer()
-        else:
-            self.sort_question()
-        return
-
-    def sort_author_answer(self):
-        if Config.author_answer_order_by == 'answer_id':
-            self.article_list.sort(key=lambda x: x['answer_list'][0][Config.author_answer_order_by], reverse=Config.author_answer_order_by_desc)
-        else:
-            self.article_list.sort(key=lambda x: (x['answer_list'][0][Config.author_answer_order_by], x['answer_list'][0]['answer_id']), reverse=Config.author_answer_order_by_desc)
-        return
-
-    def sort_article(self):
-        self.article_list.sort(key=lambda x: x[Config.article_order_by], reverse=Config.article_order_by_desc)
-        return
-
-    def sort_question(self):
-        def sort_answer(answer_list):
-            answer_list.sort(key=lambda x: x[Config.answer_order_by], reverse=Config.answer_order_by_desc)
-            return
-
-        self.article_list.sort(key=lambda x: x[Config.question_order_by], reverse=Config.question_order_by_desc)
-        for item in self.article_list:
-            sort_answer(item['answer_list'])
-        return
-
 
 class HtmlBookPackage(object):
     def __init__(self):
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+class Record(object):
+    u"""
+    数据库中的一行记录
+    *   字段由DB.get_record_type按数据库表结构生成，使用__slots__存储，比逐行生成dict更省内存
+    *   支持record['key']形式的读写，可直接用于template.format(**record)与dict.update(record)
+    *   未赋值的字段视为不存在，keys()中不会出现
+    """
+    __slots__ = ()
+    column_list = ()  # 表中的原始字段，__slots__中其余字段为生成电子书时附加的扩展字段
+
+    def __init__(self, row=(), column_list=None):
+        u"""
+        column_list为row中各值对应的字段名，默认与表结构一致（即select *的结果）
+        """
+        for (key, value) in zip(column_list or self.column_list, row):
+            setattr(self, key, value)
+        return
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+        return
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, dict(self))
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def get(self, key, default=None):
+        if key in self:
+            return getattr(self, key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            setattr(self, key, default)
+        return getattr(self, key)
+
+    def pop(self, key, default=None):
+        if key not in self:
+            return default
+        value = getattr(self, key)
+        delattr(self, key)
+        return value
@@ -28,9 +28,11 @@ class TaskPackage(object):
         return
 
     def add_task(self, single_task=SingleTask()):
-        if single_task.kind not in self.work_list:
-            self.work_list[single_task.kind] = []
-        self.work_list[single_task.kind].append(single_task.spider.href)
+        if single_task.spider.href:
+            # search等指令只需从数据库中生成电子书，没有待抓取的网址
+            if single_task.kind not in self.work_list:
+                self.work_list[single_task.kind] = []
+            self.work_list[single_task.kind].append(single_task.spider.href)
 
         if single_task.kind not in self.book_list:
             self.book_list[single_task.kind] = []
@@ -49,24 +51,22 @@ class TaskPackage(object):
     def merge_article_book_list(self):
         book_list = self.book_list[Type.article]
         book = InitialBook()
-        answer = [item.sql.answer for item in book_list]
+        answer = ['({})'.format(item.sql.answer) for item in book_list]
         info = [item.sql.info for item in book_list]
         book.kind = Type.article
         book.sql.info = 'select * from Article where ({})'.format(' or '.join(info))
-        book.sql.answer = 'select * from Article where ({})'.format(' or '.join(answer))
+        book.sql.answer = ' or '.join(answer)
         self.book_list[Type.article] = [book]
         return
 
     def merge_question_book_list(self, book_type):
         book_list = self.book_list[book_type]
         book = InitialBook()
-        question = [item.sql.question for item in book_list]
-        answer = [item.sql.answer for item in book_list]
+        answer = ['({})'.format(item.sql.answer) for item in book_list]
         info = [item.sql.info for item in book_list]
         book.kind = book_type
         book.sql.info = 'select * from Question where ({})'.format(' or '.join(info))
-        book.sql.question = 'select * from Question where ({})'.format(' or '.join(question))
-        book.sql.answer = 'select * from Answer where ({})'.format(' or '.join(answer))
+        book.sql.answer = ' or '.join(answer)
         self.book_list[book_type] = [book]
         return
 
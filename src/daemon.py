@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import BaseHTTPServer
+import Queue
+import SocketServer
+import collections
+import errno
+import json
+import os
+import re
+import stat
+import threading
+import time
+import traceback
+
+from src.tools.debug import Debug
+
+
+class Job(object):
+    u"""
+    一个电子书任务，对应ReadList.txt中的一行
+    *   status
+        *   queued/running/done/failed
+    """
+
+    def __init__(self, job_id, command):
+        self.id = job_id
+        self.command = command
+        self.status = 'queued'
+        self.submit_time = time.time()
+        self.start_time = None
+        self.finish_time = None
+        self.error = ''
+        self.result_list = []  # 生成的电子书文件名
+        return
+
+    def to_dict(self):
+        return {'id': self.id, 'command': self.command, 'status': self.status, 'submit_time': self.submit_time,
+                'start_time': self.start_time, 'finish_time': self.finish_time, 'error': self.error,
+                'result_list': self.result_list}
+
+
+class JobManager(object):
+    u"""
+    后台任务队列
+    *   任务在同一个专用线程中依次执行
+        *   生成电子书时会切换进程的工作目录，多本电子书不能同时生成，抓取本身仍由线程池并行完成
+        *   sqlite连接只能在创建它的线程中使用，数据库由init在该线程中打开，之后一直复用
+    *   等待中的任务超过max_queue个时拒绝新任务
+    *   已结束的任务只保留最近max_finished个，更早的任务信息被清除，查询时返回404
+    """
+
+    def __init__(self, run_job, init=None, max_queue=100, max_finished=100):
+        u"""
+        *   run_job
+            *   执行任务的函数，参数为Job，返回生成的文件列表
+        *   init
+            *   执行任务的线程启动时调用一次
+        """
+        self.run_job = run_job
+        self.init = init
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.lock = threading.Lock()
+        self.job_map = collections.OrderedDict()  # 任务id => Job，按提交顺序排列
+        self.last_job_id = 0
+        self.job_queue = Queue.Queue()
+        self.thread = None
+        return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.loop)
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def submit(self, command):
+        u"""
+        返回新建的Job，队列已满时返回None
+        """
+        with self.lock:
+            if self.job_queue.qsize() >= self.max_queue:
+                return None
+            self.last_job_id += 1
+            job = Job(self.last_job_id, command)
+            self.job_map[job.id] = job
+        self.job_queue.put(job)
+        Debug.logger.info(u'收到任务{}:{}'.format(job.id, command))
+        return job
+
+    def get_job(self, job_id):
+        with self.lock:
+            return self.job_map.get(job_id)
+
+    def get_job_list(self):
+        with self.lock:
+            return self.job_map.values()
+
+    def expire(self):
+        u"""
+        按提交顺序清除多余的已结束任务，等待中与执行中的任务不受影响
+        """
+        with self.lock:
+            finished_list = [job.id for job in self.job_map.values() if job.status in ('done', 'failed')]
+            for job_id in finished_list[:max(len(finished_list) - self.max_finished, 0)]:
+                del self.job_map[job_id]
+        return
+
+    def loop(self):
+        if self.init:
+            self.init()
+        while True:
+            job = self.job_queue.get()
+            job.status, job.start_time = 'running', time.time()
+            try:
+                job.result_list = self.run_job(job)
+            except Exception:
+                job.status, job.error = 'failed', traceback.format_exc().strip().split('\n')[-1]
+                Debug.logger.info(u'任务{}执行失败'.format(job.id))
+                Debug.logger.info(u'错误堆栈信息:{}'.format(traceback.format_exc()))
+            else:
+                job.status = 'done'
+            job.finish_time = time.time()
+            self.expire()
+        return
+
+
+class JobRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    u"""
+    任务接口，请求与返回均为json
+    *   POST /jobs
+        *   提交任务，请求内容为{"command": "ReadList.txt中的一行"}，返回202与任务信息，队列已满时返回503
+    *   GET /jobs
+        *   全部任务的信息，已结束的任务只包含最近的一部分
+    *   GET /jobs/任务id
+        *   单个任务的信息，status为queued/running/done/failed，result_list为生成的电子书
+    """
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/jobs':
+            self.send_json(200, [job.to_dict() for job in self.server.manager.get_job_list()])
+            return
+        result = re.match(r'^/jobs/(\d+)$', self.path)
+        job = self.server.manager.get_job(int(result.group(1))) if result else None
+        if not job:
+            self.send_json(404, {'error': 'job not found'})
+            return
+        self.send_json(200, job.to_dict())
+        return
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            command = data['command'].strip()
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json(400, {'error': 'request body should be {"command": "..."}'})
+            return
+        if not command:
+            self.send_json(400, {'error': 'command is empty'})
+            return
+        job = self.server.manager.submit(command)
+        if not job:
+            self.send_json(503, {'error': 'job queue is full'})
+            return
+        self.send_json(202, job.to_dict())
+        return
+
+    def send_json(self, code, data):
+        content = json.dumps(data)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        return
+
+    def address_string(self):
+        # 通过Unix socket访问时没有客户端地址
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        Debug.logger.debug(u'{} {}'.format(self.address_string(), format % args))
+        return
+
+
+class JobServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, manager):
+        BaseHTTPServer.HTTPServer.__init__(self, address, JobRequestHandler)
+        self.manager = manager
+        return
+
+
+class UnixJobServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, manager):
+        if os.path.lexists(path):
+            # 只清理上次运行遗留的socket文件，地址误填为普通文件/目录时拒绝启动，以免将其删除
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise OSError(errno.EEXIST, u'{} 已存在且不是Unix socket'.format(path), path)
+            os.remove(path)
+        SocketServer.UnixStreamServer.__init__(self, path, JobRequestHandler)
+        self.manager = manager
+        return
+
+
+def create_job_server(address, manager):
+    u"""
+    *   address
+        *   host:port时监听TCP端口，否则视为Unix socket的路径
+    """
+    result = re.match(r'^(?P<host>[^:/]*):(?P<port>\d+)$', address)
+    if result:
+        return JobServer((result.group('host'), int(result.group('port'))), manager)
+    return UnixJobServer(address, manager)
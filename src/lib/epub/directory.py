@@ -11,7 +11,7 @@ class Directory(Base):
 
     def add_html(self, src, title):
         template = self.get_template('directory', 'item_leaf')
-        self.content += template.format(href=Path.get_filename(src), title=title)
+        self.add_content(template.format(href=Path.get_filename(src), title=title))
         return
 
     def create_chapter(self, src, title):
@@ -20,7 +20,7 @@ class Directory(Base):
         if self.chapter_deep == 0:
             template = self.get_template('directory', 'chapter')
             item = template.format(item=item, title=u'目录')
-        self.content += item
+        self.add_content(item)
 
         self.chapter_deep += 1
         return
@@ -28,11 +28,12 @@ class Directory(Base):
     def finish_chapter(self):
         if self.chapter_deep == 1:
             template = self.get_template('directory', 'finish_chapter')
-            self.content += template
+            self.add_content(template)
 
         self.chapter_deep -= 1
         return
 
-    def get_content(self):
+    def write_content(self, output):
         template = self.get_template('directory', 'content')
-        return template.format(content=self.content)
+        self.write_template(output, template, content=self.content_list)
+        return
@@ -34,7 +34,7 @@ class Epub(object):
 
     def write_index(self):
         with open(EpubPath.html_path + u'/index.xhtml', 'w') as index:
-            index.write(self.directory.get_content())
+            self.directory.write_content(index)
         return
 
     def init_path(self):
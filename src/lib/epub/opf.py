@@ -31,10 +31,8 @@ class Metadata(Base):
         return
 
     def get_content(self):
-        for key in ['title', 'creator', 'book_id', 'cover', 'language']:
-            if hasattr(self, key):
-                self.content += getattr(self, key)
-        return self.content
+        return ''.join(getattr(self, key) for key in ['title', 'creator', 'book_id', 'cover', 'language'] if
+                       hasattr(self, key))
 
 
 class Manifest(Base):
@@ -65,36 +63,36 @@ class Manifest(Base):
 
     def add_item(self, resource_id, href, media_type):
         template = self.get_template('manifest', 'item')
-        self.content += template.format(resource_id=resource_id, href=href, media_type=media_type)
+        self.add_content(template.format(resource_id=resource_id, href=href, media_type=media_type))
         return
 
 
 class Spine(Base):
     def add_item(self, resource_id):
         template = self.get_template('spine', 'item')
-        self.content += template.format(resource_id=resource_id)
+        self.add_content(template.format(resource_id=resource_id))
         return
 
     def add_item_nolinear(self, resource_id):
         template = self.get_template('spine', 'item_nolinear')
-        self.content += template.format(resource_id=resource_id)
+        self.add_content(template.format(resource_id=resource_id))
         return
 
 
 class Guide(Base):
     def add_cover(self, href, title='Cover'):
         template = self.get_template('guide', 'item')
-        self.content += template.format(href=href, title=title, item_type='Cover')
+        self.add_content(template.format(href=href, title=title, item_type='Cover'))
         return
 
     def add_title_page(self, href, title='title_page'):
         template = self.get_template('guide', 'item')
-        self.content += template.format(href=href, title=title, item_type='title-page')
+        self.add_content(template.format(href=href, title=title, item_type='title-page'))
         return
 
     def add_index(self, href, title='index'):
         template = self.get_template('guide', 'item')
-        self.content += template.format(href=href, title=title, item_type='toc')
+        self.add_content(template.format(href=href, title=title, item_type='toc'))
         return
 
 
@@ -176,13 +174,12 @@ class OPF(Base):
     def create_content(self):
         content = {
             'metadata': self.metadata.get_content(),
-            'manifest': self.manifest.get_content(),
-            'spine': self.spine.get_content(),
-            'guide': self.guide.get_content(),
+            'manifest': self.manifest.content_list,
+            'spine': self.spine.content_list,
+            'guide': self.guide.content_list,
             'uid': self.uid,
         }
         template = self.get_template('opf', 'content')
-        content = template.format(**content)
         with open(EpubPath.oebps_path + u'/content.opf', 'w') as opf:
-            opf.write(content)
+            self.write_template(opf, template, **content)
         return
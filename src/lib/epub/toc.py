@@ -16,8 +16,7 @@ class Head(Base):
         return
 
     def get_content(self):
-        self.content = self.uid + self.depth
-        return self.content
+        return self.uid + self.depth
 
 
 class DocTitle(Base):
@@ -28,24 +27,40 @@ class DocTitle(Base):
 
 
 class Ncx(Base):
-    def create_item(self, resource_id, href, title, extend_nav_point=''):
-        template = self.get_template('ncx', 'item')
-        content = template.format(resource_id=resource_id, href=href, title=title, extend_nav_point=extend_nav_point)
-        return content
-
-    def add_item(self, resource_id, href, title, extend_nav_point=''):
-        content = self.create_item(resource_id, href, title, extend_nav_point=extend_nav_point)
-        self.content += content
-        return
+    u"""
+    目录项以树的形式记录，生成toc.ncx时再逐层写出
+    *   目录项: {resource_id, href, title, child_list}
+    """
 
     @staticmethod
-    def create_chapter_item(resource_id, href, title, extend_nav_point=''):
-        chapter = {
-            'chapter': dict(zip(('resource_id', 'href', 'title', 'extend_nav_point'),
-                                (resource_id, href, title, extend_nav_point))),
-            'content': ''
+    def create_item(resource_id, href, title):
+        item = {
+            'resource_id': resource_id,
+            'href': href,
+            'title': title,
+            'child_list': [],
         }
-        return chapter
+        return item
+
+    def add_item(self, item):
+        self.add_content(item)
+        return
+
+    def write_content(self, output):
+        u"""
+        模板以{extend_nav_point}为界分为首尾两段，子目录写在两段之间
+        """
+        head, tail = self.get_template('ncx', 'item').split('{extend_nav_point}')
+
+        def write_item_list(item_list):
+            for item in item_list:
+                output.write(head.format(**item))
+                write_item_list(item['child_list'])
+                output.write(tail)
+            return
+
+        write_item_list(self.content_list)
+        return
 
 
 class TOC(Base):
@@ -53,8 +68,7 @@ class TOC(Base):
         self.head = Head()
         self.doc_title = DocTitle()
         self.ncx = Ncx()
-        self.chapter_list = []
-        self.content = ''
+        self.chapter_list = []  # 尚未结束的章节
         self.metadata_completed = set()
         return
 
@@ -72,24 +86,30 @@ class TOC(Base):
         self.head.set_depth(depth)
         return
 
-    def add_item(self, resource_id, href, title, extend_nav_point=''):
+    def add_item(self, resource_id, href, title):
+        item = self.ncx.create_item(resource_id, href, title)
         if self.chapter_list:
-            self.chapter_list[-1]['content'] += self.ncx.create_item(resource_id, href, title)
+            self.chapter_list[-1]['child_list'].append(item)
         else:
-            self.ncx.add_item(resource_id, href, title, extend_nav_point)
+            self.ncx.add_item(item)
         return
 
     def create_chapter(self, resource_id, href, title):
-        chapter = self.ncx.create_chapter_item(resource_id, href, title)
-        self.chapter_list += [chapter]
+        u"""
+        章节在创建时即加入目录，之后添加的目录项都归入该章节，直到finish_chapter
+        """
+        chapter = self.ncx.create_item(resource_id, href, title)
+        if self.chapter_list:
+            self.chapter_list[-1]['child_list'].append(chapter)
+        else:
+            self.ncx.add_item(chapter)
+        self.chapter_list.append(chapter)
         return
 
     def finish_chapter(self):
         if not self.chapter_list:
             return
-        chapter = self.chapter_list.pop()
-        chapter['chapter']['extend_nav_point'] = chapter['content']
-        self.add_item(**(chapter['chapter']))
+        self.chapter_list.pop()
         return
 
     def create(self):
@@ -120,10 +140,9 @@ class TOC(Base):
         content = {
             'head': self.head.get_content(),
             'doc_title': self.doc_title.get_content(),
-            'nav_point': self.ncx.get_content(),
+            'nav_point': self.ncx.write_content,
         }
         template = self.get_template('toc', 'content')
-        content = template.format(**content)
         with open(EpubPath.oebps_path + u'/toc.ncx', 'w') as toc:
-            toc.write(content)
+            self.write_template(toc, template, **content)
         return
@@ -1,17 +1,51 @@
 # -*- coding: utf-8 -*-
+from string import Formatter
+
 from .epub_config import EpubConfig
 
 
 class Base(object):
+    u"""
+    目录、opf等文件的公共基类
+    *   条目先按顺序记录在content_list中，生成文件时一次性写出，避免反复拼接字符串
+    *   模板只从磁盘读取一次，之后直接使用缓存
+    """
+    template_cache = {}
+
     def __init__(self):
-        self.content = ''
+        self.content_list = []
         return
 
     def get_template(self, template_kind, template_name):
-        template_uri = '{}_{}_uri'.format(template_kind, template_name)
-        with open(getattr(EpubConfig, template_uri)) as template:
-            content = template.read()
-        return content
+        template_uri = getattr(EpubConfig, '{}_{}_uri'.format(template_kind, template_name))
+        if template_uri not in Base.template_cache:
+            with open(template_uri) as template:
+                Base.template_cache[template_uri] = template.read()
+        return Base.template_cache[template_uri]
+
+    def add_content(self, content):
+        self.content_list.append(content)
+        return
 
     def get_content(self):
-        return self.content
+        return ''.join(self.content_list)
+
+    @staticmethod
+    def write_template(output, template, **content):
+        u"""
+        按模板将内容直接写入文件
+        *   值为list的字段逐条写入，不再拼接成完整的字符串
+        *   值为函数的字段，以output为参数调用，由其自行写入
+        """
+        for (literal_text, field_name, format_spec, conversion) in Formatter().parse(template):
+            output.write(literal_text)
+            if field_name is None:
+                continue
+            value = content[field_name]
+            if isinstance(value, list):
+                output.writelines(value)
+            elif callable(value):
+                value(output)
+            else:
+                output.write(format(value, format_spec))
+        return
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from bs4 import BeautifulSoup
 from src.lib.zhihu_parser.content.simple_answer import SimpleAnswer
 from src.lib.zhihu_parser.content.simple_question import SimpleQuestion
 from src.lib.zhihu_parser.tools.parser_tools import ParserTools
@@ -7,7 +6,7 @@ from src.lib.zhihu_parser.tools.parser_tools import ParserTools
 
 class BaseParser(ParserTools):
     def __init__(self, content):
-        self.dom = BeautifulSoup(content, 'html.parser')
+        self.dom = self.create_dom(content)
         self.answer_parser = SimpleAnswer()
 
     def get_answer_dom_list(self):
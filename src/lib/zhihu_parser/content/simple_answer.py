@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from bs4 import BeautifulSoup
 from src.lib.zhihu_parser.content.answer import Answer
 from src.tools.debug import Debug
 from src.tools.match import Match
@@ -15,7 +14,7 @@ class SimpleAnswer(Answer):
             self.footer = dom.find('div', class_='zm-meta-panel')
             if self.body:
                 content = self.get_tag_content(self.body)
-                self.content = BeautifulSoup(Match.fix_html(content), 'html.parser')
+                self.content = self.create_dom(Match.fix_html(content))
             self.author_parser.set_dom(dom)
         return
 
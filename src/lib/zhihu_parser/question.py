@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-from bs4 import BeautifulSoup
 from src.lib.zhihu_parser.base import BaseParser
 from src.lib.zhihu_parser.content.answer import Answer
 from src.lib.zhihu_parser.info.question import QuestionInfo
@@ -7,7 +6,7 @@ from src.lib.zhihu_parser.info.question import QuestionInfo
 
 class QuestionParser(BaseParser):
     def __init__(self, content):
-        self.dom = BeautifulSoup(content, 'html.parser')
+        self.dom = self.create_dom(content)
         self.answer_parser = Answer()
 
     def get_question_info_list(self):
@@ -5,6 +5,15 @@ from src.tools.extra_tools import ExtraTools
 
 
 class ParserTools(object):
+    @staticmethod
+    def create_dom(content):
+        u"""
+        bs4载入较慢，在首次解析网页时才导入，只从数据库生成电子书时不会载入
+        """
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(content, 'html.parser')
+
     @staticmethod
     def match_content(patten, content, default=""):
         result = re.search(patten, str(content))
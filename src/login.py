@@ -1,11 +1,9 @@
 # -*- coding: utf-8 -*-
-import cookielib
 import os
 import sys
 import platform
 import webbrowser
 import json
-import urllib2
 import time
 
 import guide
@@ -20,9 +18,8 @@ from src.tools.path import Path
 
 class Login():
     def __init__(self):
-        self.cookieJar = cookielib.LWPCookieJar()
-        self.opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(self.cookieJar))
-        urllib2.install_opener(self.opener)
+        self.cookieJar = Http.cookie_jar
+        Http.install_cookie_opener()
 
     def login(self, account, password, captcha=''):
         content = Http.get_content('https://www.zhihu.com/')
@@ -79,6 +76,7 @@ class Login():
             data['cookieStr'] = cookie
             DB.save(data, 'LoginRecord')
             DB.commit()
+            Http.cookie_account, Http.saved_cookie = account, cookie
             return True
         else:
             print u'登陆失败'
@@ -124,11 +122,4 @@ class Login():
         return
 
     def get_cookie(self):
-        filename = ExtraTools.md5(ExtraTools.get_time())
-        with open(filename, 'w') as f:
-            pass
-        self.cookieJar.save(filename)
-        with open(filename) as f:
-            content = f.read()
-        os.remove(filename)
-        return content
+        return Http.dump_cookie(self.cookieJar)
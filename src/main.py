@@ -1,16 +1,28 @@
 # -*- coding: utf-8 -*-
 import sqlite3
+import sys
+import threading
+import time
 
 from src import guide
 from src.book import Book
+from src.container.image import ImageContainer
+from src.daemon import JobManager, create_job_server
 from src.tools.config import Config
+from src.tools.content_compressor import ContentCompressor
 from src.tools.debug import Debug
 from src.tools.http import Http
+from src.tools.image_pool import ImagePool
+from src.tools.metrics import Metrics
 from src.tools.path import Path
+from src.tools.profiler import Profiler
 from src.tools.db import DB
+from src.tools.search_index import SearchIndex
+from src.tools.session_pool import SessionPool
+from src.tools.work_queue import WorkQueue
 from login import Login
 from read_list_parser import ReadListParser
-from src.worker import worker_factory
+from src.worker import crawl_page, discover_work, worker_factory
 
 
 class ZhihuHelp(object):
@@ -21,6 +33,7 @@ class ZhihuHelp(object):
         Path.init_base_path()
         Path.init_work_directory()
         self.init_database()
+        ImagePool.init()
         Config._load()
         return
 
@@ -44,8 +57,9 @@ class ZhihuHelp(object):
         return
 
     def start(self):
-        self.check_update()
+        update = self.start_update_check()
         self.init_config()
+        self.check_update(update)
         Debug.logger.info(u"开始读取ReadList.txt设置信息")
 
         counter = 1
@@ -53,7 +67,7 @@ class ZhihuHelp(object):
             with open('./ReadList.txt', 'r') as read_list:
                 counter = 1
                 for line in read_list:
-                    line = line.replace(' ', '').replace('\r', '').replace('\n', '').replace('\t', '')  # 移除空白字符
+                    line = self.clean_command(line)
                     self.create_book(line, counter)  # 一行内容代表一本电子书
                     counter += 1
         except IOError as e:
@@ -62,59 +76,248 @@ class ZhihuHelp(object):
 
         if counter == 1:
             print u"ReadList.txt 内容为空"
+        Metrics.print_summary()
+        SessionPool.print_summary()
         return
 
     @staticmethod
-    def create_book(command, counter):
+    def clean_command(line):
+        return line.replace(' ', '').replace('\r', '').replace('\n', '').replace('\t', '')  # 移除空白字符
+
+    def coordinate(self, queue_path=None):
+        u"""
+        分布式抓取的协调进程，python zhihuHelp.py coordinator [队列文件]
+        *   将ReadList.txt中的待抓取网址作为一个批次放入共享队列，自身也作为一个worker参与抓取
+        *   该批次的任务全部完成(或多次失败后放弃)后，从数据库中生成电子书
+        *   队列文件默认为知乎电子书临时资源库/work_queue.db，多台机器协作时需放在共享目录中，各进程使用同一个数据库文件
+        """
+        queue = WorkQueue(queue_path or Path.work_queue_path, Config.max_try)
+        owner = WorkQueue.get_owner()
+        batch = u'{}_{}'.format(time.strftime('%Y%m%d_%H%M%S'), owner)
+        command_list = []
+        if Path.is_file('./ReadList.txt'):
+            with open('./ReadList.txt', 'r') as read_list:
+                command_list = [x for x in (self.clean_command(line) for line in read_list) if x]
+        for command in command_list:
+            task_package = ReadListParser.get_task(command)
+            for (kind, url_list) in task_package.work_list.items():
+                queue.put(batch, 'task', [{'kind': kind, 'url': x} for x in url_list])
+        Debug.logger.info(u'已将{}条记录放入任务队列，批次:{}'.format(len(command_list), batch))
+
+        while not queue.is_finished(batch):
+            if not self.work_on_queue(queue, owner):
+                time.sleep(Config.queue_poll_interval)
+        stat = queue.get_stat(batch)
+        Debug.logger.info(u'队列中的任务已全部完成，成功{}个，失败{}个'.format(stat.get('done', 0), stat.get('failed', 0)))
+
+        for (counter, command) in enumerate(command_list, 1):
+            self.create_book(command, counter, crawl=False)
+        Metrics.print_summary()
+        SessionPool.print_summary()
+        return
+
+    def work(self, queue_path=None):
+        u"""
+        分布式抓取的worker进程，python zhihuHelp.py worker [队列文件]
+        *   从共享队列中领取任务，抓取结果写入本进程的数据库，同一台机器上的进程共用同一个数据库文件
+        *   队列中没有待完成的任务且空闲超过Config.queue_idle_timeout秒后退出
+        """
+        queue = WorkQueue(queue_path or Path.work_queue_path, Config.max_try)
+        owner = WorkQueue.get_owner()
+        idle_since = time.time()
+        while True:
+            if self.work_on_queue(queue, owner):
+                idle_since = time.time()
+                continue
+            if queue.is_finished() and time.time() - idle_since > Config.queue_idle_timeout:
+                break
+            time.sleep(Config.queue_poll_interval)
+        ImageContainer.finish_prefetch()
+        Debug.logger.info(u'任务队列已空，worker退出')
+        Metrics.print_summary()
+        SessionPool.print_summary()
+        return
+
+    def serve(self, address=None):
+        u"""
+        后台服务模式，python zhihuHelp.py daemon [地址]
+        *   通过本地HTTP接口(或Unix socket)接收电子书任务，接口说明见JobRequestHandler
+        *   数据库连接、cookie、模板等只在启动时载入一次，之后的任务直接复用
+        *   地址默认为Config.daemon_address，不会提示登录，请先正常运行一次完成登录
+        """
+        def run_job(job):
+            return sorted(set(self.create_book(self.clean_command(job.command), job.id)))
+
+        manager = JobManager(run_job, self.init_database, Config.daemon_max_queue, Config.daemon_max_finished)
+        server = create_job_server(address or Config.daemon_address, manager)
+        manager.start()
+        Debug.logger.info(u'后台服务已启动，地址:{}'.format(address or Config.daemon_address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            Debug.logger.info(u'后台服务已停止')
+        server.server_close()
+        return
+
+    @staticmethod
+    def work_on_queue(queue, owner):
+        u"""
+        领取一批任务并完成，返回领取到的任务数
+        *   task抓取信息、计算页数后，将其余网页作为page放回队列
+        *   同类的page合并后交给对应的Worker在线程池中一并抓取
+        """
+        item_list = queue.lease(owner, Config.max_thread, Config.lease_timeout)
+        page_item_dict = {}
+        for item in item_list:
+            kind, url = item['payload']['kind'], item['payload']['url']
+            if item['item_type'] == 'page':
+                page_item_dict.setdefault(kind, []).append(item)
+                continue
+            url_list = discover_work(kind, url)
+            if url_list is None:
+                queue.release(item['id'], owner)
+                continue
+            queue.put(item['batch'], 'page', [{'kind': kind, 'url': x} for x in url_list])
+            queue.ack(item['id'], owner)
+        for (kind, page_item_list) in page_item_dict.items():
+            complete_set = crawl_page(kind, [x['payload']['url'] for x in page_item_list])
+            for item in page_item_list:
+                if item['payload']['url'] in complete_set:
+                    queue.ack(item['id'], owner)
+                else:
+                    queue.release(item['id'], owner)
+        return len(item_list)
+
+    @staticmethod
+    def create_book(command, counter, crawl=True):
+        u"""
+        *   返回
+            *   Path.result_path下生成的文件名列表
+        """
         Path.reset_path()
 
         Debug.logger.info(u"开始制作第 {} 本电子书".format(counter))
         Debug.logger.info(u"对记录 {} 进行分析".format(command))
         task_package = ReadListParser.get_task(command)  # 分析命令
+        Profiler.start_book()
+        result_list = []
 
-        if not task_package.is_work_list_empty():
-            worker_factory(task_package.work_list)  # 执行抓取程序
+        if crawl and not task_package.is_work_list_empty():
+            with Metrics.timer('stage.crawl'):
+                worker_factory(task_package.work_list)  # 执行抓取程序
             Debug.logger.info(u"网页信息抓取完毕")
 
         if not task_package.is_book_list_empty():
             Debug.logger.info(u"开始自数据库中生成电子书数据")
-            book = Book(task_package.book_list)
-            book.create()
-        return
+            with Metrics.timer('stage.book'):
+                with Profiler.stage('Book.__init__'):
+                    book = Book(task_package.book_list)
+                with Profiler.stage('Book.create'):
+                    result_list = book.create()
+        report_name = u'{}_{}'.format(time.strftime('%Y%m%d_%H%M%S'), counter)
+        Metrics.finish_book(Path.metrics_path + u'/{}.json'.format(report_name),
+                            {'command': command, 'counter': counter})
+        Profiler.finish_book(Path.profile_path + u'/' + report_name)
+        return result_list
 
     @staticmethod
     def init_database():
+        # 分布式抓取时多个进程同时写入同一数据库，适当延长等待锁的时间
         if Path.is_file(Path.db_path):
-            DB.set_conn(sqlite3.connect(Path.db_path))
+            DB.set_conn(sqlite3.connect(Path.db_path, timeout=60))
         else:
-            DB.set_conn(sqlite3.connect(Path.db_path))
+            DB.set_conn(sqlite3.connect(Path.db_path, timeout=60))
             # 没有数据库就新建一个出来
             with open(Path.sql_path) as sql_script:
                 DB.cursor.executescript(sql_script.read())
             DB.commit()
+        ZhihuHelp.upgrade_database()
+        # 索引使用if not exists创建，旧数据库也能自动补上
+        with open(Path.index_sql_path) as sql_script:
+            DB.cursor.executescript(sql_script.read())
+        SearchIndex.init(DB.cursor)
+        DB.commit()
 
     @staticmethod
-    def check_update():  # 强制更新
+    def upgrade_database():
+        u"""
+        为旧版数据库补上新增的字段
+        """
+        for table in ContentCompressor.table_list:
+            column_list = DB.get_column_list(table)
+            if 'content_format' not in column_list:
+                DB.cursor.execute('alter table {} add column content_format INT(1) NOT NULL DEFAULT 0'.format(table))
+            if 'content_length' not in column_list:
+                DB.cursor.execute('alter table {} add column content_length INT(8) DEFAULT NULL'.format(table))
+            if 'fingerprint' not in column_list:
+                DB.cursor.execute("alter table {} add column fingerprint VARCHAR(32) NOT NULL DEFAULT ''".format(table))
+        DB.commit()
+        return
+
+    @staticmethod
+    def migrate_content(compress=True):
+        u"""
+        维护命令，压缩/还原数据库中已有的答案与文章正文
+        """
+        ContentCompressor.migrate(DB.conn, compress)
+        SearchIndex.reset(DB.cursor)
+        DB.commit()
+        return
+
+    @staticmethod
+    def compact():
+        u"""
+        维护命令，整理图片池索引并按容量上限清理旧图片
+        """
+        ImagePool.compact()
+        return
+
+    @staticmethod
+    def start_update_check():
+        u"""
+        在后台线程中下载版本信息，与登录同时进行，不再阻塞启动
+        *   非交互运行(标准输入不是终端)或update_check_timeout为0时不检查更新，返回None
+        *   返回{'thread', 'deadline', 'content'}，交由check_update读取结果
+        """
+        if not Config.update_check_timeout or not sys.stdin.isatty():
+            return None
+        update = {'deadline': time.time() + Config.update_check_timeout, 'content': ''}
+
+        def fetch():
+            update['content'] = Http.get_content(u"http://zhihuhelpbyyzy-zhihu.stor.sinaapp.com/ZhihuHelpUpdateTime.txt",
+                                                 timeout=Config.update_check_timeout)
+            return
+
+        update['thread'] = threading.Thread(target=fetch)
+        update['thread'].daemon = True
+        update['thread'].start()
+        return update
+
+    @staticmethod
+    def check_update(update):  # 强制更新
         u"""
             *   功能
                 *   检测更新。
                 *   若在服务器端检测到新版本，自动打开浏览器进入新版下载页面
                 *   网页请求超时或者版本号正确都将自动跳过
             *   输入
-                *   无
+                *   update
+                    *   start_update_check的返回值，版本信息最多等待至update_check_timeout秒，超时则跳过
             *   返回
                 *   无
         """
-        print u"检查更新。。。"
+        if not update:
+            return
+        update['thread'].join(max(update['deadline'] - time.time(), 0))
         try:
-            content = Http.get_content(u"http://zhihuhelpbyyzy-zhihu.stor.sinaapp.com/ZhihuHelpUpdateTime.txt")
+            content = update['content']
             if not content:
                 raise Exception('HttpError')
-            time, url = [x.strip() for x in content.split('\n')]
-            if time == Config.update_time:
+            update_time, url = [x.strip() for x in content.split('\n')]
+            if update_time == Config.update_time:
                 return
             else:
-                print u"发现新版本，\n更新日期:{} ，点按回车进入更新页面".format(time)
+                print u"发现新版本，\n更新日期:{} ，点按回车进入更新页面".format(update_time)
                 print u'新版本下载地址:' + url
                 raw_input()
                 import webbrowser
@@ -41,7 +41,9 @@ class ReadListParser():
         raw_task_list = []
         for command in command_list:
             raw_task = ReadListParser.parse_command(command)
-            if raw_task:
+            if isinstance(raw_task, list):
+                raw_task_list += raw_task
+            elif raw_task:
                 raw_task_list.append(raw_task)
 
         task_package = ReadListParser.merge_task_list(raw_task_list)
@@ -50,7 +52,7 @@ class ReadListParser():
     @staticmethod
     def parse_command(raw_command=''):
         u"""
-        分析单条命令并返回待完成的task
+        分析单条命令并返回待完成的task，search指令会返回task列表
         task格式
         *   kind
             *   字符串，见TypeClass.type_list
@@ -61,12 +63,14 @@ class ReadListParser():
         *   book
             *   kind
             *   info
-            *   question
             *   answer
+                *   筛选答案/文章所用的where条件
         """
 
         def detect(command):
             for command_type in Type.type_list:
+                if not hasattr(Match, command_type):
+                    continue
                 result = getattr(Match, command_type)(command)
                 if result:
                     return command_type
@@ -81,7 +85,6 @@ class ReadListParser():
             task.spider.href = 'https://www.zhihu.com/question/{}'.format(question_id)
             task.book.kind = 'question'
             task.book.sql.info = ' question_id = "{}" '.format(question_id)
-            task.book.sql.question = 'question_id = "{}"'.format(question_id)
             task.book.sql.answer = 'question_id = "{}"'.format(question_id)
             return task
 
@@ -95,7 +98,6 @@ class ReadListParser():
 
             task.book.kind = 'answer'
             task.book.sql.info = ' question_id = "{}" '.format(question_id)
-            task.book.sql.question = ' question_id = "{}" '.format(question_id)
             task.book.sql.answer = ' question_id = "{}" and answer_id = "{}" '.format(question_id, answer_id)
             return task
 
@@ -107,9 +109,7 @@ class ReadListParser():
             task.spider.href = 'https://www.zhihu.com/people/{}'.format(author_id)
             task.book.kind = 'author'
             task.book.sql.info = 'select * from AuthorInfo where author_id = "{}"'.format(author_id)
-            task.book.sql.question = 'select * from Question where question_id in (select question_id from Answer where author_id = "{}")'.format(
-                author_id)
-            task.book.sql.answer = 'select * from Answer where author_id = "{}"'.format(author_id)
+            task.book.sql.answer = 'author_id = "{}"'.format(author_id)
             return task
 
         def parse_collection(command):
@@ -121,9 +121,7 @@ class ReadListParser():
             task.book.kind = 'collection'
             task.book.sql.info = 'select * from CollectionInfo where collection_id = "{}"'.format(
                 collection_id)
-            task.book.sql.question = 'select * from Question where question_id in (select question_id from Answer where href in (select href from CollectionIndex where collection_id = "{}"))'.format(
-                collection_id)
-            task.book.sql.answer = 'select * from Answer where href in (select href from CollectionIndex where collection_id = "{}")'.format(
+            task.book.sql.answer = 'href in (select href from CollectionIndex where collection_id = "{}")'.format(
                 collection_id)
             return task
 
@@ -135,9 +133,7 @@ class ReadListParser():
             task.spider.href = 'https://www.zhihu.com/topic/{}'.format(topic_id)
             task.book.kind = 'topic'
             task.book.sql.info = 'select * from TopicInfo where topic_id = "{}"'.format(topic_id)
-            task.book.sql.question = 'select * from Question where question_id in (select question_id from Answer where href in (select href from TopicIndex where topic_id = "{}"))'.format(
-                topic_id)
-            task.book.sql.answer = 'select * from Answer where href in (select href from TopicIndex where topic_id = "{}")'.format(
+            task.book.sql.answer = 'href in (select href from TopicIndex where topic_id = "{}")'.format(
                 topic_id)
             return task
 
@@ -150,7 +146,6 @@ class ReadListParser():
             task.spider.href = 'https://zhuanlan.zhihu.com/{}/{}'.format(column_id, article_id)
             task.book.kind = 'article'
             task.book.sql.info = ' column_id = "{}" and article_id = "{}" '.format(column_id, article_id)
-            task.book.sql.question = ''
             task.book.sql.answer = ' column_id = "{}" and article_id = "{}" '.format(column_id, article_id)
             return task
 
@@ -162,10 +157,25 @@ class ReadListParser():
             task.spider.href = 'https://zhuanlan.zhihu.com/{}'.format(column_id)
             task.book.kind = 'column'
             task.book.sql.info = 'select * from ColumnInfo where column_id = "{}" '.format(column_id)
-            task.book.sql.question = ''
-            task.book.sql.answer = 'select * from Article where column_id = "{}" '.format(column_id)
+            task.book.sql.answer = 'column_id = "{}"'.format(column_id)
             return task
 
+        def parse_search(command):
+            u"""
+            search指令不需要抓取网页，直接在数据库中搜索答案与文章，各生成一本电子书
+            """
+            result = Match.search(command)
+            keyword = result.group('keyword')
+            task_list = []
+            for kind in Type.search_type_list:
+                task = SingleTask()
+                task.kind = kind
+                task.book.kind = kind
+                task.book.info = {'title': keyword, 'id': keyword}
+                task.book.sql.search = keyword
+                task_list.append(task)
+            return task_list
+
         def parse_error(command):
             if command:
                 Debug.logger.info(u"""无法解析记录:{}所属网址类型,请检查后重试。""".format(command))
@@ -173,7 +183,7 @@ class ReadListParser():
 
         parser = {'answer': parse_answer, 'question': parse_question, 'author': parse_author,
                   'collection': parse_collection, 'topic': parse_topic, 'article': parse_article,
-                  'column': parse_column, 'unknown': parse_error, }
+                  'column': parse_column, 'search': parse_search, 'unknown': parse_error, }
         kind = detect(raw_command)
         return parser[kind](raw_command)
 
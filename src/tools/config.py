@@ -11,6 +11,7 @@ class Config(object):
     """
     # 全局变量
     update_time = '2016-05-04'  # 更新日期
+    update_check_timeout = 3  # 检查更新的最长等待时间（秒），在后台与登录同时进行，为0时不检查更新
 
     debug = False
 
@@ -19,10 +20,23 @@ class Config(object):
     remember_account = False  # 是否使用已有密码
     max_thread = 10  # 最大线程数，其实设成5就行了，但下图片的时候还是得多开几个线程，所以还是设成10好了（反正冬天，CPU满了有利于室内保温 - -）
     picture_quality = 1  # 图片质量（0/1/2，无图/标清/原图）
+    image_pool_max_size = 4 * 1024 * 1024 * 1024  # 图片池容量上限（字节），超出后优先删除最久未使用的图片，0为不限制
+    page_cache = True  # 缓存渲染后的页面，重新生成电子书时内容未变化的问题/文章不再重新渲染
+    page_cache_max_size = 512 * 1024 * 1024  # 页面缓存容量上限（字节），超出后优先删除最久未使用的页面，0为不限制
+    prefetch_image = True  # 解析网页时即在后台下载答案中的图片，生成电子书时不必再集中下载
     max_question = 100  # 每本电子书中最多可以放多少个问题
     max_answer = 600  # 每本电子书中最多可以放多少个回答
     max_article = 600  # 每本电子书中最多可以放多少篇文章
     max_try = 5  # 最大尝试次数
+    max_session = 1  # 同时使用的账号数，大于1时从登录记录中载入多个账号轮流抓取
+    session_interval = 0  # 同一账号两次请求之间的最小间隔（秒），0为不限制
+    lease_timeout = 600  # 分布式抓取中领取任务的租约时长（秒），超时未完成的任务会被其它进程重新领取
+    queue_poll_interval = 1  # 分布式抓取中队列暂无任务时的等待间隔（秒）
+    queue_idle_timeout = 60  # 分布式抓取中worker在队列为空后继续等待的时间（秒），超时后退出
+    daemon_address = '127.0.0.1:8173'  # 后台服务模式的监听地址，host:port或Unix socket路径
+    daemon_max_queue = 100  # 后台服务模式中最多等待执行的任务数，超出后拒绝新任务
+    daemon_max_finished = 100  # 后台服务模式中最多保留的已结束任务数，更早的任务信息被清除
+    column_page_size = 100  # 抓取专栏时每次请求的文章数，超过接口上限时按接口实际返回的数量分页
     answer_order_by = 'agree_count'  # 问题答案排序原则  agree_count|update_date|char_count
     answer_order_by_desc = True  # 问题答案排序顺序->是否为desc
     question_order_by = 'agree_count'  # 问题排序原则  agree_count|char_count|answer_count
@@ -31,9 +45,16 @@ class Config(object):
     author_answer_order_by = 'agree_count'  # 作者回答排序原则  agree_count|answer_id|char_count
     author_answer_order_by_desc = True  # 作者回答排序原则->是否为desc
     article_order_by_desc = False  # 文章排序顺序->是否为desc
-    show_private_answer = True
+    show_private_answer = True  # 是否收录标记为『禁止转载』的答案
+    answer_min_agree = 0  # 只收录赞同数不低于该值的答案/文章，0为不限制
+    answer_start_date = ''  # 只收录该日期（含）之后更新的答案/文章，格式为2016-01-01，留空为不限制
+    answer_end_date = ''  # 只收录该日期（含）之前更新的答案/文章，格式同上
     timeout_download_picture = 10  # 多给知乎服务器点时间，批量生成tex太痛苦了- -
     timeout_download_html = 5
+    profile = False  # 是否使用cProfile逐阶段分析耗时，结果写入知乎电子书临时资源库/性能分析，会明显拖慢运行速度
+    profile_thread = False  # 分析耗时时，是否同时采样线程池中各线程的调用栈，用于查看抓取线程阻塞在哪里
+    record_metrics = True  # 是否记录各阶段耗时与请求数等统计，每本电子书生成后写入知乎电子书临时资源库/运行统计
+    compress_content = False  # 是否压缩保存答案/文章正文，可减小数据库体积，已有数据可运行python zhihuHelp.py compress_content转换
     sql_extend_answer_filter = ''  # 附加到answer_sql语句后，用于对answer进行进一步的筛选（示例: and(agree > 5) ）
 
     @staticmethod
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+
+from src.tools.config import Config
+from src.tools.debug import Debug
+from src.tools.path import Path
+
+
+class ContentCompressor(object):
+    u"""
+    答案/文章正文的压缩存储
+    *   content_format记录正文的存储格式，0为原始html，1为zlib压缩后的utf-8编码
+    *   content_length记录正文的原始字数，用于按字数排序、分卷，避免读取正文计算length(content)
+    *   是否压缩由Config.compress_content控制，两种格式的记录可以在同一数据库中共存
+    *   fingerprint记录原始正文的md5，重新抓取时据此判断正文是否变化，见DB.save_batch
+    """
+    table_list = ('Answer', 'Article',)
+    format_raw = 0
+    format_zlib = 1
+    level = 6  # zlib压缩级别
+    migrate_batch_size = 500
+    date_column = {'Answer': 'edit_date', 'Article': 'publish_date'}  # 与fingerprint一同判断记录是否变化的日期字段
+
+    @staticmethod
+    def encode(content, compress):
+        u"""
+        *   返回
+            *   (存入数据库的正文, content_format, content_length)
+        """
+        if not isinstance(content, unicode):
+            content = str(content).decode('utf-8', 'ignore')
+        if compress:
+            return sqlite3.Binary(zlib.compress(content.encode('utf-8'), ContentCompressor.level)), \
+                   ContentCompressor.format_zlib, len(content)
+        return content, ContentCompressor.format_raw, len(content)
+
+    @staticmethod
+    def decode(content, content_format):
+        u"""
+        返回原始正文，压缩格式的正文解压后为utf-8编码的str，与未压缩时数据库返回的类型一致
+        """
+        if content_format == ContentCompressor.format_zlib:
+            return zlib.decompress(str(content))
+        return content
+
+    @staticmethod
+    def get_fingerprint(content):
+        if isinstance(content, unicode):
+            content = content.encode('utf-8')
+        return hashlib.md5(str(content)).hexdigest()
+
+    @staticmethod
+    def pack(table_name, data):
+        u"""
+        DB.save写入前调用，按设置压缩正文，并补上content_format/content_length/fingerprint
+        """
+        if (table_name not in ContentCompressor.table_list) or ('content' not in data):
+            return data
+        fingerprint = data.get('fingerprint') or ContentCompressor.get_fingerprint(data['content'])
+        content, content_format, content_length = ContentCompressor.encode(data['content'], Config.compress_content)
+        return dict(data, content=content, content_format=content_format, content_length=content_length,
+                    fingerprint=fingerprint)
+
+    @staticmethod
+    def migrate(conn, compress=True):
+        u"""
+        一次性转换已有数据库中的正文格式，转换完成后压缩数据库文件
+        *   compress为True时压缩所有未压缩的正文，为False时还原所有已压缩的正文
+        *   按rowid分批处理并提交，中途退出后重新运行即可继续
+        """
+        source_format = ContentCompressor.format_raw if compress else ContentCompressor.format_zlib
+        size = os.path.getsize(Path.db_path)
+        start = time.time()
+        for table in ContentCompressor.table_list:
+            counter = 0
+            last_rowid = 0
+            while True:
+                row_list = conn.execute(
+                    'select rowid, content, content_format from {} where rowid > ? and (content_format = ? or content_length is null) order by rowid limit ?'.format(
+                        table), (last_rowid, source_format, ContentCompressor.migrate_batch_size)).fetchall()
+                if not row_list:
+                    break
+                update_list = []
+                for (rowid, content, content_format) in row_list:
+                    content = ContentCompressor.decode(content, content_format)
+                    update_list.append(ContentCompressor.encode(content, compress) + (rowid,))
+                conn.executemany(
+                    'update {} set content = ?, content_format = ?, content_length = ? where rowid = ?'.format(table),
+                    update_list)
+                conn.commit()
+                counter += len(row_list)
+                last_rowid = row_list[-1][0]
+                Debug.print_in_single_line(u'{}表已转换{}条记录'.format(table, counter))
+            Debug.logger.info(u'{}表转换完毕，共{}条记录'.format(table, counter))
+        Debug.logger.info(u'开始压缩数据库文件')
+        conn.execute('vacuum')
+        Debug.logger.info(u'数据库大小由{:.1f}MB变为{:.1f}MB，耗时{:.1f}秒'.format(
+            size / 1024.0 / 1024, os.path.getsize(Path.db_path) / 1024.0 / 1024, time.time() - start))
+        return
@@ -1,22 +1,40 @@
 # -*- coding: utf-8 -*-
+import threading
 from multiprocessing.dummy import Pool as ThreadPool  # 多线程并行库
 
 from src.tools.config import Config
+from src.tools.metrics import Metrics
 
 
 class Control(object):
-    thread_pool = ThreadPool(Config.max_thread)
+    thread_pool = None  # 抓取网页所用的线程池，首次抓取时创建，此时配置文件已载入，线程数以配置文件为准
+    lock = threading.Lock()  # 多个线程同时首次抓取时只创建一个线程池
+
+    @staticmethod
+    def get_thread_pool():
+        with Control.lock:
+            if not Control.thread_pool:
+                Control.thread_pool = ThreadPool(Config.max_thread)
+        return Control.thread_pool
 
     @staticmethod
     def control_center(argv, test_flag):
+        u"""
+        *   运行统计
+            *   control.round为实际执行的轮数，test_flag为空时不执行
+            *   各调用方传入的test_flag均为任务集合本身，完成的任务不会从中移除，因此每次调用都会执行max_try轮
+                *   已完成的任务在后续各轮中由调用方直接跳过，该值不能说明是否有任务失败，失败情况见http.failed、image.failed
+        """
         max_try = Config.max_try
-        for time in range(max_try):
-            if test_flag:
-                if Config.debug:
-                    Control.debug_control(argv)
-                else:
-                    Control.release_control(argv)
-                Control.thread_pool.map(**argv)
+        with Metrics.timer('control.control_center'):
+            for time in range(max_try):
+                if test_flag:
+                    Metrics.count('control.round')
+                    if Config.debug:
+                        Control.debug_control(argv)
+                    else:
+                        Control.release_control(argv)
+                    Control.get_thread_pool().map(**argv)
         return
 
     @staticmethod
@@ -28,7 +46,7 @@ class Control(object):
     @staticmethod
     def release_control(argv):
         try:
-            Control.thread_pool.map(**argv)
+            Control.get_thread_pool().map(**argv)
         except Exception:
             # 按照惯例，报错全部pass掉
             # 等用户反馈了再开debug查吧
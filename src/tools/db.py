@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from debug import Debug
-from src.tools.type import Type
+from src.container.record import Record
+from src.tools.content_compressor import ContentCompressor
+from src.tools.metrics import Metrics
+from src.tools.search_index import SearchIndex
 
 
 class DB(object):
@@ -9,12 +12,15 @@ class DB(object):
     '''
     cursor = None
     conn = None
+    record_type = {}  # (表名, 扩展字段) => Record类型
+    batch_size = 500  # save_batch中每次按href预读的记录数，需小于sqlite的参数数量上限
 
     @staticmethod
     def set_conn(conn):
         DB.conn = conn
         DB.conn.text_factory = str
         DB.cursor = conn.cursor()
+        DB.record_type = {}
         return
 
     @staticmethod
@@ -27,11 +33,16 @@ class DB(object):
 
     @staticmethod
     def save(data={}, table_name=''):
-        sql = "replace into {table_name} ({columns}) values ({items})".format(table_name=table_name,
-                                                                              columns=','.join(data.keys()),
-                                                                              items=(',?' * len(data.keys()))[1:])
-        Debug.logger.debug(sql)
-        DB.cursor.execute(sql, tuple(data.values()))
+        with Metrics.timer('db.save'):
+            data = ContentCompressor.pack(table_name, data)
+            sql = "replace into {table_name} ({columns}) values ({items})".format(table_name=table_name,
+                                                                                  columns=','.join(data.keys()),
+                                                                                  items=(',?' * len(data.keys()))[1:])
+            Debug.logger.debug(sql)
+            index_table, href_list = SearchIndex.before_save(DB.cursor, table_name, data)
+            DB.cursor.execute(sql, tuple(data.values()))
+            SearchIndex.after_save(DB.cursor, index_table, href_list)
+        Metrics.count('db.save.' + table_name)
         return
 
     @staticmethod
@@ -39,38 +50,121 @@ class DB(object):
         DB.conn.commit()
         return
 
+    @staticmethod
+    def save_batch(data_list, table_name):
+        u"""
+        批量写入Answer/Article，跳过正文与其它字段均未变化的记录
+        *   fingerprint与日期字段(edit_date/publish_date)一致时视为正文未变，只在赞同数等字段变化时更新这些字段，不重写正文
+        *   已有记录按href分批预先读出，避免逐条查询
+        *   返回
+            *   (新增条数, 更新条数, 未变化条数)
+        """
+        date_column = ContentCompressor.date_column[table_name]
+        column_list = [x for x in DB.get_column_list(table_name) if x not in ('content', 'content_format', 'content_length')]
+        data_list = [x for x in data_list if x and x.get('href')]
+        stored = {}
+        for start in range(0, len(data_list), DB.batch_size):
+            href_list = list(set(x['href'] for x in data_list[start:start + DB.batch_size]))
+            sql = 'select {columns} from {table_name} where href in ({items})'.format(
+                columns=','.join(column_list), table_name=table_name, items=(',?' * len(href_list))[1:])
+            for row in DB.cursor.execute(sql, href_list):
+                stored[row[column_list.index('href')]] = dict(zip(column_list, row))
+
+        inserted, updated, unchanged = 0, 0, 0
+        for data in data_list:
+            if 'content' in data:
+                data = dict(data, fingerprint=ContentCompressor.get_fingerprint(data['content']))
+            record = stored.get(DB.encode(data['href']))
+            if record is None:
+                inserted += 1
+                DB.save(data, table_name)
+            elif DB.is_changed(record, data, 'fingerprint') or DB.is_changed(record, data, date_column):
+                updated += 1
+                DB.save(data, table_name)
+            else:
+                changed_list = [key for key in data if key in column_list and DB.is_changed(record, data, key)]
+                if not changed_list:
+                    unchanged += 1
+                    continue
+                updated += 1
+                if 'author_name' in changed_list:
+                    # 作者名在全文索引中，需要走DB.save重建索引
+                    DB.save(data, table_name)
+                else:
+                    sql = 'update {table_name} set {items} where href = ?'.format(
+                        table_name=table_name, items=','.join('{} = ?'.format(key) for key in changed_list))
+                    DB.cursor.execute(sql, tuple(data[key] for key in changed_list) + (data['href'],))
+            stored[DB.encode(data['href'])] = dict(record or {}, **{key: data[key] for key in data if key in column_list})
+        Metrics.count('db.inserted.' + table_name, inserted)
+        Metrics.count('db.updated.' + table_name, updated)
+        Metrics.count('db.unchanged.' + table_name, unchanged)
+        return inserted, updated, unchanged
+
+    @staticmethod
+    def is_changed(record, data, key):
+        u"""
+        判断data中的字段相对数据库中已有的记录是否有变化，data中没有的字段视为未变化
+        """
+        if key not in data:
+            return False
+        return DB.encode(record.get(key)) != DB.encode(data[key])
+
+    @staticmethod
+    def encode(value):
+        u"""
+        将字段值转为数据库返回值的形式(utf-8编码的str)，便于与已存储的数据比较
+        """
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        if value is None:
+            return value
+        return str(value)
+
     @staticmethod
     def get_result_list(sql):
         Debug.logger.debug(sql)
         result = DB.cursor.execute(sql).fetchall()
         return result
 
+    @staticmethod
+    def get_result_iterator(sql, parameter=()):
+        u"""
+        使用独立游标逐行返回查询结果，便于按顺序流式处理大结果集
+        """
+        Debug.logger.debug(sql)
+        return DB.conn.execute(sql, tuple(parameter))
+
     @staticmethod
     def get_result(sql):
         result = DB.cursor.execute(sql).fetchone()
         return result
 
     @staticmethod
-    def wrap(kind, result=()):
+    def get_column_list(table_name):
+        u"""
+        读取数据库中表的实际字段顺序
+        """
+        return tuple(str(row[1]) for row in DB.conn.execute('pragma table_info({})'.format(table_name)))
+
+    @staticmethod
+    def get_record_type(table_name, extra_column_list=()):
+        u"""
+        按表结构生成对应的Record类型，同一张表只生成一次
+        *   extra_column_list
+            *   生成电子书时附加的扩展字段，如char_count/agree_count
+        """
+        key = (table_name, tuple(extra_column_list))
+        if key not in DB.record_type:
+            column_list = DB.get_column_list(table_name)
+            slots = column_list + tuple(x for x in extra_column_list if x not in column_list)
+            DB.record_type[key] = type(table_name + 'Record', (Record,),
+                                       {'__slots__': slots, 'column_list': column_list})
+        return DB.record_type[key]
+
+    @staticmethod
+    def get_record_list(sql, table_name, parameter=()):
         u"""
-        将s筛选出的列表按SQL名组装为字典对象
+        执行select * from table_name形式的sql，以Record形式返回结果
         """
-        template = {Type.answer: (
-            'author_id', 'author_sign', 'author_logo', 'author_name', 'agree', 'content', 'question_id', 'answer_id',
-            'commit_date', 'edit_date', 'comment', 'no_record_flag', 'href',),
-            Type.question: ('question_id', 'comment', 'views', 'answers', 'followers', 'title', 'description',),
-            Type.article: ('author_id', 'author_hash', 'author_sign', 'author_name', 'author_logo', 'column_id', 'name',
-                           'article_id', 'href', 'title', 'title_image', 'content', 'comment', 'agree',
-                           'publish_date',),
-
-            Type.author_info: (
-                'logo', 'author_id', 'hash', 'sign', 'description', 'name', 'asks', 'answers', 'posts', 'collections',
-                'logs', 'agree', 'thanks', 'collected', 'shared', 'followee', 'follower', 'followed_column',
-                'followed_topic', 'viewed', 'gender', 'weibo',),
-            Type.collection_info: ('collection_id', 'title', 'description', 'follower', 'comment',),
-            Type.topic_info: ('title', 'logo', 'description', 'topic_id', 'follower',), Type.column_info: (
-                'creator_id', 'creator_hash', 'creator_sign', 'creator_name', 'creator_logo', 'column_id', 'name',
-                'logo', 'description', 'article', 'follower',),
-
-            Type.collection_index: ('collection_id', 'href',), Type.topic_index: ('topic_id', 'href',), }
-        return {k: v for (k, v) in zip(template[kind], result)}
+        record_type = DB.get_record_type(table_name)
+        return [record_type(row) for row in DB.get_result_iterator(sql, parameter)]
@@ -4,6 +4,7 @@ import re
 from src.container.page import Page
 from src.tools.config import Config
 from src.tools.match import Match
+from src.tools.metrics import Metrics
 from src.tools.template_config import TemplateConfig
 from src.tools.type import Type
 
@@ -18,6 +19,12 @@ class HtmlCreator(object):
         return
 
     def fix_image(self, content):
+        with Metrics.timer('html.fix_image'):
+            content = self.replace_image(content)
+        Metrics.count('html.page')
+        return content
+
+    def replace_image(self, content):
         content = Match.fix_html(content)
         for img in re.findall(r'<img[^>]*', content):
             # fix img
@@ -36,14 +43,9 @@ class HtmlCreator(object):
                     new_image = img + '</img>'
                     content = content.replace(img, new_image)
                     continue
-            src_download = HtmlCreator.fix_image_src(src)
+            src_download = HtmlCreator.get_image_href(src)
             if src_download:
-                if src_download.startswith('http'):
-                    filename = self.image_container.add(src_download)
-                else:
-                    # fix zhuanlan image href
-                    src_download = src_download.split('.')[0]
-                    filename = self.image_container.add('https://pic2.zhimg.com/'+src_download+'_b.jpg')
+                filename = self.image_container.add(src_download)
             else:
                 filename = ''
             new_image = img.replace('"{}"'.format(src), '"../images/{}"'.format(filename))
@@ -54,6 +56,58 @@ class HtmlCreator(object):
 
         return content
 
+    @staticmethod
+    def get_image_href(src):
+        u"""
+        按图片质量设置返回图片的实际下载地址，不需要下载时返回空字符串
+        """
+        src_download = HtmlCreator.fix_image_src(src)
+        if src_download.startswith('//'):
+            # 省略协议头的地址
+            src_download = 'https:' + src_download
+        if src_download and not src_download.startswith('http'):
+            # fix zhuanlan image href
+            src_download = 'https://pic2.zhimg.com/' + src_download.split('.')[0] + '_b.jpg'
+        return HtmlCreator.canonicalize_image_href(src_download)
+
+    @staticmethod
+    def canonicalize_image_href(href):
+        u"""
+        统一知乎图片的地址，使同一张图片只对应一个下载地址
+        *   pic1~pic4.zhimg.com为同一图床的镜像，统一为pic1.zhimg.com并使用https
+        *   _b/_r/_m为同一图片的不同尺寸，按图片质量设置统一为标清(_b)或原图(无后缀)
+        """
+        result = re.search(r'^(?:https?:)?//pic\d?\.zhimg\.com/(?P<path>[^?#]+)$', href)
+        if not result:
+            return href
+        path = result.group('path')
+        variant = re.search(r'_[brm](?P<ext>\.\w+)$', path)
+        if variant:
+            suffix = '_b' if Config.picture_quality == 1 else ''
+            path = path[:variant.start()] + suffix + variant.group('ext')
+        return 'https://pic1.zhimg.com/' + path
+
+    @staticmethod
+    def get_image_href_list(content):
+        u"""
+        提取内容中所有图片的下载地址，与fix_image中的规则一致，用于在抓取阶段预下载图片
+        """
+        href_list = []
+        for src in re.findall(r'<img[^>]*?src="([^"]*)"', content):
+            if not src.replace(' ', ''):
+                continue
+            href = HtmlCreator.get_image_href(src)
+            if href:
+                href_list.append(href)
+        return href_list
+
+    @staticmethod
+    def replace_image_filename(content, image_map):
+        u"""
+        将页面中引用的图片文件名替换为图片池中的实际文件名
+        """
+        return re.sub(r'(?<=\.\./images/)[^"\'<>\s]+', lambda x: image_map.get(x.group(0), x.group(0)), content)
+
     @staticmethod
     def fix_image_src(href):
         if Config.picture_quality == 0:
@@ -105,10 +159,11 @@ class HtmlCreator(object):
         question = package['question']
         answer_content = ''.join([self.create_answer(answer) for answer in package['answer_list']])
         title_info = self.wrap_title_info(**question)
-        question['answer'] = answer_content
-        question['question'] = self.get_template('info', 'title').format(**title_info)
+        # question为多个分卷共用的元数据，渲染结果不写回其中
+        question_content = dict(question, answer=answer_content,
+                                question=self.get_template('info', 'title').format(**title_info))
         result = {
-            'body': self.get_template('question', 'question').format(**question),
+            'body': self.get_template('question', 'question').format(**question_content),
             'title': question['title'],
         }
 
@@ -120,8 +175,7 @@ class HtmlCreator(object):
         return page
 
     def create_article(self, article, prefix=''):
-        article['edit_date'] = article['publish_date']
-        article['description'] = ''
+        article = dict(article, edit_date=article['publish_date'], description='')
         result = {
             'answer': self.create_answer(article),
             'question': self.get_template('info', 'title').format(**article)
@@ -157,6 +211,13 @@ class HtmlCreator(object):
             result['title'] = u'{creator_name}的专栏_{name}({column_id})'.format(**info)
         elif kind == Type.topic:
             result['title'] = u'知乎_话题_{title}({topic_id})'.format(**info)
+        elif kind == Type.search:
+            result['title'] = u'知乎回答搜索_{title}'.format(**info)
+            result['description'] = u''
+        elif kind == Type.search_article:
+            result['title'] = u'知乎文章搜索_{title}'.format(**info)
+            result['description'] = u''
+
         return result
 
     def create_info_page(self, book):
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
+import StringIO
 import traceback
 import urllib2
 import urllib
 import socket  # 用于捕获超时错误
+import threading
 import zlib
 import cookielib  # 用于生成cookie
 import time
@@ -11,9 +13,28 @@ import time
 from src.tools.config import Config
 from src.tools.db import DB
 from src.tools.debug import Debug
+from src.tools.match import Match
+from src.tools.metrics import Metrics
+from src.tools.session_pool import Session, SessionPool
 
 
 class Http(object):
+    chunk_size = 64 * 1024  # 下载文件时每次读取的字节数
+
+    # 同一任务内共享的网页内容，见get_shared_content
+    memo_lock = threading.Lock()
+    memo = {}  # 网址 => 网页内容
+    in_flight = {}  # 网址 => 正在进行的请求，{'event': 请求完成时触发的threading.Event, 'content': 网页内容}
+
+    # 响应码 => 会话状态，见SessionPool.report，其余错误均为failed
+    # 403也可能是单个答案/页面禁止访问，不能据此判断登录状态失效
+    session_status = {401: 'login_wall', 429: 'rate_limited'}
+
+    cookie_jar = cookielib.LWPCookieJar()  # 全进程共用的cookie，见set_cookie
+    cookie_opener = None
+    cookie_account = None  # 已载入cookie的账号，为None时尚未载入
+    saved_cookie = ''  # 最近一次载入或写回LoginRecord的cookie，用于判断cookie是否有变化
+
     @staticmethod
     def get_content(url='', data=None, timeout=Config.timeout_download_html, extra_header={}):
         u"""获取网页内容
@@ -33,7 +54,8 @@ class Http(object):
         # UA还是得要啊。。。
         # 没UA知乎分分钟只返回给你首页看- -
         header = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/46.0.2490.80 Safari/537.36', }
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/46.0.2490.80 Safari/537.36',
+            'Accept-Encoding': 'gzip, deflate', }
         header.update(extra_header)
 
         if data:
@@ -42,9 +64,71 @@ class Http(object):
         for key in header:
             request.add_header(key, header[key])
 
+        with Metrics.timer('http.get_content'):
+            content = Http.__open(request, url, timeout)
+        Metrics.count('http.request')
+        if content:
+            Metrics.count('http.bytes', len(content))
+        else:
+            Metrics.count('http.failed')
+        return content
+
+    @staticmethod
+    def get_shared_content(url, keep=True):
+        u"""
+        获取网页内容，同一任务中多次请求同一网址时只实际请求一次
+
+        *   多个线程同时请求同一网址时，只有第一个线程发出请求，其余线程等待其结果(请求合并)
+        *   抓取成功的内容暂存在Http.memo中，供抓取信息、计算页数、抓取第一页时复用，每个任务结束后由clear_memo清空
+        *   抓取失败时不做记录，由Control重试时重新请求
+
+        参数:
+            url     待打开的网址
+            keep    为False时取出内容后即从memo中删除，用于最后一次使用该网址的场合(如抓取答案列表)，避免网页内容在内存中保存两份
+        返回:
+            content 网页内容，失败时返回空字符串
+        """
+        with Http.memo_lock:
+            if url in Http.memo:
+                Metrics.count('http.memo_hit')
+                return Http.memo[url] if keep else Http.memo.pop(url)
+            request = Http.in_flight.get(url)
+            owner = request is None
+            if owner:
+                request = Http.in_flight[url] = {'event': threading.Event(), 'content': ''}
+
+        if not owner:
+            Metrics.count('http.coalesced')
+            request['event'].wait()
+            return request['content']
+
         try:
-            response = urllib2.urlopen(request, timeout=timeout)
+            request['content'] = Http.get_content(url)
+        finally:
+            with Http.memo_lock:
+                if request['content'] and keep:
+                    Http.memo[url] = request['content']
+                del Http.in_flight[url]
+            request['event'].set()
+        return request['content']
+
+    @staticmethod
+    def clear_memo():
+        with Http.memo_lock:
+            Http.memo = {}
+        return
+
+    @staticmethod
+    def __open(request, url, timeout):
+        session = SessionPool.acquire()
+        status = 'failed'
+        try:
+            if session:
+                response = session.opener.open(request, timeout=timeout)
+            else:
+                response = urllib2.urlopen(request, timeout=timeout)
         except urllib2.HTTPError as error:
+            status = Http.session_status.get(error.code, status)
             Debug.logger.info(u'网页打开失败')
             Debug.logger.info(u'失败页面:{}'.format(url))
             Debug.logger.info(u'失败代码:{}'.format(error.code))
@@ -64,63 +148,275 @@ class Http(object):
             Debug.logger.info(u'错误页面:{}'.format(url))
             Debug.logger.info(u'错误堆栈信息:{}'.format(traceback.format_exc()))
         else:
+            if session and Match.login_wall(response.geturl()):
+                SessionPool.report(session, 'login_wall')
+                Debug.logger.info(u'被重定向至登录页:{}'.format(url))
+                return ''
             content = Http.__unpack(response, url)
+            SessionPool.report(session, 'ok' if content else 'failed')
             return content
+        SessionPool.report(session, status)
         return ''
 
+    @staticmethod
+    def download(url, file_path, timeout=Config.timeout_download_picture):
+        u"""
+        将文件分块下载至file_path，不在内存中保存完整内容
+
+        file_path已存在时视为上次中断的下载，使用Range请求续传
+        *   首次下载时将服务器返回的ETag/Last-Modified保存在file_path + '.etag'中，续传时作为If-Range发送
+            服务器上的文件已变化时会返回完整的新文件，不会把新文件的后半段拼接到旧文件上
+        *   没有保存校验值时不续传，从头下载
+
+        参数:
+            url         待下载的网址
+            file_path   保存位置，一般为临时文件，下载完成后由调用方重命名
+            timeout     单次读取的超时秒数
+        返回:
+            bool        文件完整下载并通过Content-Length校验时返回True，失败时保留已下载部分以便续传
+        """
+        validator_path = file_path + '.etag'
+        downloaded = os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+        validator = ''
+        if downloaded and os.path.isfile(validator_path):
+            with open(validator_path) as validator_file:
+                validator = validator_file.read().strip()
+        request = urllib2.Request(url=url)
+        request.add_header('User-Agent',
+                           'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/46.0.2490.80 Safari/537.36')
+        if validator:
+            request.add_header('Range', 'bytes={}-'.format(downloaded))
+            request.add_header('If-Range', validator)
+
+        try:
+            response = urllib2.urlopen(request, timeout=timeout)
+        except urllib2.HTTPError as error:
+            error.close()
+            if error.code == 416:
+                # 续传起点超出文件长度，已下载的部分不可信，下次重新下载
+                Http.remove_file(file_path, validator_path)
+            Debug.logger.info(u'文件下载失败')
+            Debug.logger.info(u'失败地址:{}'.format(url))
+            Debug.logger.info(u'失败代码:{}'.format(error.code))
+            return False
+        except Exception as error:
+            Debug.logger.info(u'文件下载失败')
+            Debug.logger.info(u'失败地址:{}'.format(url))
+            Debug.logger.info(u'失败原因:{}'.format(error))
+            return False
+
+        try:
+            total = None
+            if response.getcode() == 206:
+                # Content-Range: bytes 起点-终点/总长度
+                content_range = response.info().get('Content-Range', '')
+                if content_range.endswith('*') or '/' not in content_range:
+                    total = None
+                else:
+                    total = int(content_range.split('/')[-1])
+                mode = 'ab'
+            else:
+                # 服务器不支持续传或文件已变化时从头下载
+                downloaded = 0
+                mode = 'wb'
+                Http.save_validator(response, validator_path)
+            if total is None and response.info().get('Content-Length'):
+                total = downloaded + int(response.info().get('Content-Length'))
+
+            with open(file_path, mode) as target:
+                while True:
+                    chunk = response.read(Http.chunk_size)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+        except Exception as error:
+            Debug.logger.info(u'文件下载中断，下次将从断点续传')
+            Debug.logger.info(u'中断地址:{}'.format(url))
+            Debug.logger.info(u'中断原因:{}'.format(error))
+            return False
+        finally:
+            response.close()
+
+        size = os.path.getsize(file_path)
+        if total is not None and size != total:
+            Debug.logger.info(u'文件长度校验失败:{}，应为{}字节，实际{}字节'.format(url, total, size))
+            if size > total:
+                Http.remove_file(file_path, validator_path)
+            return False
+        Http.remove_file(validator_path)
+        return True
+
+    @staticmethod
+    def save_validator(response, validator_path):
+        u"""
+        保存用于If-Range的校验值，弱ETag不能用于If-Range，此时改用Last-Modified，都没有时删除旧的校验值
+        """
+        etag = response.info().get('ETag', '')
+        validator = etag if etag and not etag.startswith('W/') else response.info().get('Last-Modified', '')
+        if not validator:
+            Http.remove_file(validator_path)
+            return
+        with open(validator_path, 'w') as validator_file:
+            validator_file.write(validator)
+        return
+
+    @staticmethod
+    def remove_file(*path_list):
+        for path in path_list:
+            if os.path.isfile(path):
+                os.remove(path)
+        return
+
     @staticmethod
     def __unpack(response, url=''):
+        u"""
+        分块读取网页内容，服务器启用gzip/deflate压缩时边读取边解压
+        *   运行统计
+            *   http.wire_bytes为实际传输的字节数，http.bytes(见get_content)为解压后的字节数
+        """
         if not response:
             return ''
 
+        decompressor = Http.__get_decompressor(response.info().get('Content-Encoding', ''))
+        chunk_list = []
+        wire_bytes = 0
         try:
-            content = response.read()
+            while True:
+                chunk = response.read(Http.chunk_size)
+                if not chunk:
+                    break
+                wire_bytes += len(chunk)
+                chunk_list.append(decompressor.decompress(chunk) if decompressor else chunk)
+            if decompressor:
+                chunk_list.append(decompressor.flush())
         except socket.timeout as error:
             Debug.logger.info(u'打开网页超时')
             Debug.logger.info(u'超时页面:{}'.format(url))
+        except zlib.error as error:
+            Debug.logger.info(u'解压出错')
+            Debug.logger.info(u'出错页面:{}'.format(url))
+            Debug.logger.info(u'错误信息:{}'.format(error))
         except Exception:
             Debug.logger.info(u'未知错误')
             Debug.logger.info(u'报错页面:{}'.format(url))
         else:
-            decode = response.info().get(u"Content-Encoding")
-            if decode and u"gzip" in decode:
-                content = Http.__ungzip(content)
-            return content
+            Metrics.count('http.wire_bytes', wire_bytes)
+            return ''.join(chunk_list)
         return ''
 
     @staticmethod
-    def __ungzip(content):
-        try:
-            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
-        except zlib.error as error:
-            Debug.logger.info(u'解压出错')
-            Debug.logger.info(u'错误信息:{}'.format(error))
-            return ''
-        return content
+    def __get_decompressor(encoding):
+        u"""
+        *   gzip
+            *   wbits取16 + MAX_WBITS，按gzip格式解压
+        *   deflate
+            *   按标准应为zlib格式，但有些服务器直接返回裸deflate数据，wbits取32 + MAX_WBITS也无法识别后者，
+                因此由DeflateDecompressor根据第一块数据判断
+        """
+        encoding = encoding.lower()
+        if 'gzip' in encoding:
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if 'deflate' in encoding:
+            return DeflateDecompressor()
+        return None
 
     @staticmethod
     def set_cookie(account=''):
-        def load_cookie(cookieJar, cookie):
-            filename = u'./theFileNameIsSoLongThatYouWontKnowWhatIsThat.txt'
-            with open(filename, 'w') as f:
-                f.write(cookie)
-            cookieJar.load(filename)
-            os.remove(filename)
-            return
+        u"""
+        从LoginRecord中读取cookie，载入全进程共用的Http.cookie_jar
+
+        *   cookie直接在内存中解析，不再写入临时文件
+        *   已载入同一账号(未指定账号时为任意账号)的cookie时直接返回，各个Worker共用同一个jar与opener
+        *   抓取过程中服务器通过Set-Cookie更新的cookie由save_cookie批量写回数据库
 
-        jar = cookielib.LWPCookieJar()
+        参数:
+            account 账号，为空时使用最近一次登录的记录
+        """
+        if Config.max_session > 1 and not account:
+            Http.init_session_pool()
+            return
+        if Http.cookie_account is not None and account in ('', Http.cookie_account):
+            return
         if account:
             result = DB.cursor.execute(
-                "select cookieStr, recordDate from LoginRecord order by recordDate desc where account = `{}`".format(
-                    account))
+                "select account, cookieStr from LoginRecord where account = ? order by recordDate desc", (account,))
         else:
-            result = DB.cursor.execute("select cookieStr, recordDate from LoginRecord order by recordDate desc")
-
+            result = DB.cursor.execute("select account, cookieStr from LoginRecord order by recordDate desc")
         result = result.fetchone()
-        cookie = result[0]
-        load_cookie(jar, cookie)
-        opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(jar))
-        urllib2.install_opener(opener)
+        if not result:
+            Debug.logger.info(u'没有找到登录记录，将以未登录状态抓取')
+            return
+        account, cookie = result
+        Http.cookie_jar.clear()
+        Http.load_cookie(Http.cookie_jar, cookie)
+        Http.cookie_account, Http.saved_cookie = account, Http.dump_cookie(Http.cookie_jar)
+        Http.install_cookie_opener()
+        return
+
+    @staticmethod
+    def init_session_pool():
+        u"""
+        从LoginRecord中读取最近登录的Config.max_session个账号，载入SessionPool，之后的网页请求由各账号轮流发出
+        """
+        if SessionPool.is_enabled():
+            return
+        result = DB.cursor.execute("select account, cookieStr from LoginRecord order by recordDate desc limit ?",
+                                   (Config.max_session,))
+        for (account, cookie) in result.fetchall():
+            jar = cookielib.LWPCookieJar()
+            Http.load_cookie(jar, cookie)
+            SessionPool.add(Session(account, jar, Http.dump_cookie(jar)))
+        Debug.logger.info(u'共载入{}个账号的登录记录'.format(len(SessionPool.session_list)))
+        return
+
+    @staticmethod
+    def install_cookie_opener():
+        u"""
+        安装使用Http.cookie_jar的opener，整个进程只安装一次，所有线程共用
+        """
+        if Http.cookie_opener is None:
+            Http.cookie_opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(Http.cookie_jar))
+        urllib2.install_opener(Http.cookie_opener)
+        return
+
+    @staticmethod
+    def load_cookie(jar, cookie):
+        u"""
+        将LWP格式的cookie字符串载入jar，等同于LWPCookieJar.load，但不需要经过文件
+        """
+        jar._really_load(StringIO.StringIO(cookie), '<LoginRecord>', ignore_discard=False, ignore_expires=False)
+        return
+
+    @staticmethod
+    def dump_cookie(jar):
+        u"""
+        将jar中的cookie转为LWP格式的字符串，与LWPCookieJar.save写入文件的内容一致
+        """
+        return '#LWP-Cookies-2.0\n' + jar.as_lwp_str(ignore_discard=False, ignore_expires=False)
+
+    @staticmethod
+    def save_cookie():
+        u"""
+        将抓取过程中更新过的cookie写回LoginRecord，每个任务结束后调用一次，而不是每个请求都写一次数据库
+        *   启用SessionPool时逐个会话写回
+        """
+        if Http.cookie_account is not None:
+            cookie = Http.dump_cookie(Http.cookie_jar)
+            if cookie != Http.saved_cookie:
+                Http.update_cookie(Http.cookie_account, cookie)
+                Http.saved_cookie = cookie
+        for session in SessionPool.session_list:
+            cookie = Http.dump_cookie(session.jar)
+            if cookie != session.saved_cookie:
+                Http.update_cookie(session.account, cookie)
+                session.saved_cookie = cookie
+        DB.commit()
+        return
+
+    @staticmethod
+    def update_cookie(account, cookie):
+        DB.cursor.execute('update LoginRecord set cookieStr = ? where account = ?', (cookie, account))
+        Debug.logger.debug(u'账号{}的cookie已更新'.format(account))
         return
 
     @staticmethod
@@ -130,3 +426,27 @@ class Http(object):
                                   secure=False, expires=time.time() + 300000000, discard=False, comment=None,
                                   comment_url=None, rest={})
         return cookie
+
+
+class DeflateDecompressor(object):
+    u"""
+    兼容zlib格式与裸deflate格式的增量解压器，接口与zlib.decompressobj的返回值一致
+    """
+
+    def __init__(self):
+        self.decompressor = None
+        return
+
+    def decompress(self, chunk):
+        if self.decompressor is None:
+            self.decompressor = zlib.decompressobj()
+            try:
+                return self.decompressor.decompress(chunk)
+            except zlib.error:
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.decompressor.decompress(chunk)
+
+    def flush(self):
+        if self.decompressor is None:
+            return ''
+        return self.decompressor.flush()
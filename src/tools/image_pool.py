@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from src.tools.config import Config
+from src.tools.debug import Debug
+from src.tools.http import Http
+from src.tools.path import Path
+
+
+class ImagePool(object):
+    u"""
+    知乎图片池
+    *   图片按文件名前两位分散存放在子目录中，避免单个目录下文件过多
+    *   图片大小、最近使用时间、被电子书引用的次数记录在独立的sqlite索引中，判断图片是否已下载时不必访问磁盘
+    *   图片池总大小超过Config.image_pool_max_size后，优先删除最久未使用的图片
+    *   新下载的图片以内容的md5命名，内容相同的图片只保存一份，
+        按图片地址生成的文件名通过ImageAlias表映射到实际文件
+    """
+    conn = None
+    lock = threading.RLock()  # 图片在多个线程中同时下载，索引的读写需要加锁
+    shard_set = set()  # 已创建的子目录
+
+    @staticmethod
+    def get_conn():
+        with ImagePool.lock:
+            if not ImagePool.conn:
+                ImagePool.init()
+        return ImagePool.conn
+
+    @staticmethod
+    def init():
+        u"""
+        打开图片池索引，首次使用时将旧版图片池中的图片移入子目录并建立索引
+        """
+        with ImagePool.lock:
+            # 分布式抓取时多个进程共用同一图片池，与数据库一样适当延长等待锁的时间
+            ImagePool.conn = sqlite3.connect(Path.image_pool_db_path, timeout=60, check_same_thread=False)
+            ImagePool.conn.text_factory = str
+            ImagePool.shard_set = set()
+            is_new = not ImagePool.conn.execute(
+                "select count(*) from sqlite_master where type = 'table' and name = 'ImagePool'").fetchone()[0]
+            ImagePool.conn.executescript('''
+                create table if not exists ImagePool (
+                    filename text primary key not null,
+                    size integer not null default 0,
+                    last_access integer not null default 0,
+                    ref_count integer not null default 0
+                );
+                create index if not exists ImagePoolLastAccess on ImagePool (last_access, ref_count);
+                create table if not exists ImageAlias (
+                    filename text primary key not null,
+                    image text not null
+                );
+                create index if not exists ImageAliasImage on ImageAlias (image);
+            ''')
+            if is_new:
+                ImagePool.import_flat_file()
+            ImagePool.conn.commit()
+        return
+
+    @staticmethod
+    def get_path(filename):
+        shard_path = Path.image_pool_path + u'/' + filename[:2]
+        if shard_path not in ImagePool.shard_set:
+            Path.mkdir(shard_path)
+            ImagePool.shard_set.add(shard_path)
+        return shard_path + u'/' + filename
+
+    @staticmethod
+    def resolve(filename):
+        u"""
+        返回图片在图片池中的实际文件名，图片不存在时返回空字符串
+        *   旧版下载的图片直接以地址的md5命名，没有对应的ImageAlias记录
+        """
+        with ImagePool.lock:
+            row = ImagePool.get_conn().execute(
+                'select image from ImageAlias where filename = ? union all select filename from ImagePool where filename = ?',
+                (filename, filename)).fetchone()
+        return row[0] if row else ''
+
+    @staticmethod
+    def contains(filename):
+        return bool(ImagePool.resolve(filename))
+
+    @staticmethod
+    def add_file(filename, file_path):
+        u"""
+        将下载完成的图片移入图片池，内容已存在时只记录映射关系并删除该文件
+        *   返回
+            *   图片在图片池中的实际文件名
+        """
+        encrypt = hashlib.md5()
+        with open(file_path, 'rb') as image:
+            for chunk in iter(lambda: image.read(Http.chunk_size), ''):
+                encrypt.update(chunk)
+        image = encrypt.hexdigest() + '.jpg'
+        size = os.path.getsize(file_path)
+        with ImagePool.lock:
+            conn = ImagePool.get_conn()
+            if conn.execute('select 1 from ImagePool where filename = ?', (image,)).fetchone():
+                os.remove(file_path)
+            else:
+                os.rename(file_path, ImagePool.get_path(image))
+                # 其它进程可能已同时移入内容相同的图片
+                conn.execute('insert or ignore into ImagePool (filename, size, last_access) values (?, ?, ?)',
+                             (image, size, int(time.time())))
+            conn.execute('replace into ImageAlias (filename, image) values (?, ?)', (filename, image))
+            conn.commit()
+        return image
+
+    @staticmethod
+    def touch(filename_list):
+        u"""
+        图片被打包进电子书后更新其最近使用时间与引用次数
+        """
+        now = int(time.time())
+        with ImagePool.lock:
+            conn = ImagePool.get_conn()
+            conn.executemany('update ImagePool set last_access = ?, ref_count = ref_count + 1 where filename = ?',
+                             [(now, filename) for filename in filename_list])
+            conn.commit()
+        return
+
+    @staticmethod
+    def evict():
+        u"""
+        按最近使用时间从旧到新删除图片，直至图片池总大小不超过容量上限
+        *   返回
+            *   删除的图片数
+        """
+        max_size = Config.image_pool_max_size
+        if not max_size:
+            return 0
+        with ImagePool.lock:
+            conn = ImagePool.get_conn()
+            total_size = conn.execute('select coalesce(sum(size), 0) from ImagePool').fetchone()[0]
+            if total_size <= max_size:
+                return 0
+            evict_list = []
+            for (filename, size) in conn.execute(
+                    'select filename, size from ImagePool order by last_access, ref_count'):
+                if total_size <= max_size:
+                    break
+                evict_list.append((filename,))
+                total_size -= size
+            for (filename,) in evict_list:
+                try:
+                    os.remove(ImagePool.get_path(filename))
+                except OSError:
+                    pass
+            conn.executemany('delete from ImagePool where filename = ?', evict_list)
+            conn.executemany('delete from ImageAlias where image = ?', evict_list)
+            conn.commit()
+        Debug.logger.info(u'图片池超出容量上限，已清理{}张最久未使用的图片'.format(len(evict_list)))
+        return len(evict_list)
+
+    @staticmethod
+    def import_flat_file():
+        u"""
+        旧版图片池中所有图片都直接存放在图片池目录下，将其移入对应的子目录并建立索引
+        *   返回
+            *   导入的图片数
+        """
+        record_list = []
+        for filename in os.listdir(Path.image_pool_path):
+            file_path = Path.image_pool_path + u'/' + filename
+            if not os.path.isfile(file_path):
+                continue
+            new_path = ImagePool.get_path(filename)
+            os.rename(file_path, new_path)
+            stat = os.stat(new_path)
+            record_list.append((filename, stat.st_size, int(stat.st_mtime)))
+        if record_list:
+            Debug.logger.info(u'已将{}张图片移入图片池子目录'.format(len(record_list)))
+        with ImagePool.lock:
+            ImagePool.get_conn().executemany(
+                'insert or ignore into ImagePool (filename, size, last_access) values (?, ?, ?)', record_list)
+        return len(record_list)
+
+    @staticmethod
+    def compact():
+        u"""
+        维护命令，整理图片池
+        *   导入图片池目录下未归入子目录的图片
+        *   按子目录逐个核对索引与磁盘上的文件，补录未记录的图片，删除文件已丢失的记录
+        *   按容量上限清理旧图片，并压缩索引文件
+        """
+        with ImagePool.lock:
+            conn = ImagePool.get_conn()
+            import_count = ImagePool.import_flat_file()
+            add_count = 0
+            remove_count = 0
+            for shard in sorted(os.listdir(Path.image_pool_path)):
+                shard_path = Path.image_pool_path + u'/' + shard
+                if not os.path.isdir(shard_path):
+                    continue
+                file_set = set()
+                for filename in os.listdir(shard_path):
+                    if filename.endswith((u'.part', u'.part.etag')):
+                        # 未下载完成的临时文件及其续传校验值
+                        os.remove(shard_path + u'/' + filename)
+                    else:
+                        file_set.add(filename)
+                # 子目录名即文件名前两位，按范围查询可以用上主键索引
+                record_set = set(row[0] for row in conn.execute(
+                    'select filename from ImagePool where filename >= ? and filename < ?',
+                    (shard, shard[:-1] + unichr(ord(shard[-1]) + 1))))
+                add_list = []
+                for filename in file_set - record_set:
+                    stat = os.stat(shard_path + u'/' + filename)
+                    add_list.append((filename, stat.st_size, int(stat.st_mtime)))
+                remove_list = [(filename,) for filename in record_set - file_set]
+                conn.executemany('insert or ignore into ImagePool (filename, size, last_access) values (?, ?, ?)',
+                                 add_list)
+                conn.executemany('delete from ImagePool where filename = ?', remove_list)
+                add_count += len(add_list)
+                remove_count += len(remove_list)
+            conn.execute('delete from ImageAlias where image not in (select filename from ImagePool)')
+            conn.commit()
+            evict_count = ImagePool.evict()
+            conn.execute('vacuum')
+            image_count, total_size = conn.execute('select count(*), coalesce(sum(size), 0) from ImagePool').fetchone()
+        Debug.logger.info(u'图片池整理完毕：导入{}张，补录{}张，移除失效记录{}条，清理旧图片{}张'.format(
+            import_count, add_count, remove_count, evict_count))
+        Debug.logger.info(u'图片池现有图片{}张，共{:.1f}MB'.format(image_count, total_size / 1024.0 / 1024))
+        return
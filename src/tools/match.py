@@ -38,6 +38,21 @@ class Match(object):
     def column(content=''):
         return re.search(r'(?<=zhuanlan\.zhihu\.com/)(?P<column_id>[^/\n\r]*)', content)
 
+    @staticmethod
+    def column_api(content=''):
+        return re.search(r'(?<=zhuanlan\.zhihu\.com/api/columns/)(?P<column_id>[^/?\n\r]*)', content)
+
+    @staticmethod
+    def login_wall(content=''):
+        u"""
+        未登录或登录状态失效时，知乎会将请求重定向至登录页
+        """
+        return re.search(r'zhihu\.com/(?:signin|login)(?:[/?#]|$)', content)
+
+    @staticmethod
+    def search(content=''):
+        return re.search(r'^search:(?P<keyword>.+)', content)
+
     @staticmethod
     def html_body(content=''):
         return re.search('(?<=<body>).*(?=</body>)', content, re.S).group(0)
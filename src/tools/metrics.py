@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+import random
+import threading
+import time
+
+from src.tools.config import Config
+
+
+class MetricsTimer(object):
+    u"""
+    配合with语句使用，将代码块的耗时(秒)记入同名直方图
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0
+        return
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        Metrics.observe(self.name, time.time() - self.start)
+        return False
+
+
+class MetricsHistogram(object):
+    u"""
+    有界直方图，只保存 次数/总和/最小值/最大值 与至多sample_size个观测值的蓄水池样本，长时间运行时内存不会增长
+    *   观测值不超过sample_size个时样本即为全部观测值，分位数是精确的，超出后分位数由样本估算
+    """
+    sample_size = 1000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sample = []
+        return
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.sample) < self.sample_size:
+            self.sample.append(value)
+            return
+        # 蓄水池抽样，第count个观测值以sample_size/count的概率替换样本中的一个
+        index = random.randint(0, self.count - 1)
+        if index < self.sample_size:
+            self.sample[index] = value
+        return
+
+    def merge(self, histogram):
+        u"""
+        将另一个直方图计入当前直方图，样本按两者的观测次数加权抽取
+        """
+        if not histogram.count:
+            return
+        if len(self.sample) + len(histogram.sample) <= self.sample_size:
+            sample = self.sample + histogram.sample
+        else:
+            sample = []
+            sample_a, sample_b = list(self.sample), list(histogram.sample)
+            random.shuffle(sample_a)
+            random.shuffle(sample_b)
+            while len(sample) < self.sample_size and (sample_a or sample_b):
+                if sample_a and (not sample_b or random.random() * (self.count + histogram.count) < self.count):
+                    sample.append(sample_a.pop())
+                else:
+                    sample.append(sample_b.pop())
+        self.count += histogram.count
+        self.total += histogram.total
+        self.min = histogram.min if self.min is None else min(self.min, histogram.min)
+        self.max = histogram.max if self.max is None else max(self.max, histogram.max)
+        self.sample = sample
+        return
+
+
+class Metrics(object):
+    u"""
+    运行统计，用于分析时间花在了抓取、解析、入库、渲染、下载图片还是打包上
+    *   counter
+        *   计数器，名称 => 累计值，如请求数、字节数
+    *   histogram
+        *   直方图，名称 => MetricsHistogram，目前只用于记录耗时(秒)，输出时给出分位数
+    *   每本电子书(ReadList中的一行)生成完毕后调用finish_book输出该书的统计并清空，程序退出前调用print_summary输出全部统计
+    *   线程池中的任务会并发记录，所有修改都在锁内进行
+    *   Config.record_metrics为False时不记录任何数据
+    """
+    lock = threading.Lock()
+    counter = {}
+    histogram = {}
+    total_counter = {}
+    total_histogram = {}
+    percentile_list = (50, 90, 99)
+
+    @staticmethod
+    def count(name, value=1):
+        if not Config.record_metrics:
+            return
+        with Metrics.lock:
+            Metrics.counter[name] = Metrics.counter.get(name, 0) + value
+        return
+
+    @staticmethod
+    def observe(name, value):
+        if not Config.record_metrics:
+            return
+        with Metrics.lock:
+            if name not in Metrics.histogram:
+                Metrics.histogram[name] = MetricsHistogram()
+            Metrics.histogram[name].add(value)
+        return
+
+    @staticmethod
+    def timer(name):
+        return MetricsTimer(name)
+
+    @staticmethod
+    def get_percentile(sorted_value_list, percent):
+        u"""
+        按最近秩法计算分位数，sorted_value_list需已排序且不为空
+        """
+        index = int(math.ceil(percent / 100.0 * len(sorted_value_list))) - 1
+        return sorted_value_list[min(max(index, 0), len(sorted_value_list) - 1)]
+
+    @staticmethod
+    def summarize(histogram):
+        value_list = sorted(histogram.sample)
+        summary = {
+            'count': histogram.count,
+            'total': histogram.total,
+            'min': histogram.min,
+            'max': histogram.max,
+            'mean': histogram.total / histogram.count,
+        }
+        for percent in Metrics.percentile_list:
+            summary['p{}'.format(percent)] = Metrics.get_percentile(value_list, percent)
+        return summary
+
+    @staticmethod
+    def get_report(counter, histogram):
+        return {
+            'counter': dict(counter),
+            'histogram': dict((name, Metrics.summarize(value)) for (name, value) in histogram.items() if value.count),
+        }
+
+    @staticmethod
+    def finish_book(file_path, extra_info=None):
+        u"""
+        将当前这本电子书的统计写入file_path(json格式)，并计入总计后清空
+        """
+        if not Config.record_metrics:
+            return
+        with Metrics.lock:
+            counter, histogram = Metrics.counter, Metrics.histogram
+            Metrics.counter, Metrics.histogram = {}, {}
+        for (name, value) in counter.items():
+            Metrics.total_counter[name] = Metrics.total_counter.get(name, 0) + value
+        for (name, value) in histogram.items():
+            if name not in Metrics.total_histogram:
+                Metrics.total_histogram[name] = MetricsHistogram()
+            Metrics.total_histogram[name].merge(value)
+        report = Metrics.get_report(counter, histogram)
+        report.update(extra_info or {})
+        with open(file_path, 'w') as output:
+            json.dump(report, output, indent=4, sort_keys=True)
+        return
+
+    @staticmethod
+    def get_summary():
+        u"""
+        返回全部统计的文字说明，每个计数器/直方图一行，耗时以毫秒显示
+        """
+        report = Metrics.get_report(Metrics.total_counter, Metrics.total_histogram)
+        line_list = []
+        for name in sorted(report['counter']):
+            line_list.append(u'{:<32}{:>12}'.format(name, report['counter'][name]))
+        for name in sorted(report['histogram']):
+            summary = report['histogram'][name]
+            percentile = u'  '.join(u'p{}={:.1f}ms'.format(x, summary['p{}'.format(x)] * 1000) for x in
+                                    Metrics.percentile_list)
+            line_list.append(u'{:<32}{:>8}次  共{:.2f}s  {}  max={:.1f}ms'.format(
+                name, summary['count'], summary['total'], percentile, summary['max'] * 1000))
+        return line_list
+
+    @staticmethod
+    def print_summary():
+        if not (Config.record_metrics and (Metrics.total_counter or Metrics.total_histogram)):
+            return
+        print u'运行统计'
+        for line in Metrics.get_summary():
+            print u'    ' + line
+        return
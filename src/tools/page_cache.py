@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.tools.config import Config
+from src.tools.content_compressor import ContentCompressor
+from src.tools.debug import Debug
+from src.tools.metrics import Metrics
+from src.tools.path import Path
+from src.tools.template_config import TemplateConfig
+
+
+class PageCache(object):
+    u"""
+    渲染结果缓存，重新生成电子书时，内容没有变化的问题/文章页面直接复用上次渲染的xhtml
+    *   缓存键由 页面类型、问题/文章id、页面中各条记录的指纹、模板版本、图片质量 计算得出
+        *   记录的指纹为除正文外的所有字段，其中fingerprint为正文的md5，赞同数、评论数等变化时页面同样需要重新渲染
+        *   旧版数据库中没有正文指纹的答案/文章不使用缓存
+        *   模板版本为所有模板文件内容的md5，修改模板后缓存自动失效
+    *   缓存内容为压缩后的最终xhtml与页面中的图片地址，命中时将图片重新加入ImageContainer
+    *   与图片池一样使用独立的sqlite文件，总大小超过Config.page_cache_max_size后优先删除最久未使用的页面
+    """
+    version = 1  # 渲染逻辑变化时修改，使已有缓存全部失效
+    batch_size = 500  # get_batch中单条sql最多绑定的参数数
+    conn = None
+    lock = threading.RLock()  # 后台服务模式中生成电子书的线程与启动时的主线程不同
+
+    @staticmethod
+    def get_conn():
+        with PageCache.lock:
+            if not PageCache.conn:
+                PageCache.init()
+        return PageCache.conn
+
+    @staticmethod
+    def init():
+        with PageCache.lock:
+            PageCache.conn = sqlite3.connect(Path.page_cache_db_path, check_same_thread=False)
+            PageCache.conn.text_factory = str
+            PageCache.conn.executescript('''
+                create table if not exists PageCache (
+                    key text primary key not null,
+                    content blob not null,
+                    image_list text not null default '[]',
+                    size integer not null default 0,
+                    last_access integer not null default 0
+                );
+                create index if not exists PageCacheLastAccess on PageCache (last_access);
+            ''')
+            PageCache.conn.commit()
+        return
+
+    @staticmethod
+    def get_template_version():
+        u"""
+        所有模板文件内容的md5，每次生成电子书时重新计算，后台服务模式中修改模板后同样生效
+        """
+        encrypt = hashlib.md5()
+        for key in sorted(TemplateConfig.__dict__):
+            if not key.endswith('_uri'):
+                continue
+            file_path = getattr(TemplateConfig, key)
+            if os.path.isfile(file_path):
+                with open(file_path) as template:
+                    encrypt.update(template.read())
+        return encrypt.hexdigest()
+
+    @staticmethod
+    def get_key(kind, item_id, record_list, template_version):
+        u"""
+        *   kind
+            *   页面类型，question/article
+        *   record_list
+            *   页面中的所有记录，问题页面为问题及其下的答案，文章页面为文章本身
+        *   返回
+            *   缓存键，未开启缓存或记录缺少正文指纹时返回空字符串
+        """
+        if not Config.page_cache:
+            return ''
+        encrypt = hashlib.md5()
+        encrypt.update(repr((PageCache.version, kind, str(item_id), template_version, Config.picture_quality)))
+        for record in record_list:
+            if record.get('fingerprint') == '':
+                return ''
+            encrypt.update(repr([(key, record[key]) for key in record.keys() if key != 'content']))
+        return encrypt.hexdigest()
+
+    @staticmethod
+    def get_batch(key_list):
+        u"""
+        *   返回
+            *   缓存键 => (xhtml, 图片地址列表)，只包含命中的页面
+        """
+        result = {}
+        key_list = [key for key in key_list if key]
+        with PageCache.lock:
+            conn = PageCache.get_conn()
+            for start in range(0, len(key_list), PageCache.batch_size):
+                batch = key_list[start:start + PageCache.batch_size]
+                sql = 'select key, content, image_list from PageCache where key in ({})'.format(
+                    ','.join('?' * len(batch)))
+                for (key, content, image_list) in conn.execute(sql, tuple(batch)):
+                    result[key] = (ContentCompressor.decode(content, ContentCompressor.format_zlib),
+                                   json.loads(image_list))
+            now = int(time.time())
+            conn.executemany('update PageCache set last_access = ? where key = ?', [(now, key) for key in result])
+            conn.commit()
+        Metrics.count('page_cache.hit', len(result))
+        Metrics.count('page_cache.miss', len(key_list) - len(result))
+        return result
+
+    @staticmethod
+    def put(key, content, image_list):
+        u"""
+        写入一个页面，需调用commit提交
+        """
+        if not key:
+            return
+        content = ContentCompressor.encode(content, compress=True)[0]
+        with PageCache.lock:
+            PageCache.get_conn().execute(
+                'replace into PageCache (key, content, image_list, size, last_access) values (?, ?, ?, ?, ?)',
+                (key, content, json.dumps(image_list), len(content), int(time.time())))
+        return
+
+    @staticmethod
+    def commit():
+        with PageCache.lock:
+            PageCache.get_conn().commit()
+        return
+
+    @staticmethod
+    def evict():
+        u"""
+        按最近使用时间从旧到新删除页面，直至缓存总大小不超过容量上限
+        *   返回
+            *   删除的页面数
+        """
+        max_size = Config.page_cache_max_size
+        if not max_size:
+            return 0
+        with PageCache.lock:
+            conn = PageCache.get_conn()
+            total_size = conn.execute('select coalesce(sum(size), 0) from PageCache').fetchone()[0]
+            if total_size <= max_size:
+                return 0
+            evict_list = []
+            for (key, size) in conn.execute('select key, size from PageCache order by last_access'):
+                if total_size <= max_size:
+                    break
+                evict_list.append((key,))
+                total_size -= size
+            conn.executemany('delete from PageCache where key = ?', evict_list)
+            conn.commit()
+        Debug.logger.info(u'页面缓存超出容量上限，已清理{}个最久未使用的页面'.format(len(evict_list)))
+        return len(evict_list)
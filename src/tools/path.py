@@ -12,12 +12,18 @@ class Path(object):
     config_path = base_path + u'/config.json'
     db_path = base_path + u'/zhihuDB_173_1.db'
     sql_path = base_path + u'/db/zhihuhelp.sql'
+    index_sql_path = base_path + u'/db/index.sql'
 
     www_css = base_path + u'/www/css'
     www_image = base_path + u'/www/images'
 
     html_pool_path = base_path + u'/知乎电子书临时资源库/知乎网页池'
     image_pool_path = base_path + u'/知乎电子书临时资源库/知乎图片池'
+    image_pool_db_path = base_path + u'/知乎电子书临时资源库/image_pool.db'  # 图片池索引
+    page_cache_db_path = base_path + u'/知乎电子书临时资源库/page_cache.db'  # 渲染后的页面缓存
+    metrics_path = base_path + u'/知乎电子书临时资源库/运行统计'  # 每本电子书的运行统计
+    profile_path = base_path + u'/知乎电子书临时资源库/性能分析'  # Config.profile开启时的分析结果
+    work_queue_path = base_path + u'/知乎电子书临时资源库/work_queue.db'  # 分布式抓取的默认任务队列
     result_path = base_path + u'/知乎助手生成的电子书'
 
     @staticmethod
@@ -82,12 +88,18 @@ class Path(object):
         Path.config_path = Path.base_path + u'/config.json'
         Path.db_path = Path.base_path + u'/zhihuDB_173_1.db'
         Path.sql_path = Path.base_path + u'/db/zhihuhelp.sql'
+        Path.index_sql_path = Path.base_path + u'/db/index.sql'
 
         Path.www_css = Path.base_path + u'/www/css'
         Path.www_image = Path.base_path + u'/www/images'
 
         Path.html_pool_path = Path.base_path + u'/知乎电子书临时资源库/知乎网页池'
         Path.image_pool_path = Path.base_path + u'/知乎电子书临时资源库/知乎图片池'
+        Path.image_pool_db_path = Path.base_path + u'/知乎电子书临时资源库/image_pool.db'
+        Path.page_cache_db_path = Path.base_path + u'/知乎电子书临时资源库/page_cache.db'
+        Path.metrics_path = Path.base_path + u'/知乎电子书临时资源库/运行统计'
+        Path.profile_path = Path.base_path + u'/知乎电子书临时资源库/性能分析'
+        Path.work_queue_path = Path.base_path + u'/知乎电子书临时资源库/work_queue.db'
         Path.result_path = Path.base_path + u'/知乎助手生成的电子书'
 
         return
@@ -100,6 +112,8 @@ class Path(object):
         Path.chdir(u'./知乎电子书临时资源库')
         Path.mkdir(u'./知乎网页池')
         Path.mkdir(u'./知乎图片池')
+        Path.mkdir(u'./运行统计')
+        Path.mkdir(u'./性能分析')
         Path.reset_path()
         return
 
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import cProfile
+import os
+import pstats
+import StringIO
+import sys
+import threading
+
+from src.tools.config import Config
+
+
+class ProfilerStage(object):
+    u"""
+    配合with语句使用，在代码块执行期间启用对应阶段的cProfile
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = None
+        return
+
+    def __enter__(self):
+        if Config.profile:
+            self.profile = Profiler.get_profile(self.name)
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *args):
+        if self.profile:
+            self.profile.disable()
+        return False
+
+
+class ThreadSampler(threading.Thread):
+    u"""
+    定时采样线程池中各线程的调用栈，用于查看抓取线程阻塞在哪里
+    *   cProfile只能记录调用它的线程，线程池中的任务需要靠采样观察
+    *   只统计栈中含有项目代码(src目录下)的样本，线程池中空闲等待任务的线程不计入
+    """
+    interval = 0.005  # 采样间隔，单位为秒
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stop_event = threading.Event()
+        self.ignore_thread_set = set([threading.current_thread().ident])
+        self.sample_count = 0
+        self.stack_counter = {}
+        return
+
+    def run(self):
+        self.ignore_thread_set.add(threading.current_thread().ident)
+        source_path = os.sep + 'src' + os.sep
+        while not self.stop_event.wait(ThreadSampler.interval):
+            for (thread_id, frame) in sys._current_frames().items():
+                if thread_id in self.ignore_thread_set:
+                    continue
+                stack = []
+                in_source = False
+                while frame:
+                    code = frame.f_code
+                    in_source = in_source or (source_path in code.co_filename)
+                    stack.append('{}:{}({})'.format(os.path.basename(code.co_filename), frame.f_lineno, code.co_name))
+                    frame = frame.f_back
+                if not in_source:
+                    continue
+                stack = tuple(reversed(stack))
+                self.stack_counter[stack] = self.stack_counter.get(stack, 0) + 1
+                self.sample_count += 1
+        return
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        return
+
+    def write_report(self, file_path, top_count):
+        u"""
+        输出两部分
+        *   按线程当时所在的函数(栈顶)统计的样本数
+        *   按完整调用栈统计的样本数，每行为『栈底;...;栈顶 样本数』，可直接交给flamegraph.pl生成火焰图
+        """
+        leaf_counter = {}
+        for (stack, count) in self.stack_counter.items():
+            leaf_counter[stack[-1]] = leaf_counter.get(stack[-1], 0) + count
+        with open(file_path, 'w') as report:
+            report.write('total samples: {}, interval: {}s\n\n'.format(self.sample_count, ThreadSampler.interval))
+            report.write('top functions:\n')
+            for (leaf, count) in sorted(leaf_counter.items(), key=lambda x: -x[1])[:top_count]:
+                report.write('{:>8}  {:>6.1%}  {}\n'.format(count, count / float(self.sample_count), leaf))
+            report.write('\nstacks:\n')
+            for (stack, count) in sorted(self.stack_counter.items(), key=lambda x: -x[1]):
+                report.write('{} {}\n'.format(';'.join(stack), count))
+        return
+
+
+class Profiler(object):
+    u"""
+    按阶段分析耗时，由Config.profile开启
+    *   每个阶段使用独立的cProfile，同一本电子书(ReadList中的一行)内同名阶段的数据累加
+    *   每本电子书完成后，在知乎电子书临时资源库/性能分析下输出
+        *   {书号}_{阶段名}.prof，可用pstats/snakeviz等工具查看
+        *   {书号}_summary.txt，各阶段自身耗时(tottime)最高的函数
+        *   {书号}_threads.txt，Config.profile_thread开启时线程池的采样结果
+    """
+    top_count = 30  # summary中每个阶段列出的函数数
+    profile_dict = {}  # 阶段名 => cProfile.Profile
+    stage_list = []  # 按首次出现的顺序记录阶段名
+    sampler = None
+
+    @staticmethod
+    def stage(name):
+        return ProfilerStage(name)
+
+    @staticmethod
+    def get_profile(name):
+        if name not in Profiler.profile_dict:
+            Profiler.profile_dict[name] = cProfile.Profile()
+            Profiler.stage_list.append(name)
+        return Profiler.profile_dict[name]
+
+    @staticmethod
+    def start_book():
+        if Config.profile and Config.profile_thread:
+            Profiler.sampler = ThreadSampler()
+            Profiler.sampler.start()
+        return
+
+    @staticmethod
+    def finish_book(file_prefix):
+        u"""
+        输出当前这本电子书的分析结果并清空
+        *   file_prefix
+            *   输出文件的路径前缀，如 .../性能分析/20160504_120000_1
+        """
+        if Profiler.sampler:
+            Profiler.sampler.stop()
+            Profiler.sampler.write_report(file_prefix + u'_threads.txt', Profiler.top_count)
+            Profiler.sampler = None
+        if not Profiler.profile_dict:
+            return
+        with open(file_prefix + u'_summary.txt', 'w') as summary:
+            for name in Profiler.stage_list:
+                profile = Profiler.profile_dict[name]
+                profile.dump_stats(u'{}_{}.prof'.format(file_prefix, name))
+                stream = StringIO.StringIO()
+                stats = pstats.Stats(profile, stream=stream)
+                stats.sort_stats('tottime').print_stats(Profiler.top_count)
+                summary.write('==== {} ====\n'.format(name))
+                summary.write(stream.getvalue())
+        Profiler.profile_dict = {}
+        Profiler.stage_list = []
+        return
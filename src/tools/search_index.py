@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+
+from src.tools.content_compressor import ContentCompressor
+from src.tools.debug import Debug
+
+
+class SearchIndex(object):
+    u"""
+    Answer/Article的全文索引
+    *   优先使用FTS5的contentless表，只存索引不重复存储正文；不支持FTS5时退回到FTS4
+    *   答案的索引内容为 问题标题 + 作者名 + 答案正文，文章为 文章标题 + 作者名 + 文章正文
+    *   中文按字切分后建立索引，查询时按短语匹配，效果等同于子串搜索
+    *   索引由DB.save在写入数据时同步维护
+    """
+    fts = ''  # fts5/fts4，为空表示当前sqlite不支持全文索引
+    index_table = {
+        'Answer': 'AnswerSearch',
+        'Article': 'ArticleSearch',
+    }
+    document_sql = {
+        'Answer': 'select Answer.rowid, Question.title, Answer.author_name, Answer.content, Answer.content_format from Answer left join Question on Question.question_id = Answer.question_id where Answer.href = ?',
+        'Article': 'select rowid, title, author_name, content, content_format from Article where href = ?',
+    }
+    cjk = re.compile(u'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff])')
+    html_tag = re.compile(r'<[^>]*>')
+
+    @staticmethod
+    def init(cursor):
+        SearchIndex.fts = SearchIndex.detect_fts(cursor)
+        if not SearchIndex.fts:
+            Debug.logger.info(u'当前sqlite不支持全文索引，search:指令不可用')
+            return
+        for (table_name, index_table) in SearchIndex.index_table.items():
+            if cursor.execute('select count(*) from sqlite_master where name = ?', (index_table,)).fetchone()[0]:
+                continue
+            if SearchIndex.fts == 'fts5':
+                cursor.execute("create virtual table {} using fts5(title, author_name, content, content='')".format(
+                    index_table))
+            else:
+                cursor.execute('create virtual table {} using fts4(title, author_name, content)'.format(index_table))
+            SearchIndex.rebuild(cursor, table_name)
+        return
+
+    @staticmethod
+    def reset(cursor):
+        u"""
+        删除并重建全文索引
+        *   索引以Answer/Article的rowid关联，vacuum可能改变没有integer primary key的表的rowid，之后需要重建
+        """
+        for index_table in SearchIndex.index_table.values():
+            cursor.execute('drop table if exists {}'.format(index_table))
+        SearchIndex.init(cursor)
+        return
+
+    @staticmethod
+    def detect_fts(cursor):
+        for fts in ['fts5', 'fts4']:
+            try:
+                cursor.execute('create virtual table temp.SearchIndexDetect using {}(content)'.format(fts))
+                cursor.execute('drop table temp.SearchIndexDetect')
+                return fts
+            except sqlite3.OperationalError:
+                continue
+        return ''
+
+    @staticmethod
+    def rebuild(cursor, table_name):
+        u"""
+        为已有数据建立索引，仅在首次创建索引表时执行
+        """
+        Debug.logger.info(u'开始为{}建立全文索引，数据较多时需要等待一段时间'.format(table_name))
+        href_list = [row[0] for row in cursor.execute('select href from {}'.format(table_name)).fetchall()]
+        for href in href_list:
+            SearchIndex.add(cursor, table_name, href)
+        Debug.logger.info(u'{}全文索引建立完毕'.format(table_name))
+        return
+
+    @staticmethod
+    def tokenize(text):
+        u"""
+        去除html标签，并在每个汉字两侧加上空格，使其成为独立的词
+        """
+        if not text:
+            return u''
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'ignore')
+        text = SearchIndex.html_tag.sub(u' ', text)
+        return SearchIndex.cjk.sub(u' \\1 ', text)
+
+    @staticmethod
+    def get_document(cursor, table_name, href):
+        row = cursor.execute(SearchIndex.document_sql[table_name], (href,)).fetchone()
+        if not row:
+            return None
+        row = row[:3] + (ContentCompressor.decode(row[3], row[4]),)
+        return (row[0],) + tuple(SearchIndex.tokenize(x) for x in row[1:])
+
+    @staticmethod
+    def add(cursor, table_name, href):
+        document = SearchIndex.get_document(cursor, table_name, href)
+        if not document:
+            return
+        cursor.execute('insert into {}(rowid, title, author_name, content) values (?, ?, ?, ?)'.format(
+            SearchIndex.index_table[table_name]), document)
+        return
+
+    @staticmethod
+    def remove(cursor, table_name, href):
+        document = SearchIndex.get_document(cursor, table_name, href)
+        if not document:
+            return
+        index_table = SearchIndex.index_table[table_name]
+        if SearchIndex.fts == 'fts5':
+            # contentless表需要提供原始内容才能删除对应索引
+            cursor.execute("insert into {0}({0}, rowid, title, author_name, content) values ('delete', ?, ?, ?, ?)".format(
+                index_table), document)
+        else:
+            cursor.execute('delete from {} where docid = ?'.format(index_table), document[:1])
+        return
+
+    @staticmethod
+    def before_save(cursor, table_name, data):
+        u"""
+        在数据写入前移除旧索引
+        *   返回
+            *   (需要重建索引的表, href列表)
+        """
+        if not SearchIndex.fts:
+            return '', []
+        if table_name in SearchIndex.index_table:
+            href_list = [data['href']] if data.get('href') else []
+        elif (table_name == 'Question') and ('title' in data):
+            # 问题标题变化后，需要重建该问题下所有答案的索引
+            row = cursor.execute('select title from Question where question_id = ?', (data.get('question_id'),)).fetchone()
+            old_title = SearchIndex.tokenize(row[0] if row else u'')
+            if old_title == SearchIndex.tokenize(data['title']):
+                return '', []
+            table_name = 'Answer'
+            href_list = [row[0] for row in cursor.execute('select href from Answer where question_id = ?',
+                                                          (data.get('question_id'),)).fetchall()]
+        else:
+            return '', []
+        for href in href_list:
+            SearchIndex.remove(cursor, table_name, href)
+        return table_name, href_list
+
+    @staticmethod
+    def after_save(cursor, table_name, href_list):
+        for href in href_list:
+            SearchIndex.add(cursor, table_name, href)
+        return
+
+    @staticmethod
+    def create_match(keyword):
+        u"""
+        将搜索关键词转换为MATCH语句中的字符串常量
+        多个关键词之间使用『+』分隔，表示同时包含这些关键词
+        """
+        phrase_list = []
+        for word in keyword.split('+'):
+            word = SearchIndex.tokenize(word).strip()
+            if word:
+                phrase_list.append(u'"{}"'.format(u' '.join(word.split()).replace(u'"', u'""')))
+        match = u' AND '.join(phrase_list)
+        return u"'{}'".format(match.replace(u"'", u"''"))
+
+    @staticmethod
+    def get_rank_column():
+        u"""
+        FTS5按bm25相关度排序（数值越小越相关），FTS4没有内置的相关度，统一按0处理
+        """
+        return 'rank' if SearchIndex.fts == 'fts5' else '0'
+
+    @staticmethod
+    def get_search_source(table_name, keyword):
+        u"""
+        返回附带search_rank字段的子查询，用于代替原表参与筛选与排序
+        """
+        index_table = SearchIndex.index_table[table_name]
+        return u'(select {table}.*, SearchRank.search_rank from {table} join (select rowid as search_id, {rank} as search_rank from {index} where {index} match {match}) as SearchRank on SearchRank.search_id = {table}.rowid)'.format(
+            table=table_name, index=index_table, rank=SearchIndex.get_rank_column(),
+            match=SearchIndex.create_match(keyword))
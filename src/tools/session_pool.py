@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import urllib2
+
+from src.tools.config import Config
+from src.tools.debug import Debug
+from src.tools.metrics import Metrics
+
+
+class Session(object):
+    u"""
+    一条登录记录对应的会话，持有独立的cookie jar与opener
+    """
+
+    def __init__(self, account, jar, cookie):
+        self.account = account
+        self.jar = jar
+        self.opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(jar))
+        self.saved_cookie = cookie  # 最近一次载入或写回LoginRecord的cookie
+        self.next_time = 0  # 下次允许发出请求的时间
+        self.request_count = 0
+        self.failed_count = 0
+        self.rate_limited_count = 0
+        self.retired = False
+        return
+
+
+class SessionPool(object):
+    u"""
+    多账号会话池，Config.max_session大于1时由Http.set_cookie从LoginRecord中载入
+    *   每次请求选用最早可以发出请求的会话，同一会话两次请求之间至少间隔Config.session_interval秒
+    *   健康状况
+        *   被限流(429)的会话暂停使用SessionPool.backoff秒
+        *   出现登录墙(401或被重定向到登录页)的会话视为登录状态失效，不再使用
+        *   所有会话均失效后acquire返回None，Http改为以未登录状态抓取
+    *   运行统计
+        *   session.rate_limited/session.login_wall为被限流/出现登录墙的次数
+    """
+    lock = threading.Lock()
+    session_list = []
+    backoff = 10  # 被限流后暂停使用该会话的秒数
+
+    @staticmethod
+    def add(session):
+        with SessionPool.lock:
+            SessionPool.session_list.append(session)
+        return
+
+    @staticmethod
+    def clear():
+        with SessionPool.lock:
+            SessionPool.session_list = []
+        return
+
+    @staticmethod
+    def is_enabled():
+        return bool(SessionPool.session_list)
+
+    @staticmethod
+    def acquire():
+        u"""
+        取出下一个可用的会话，需要等待时在锁外sleep，不阻塞其它线程选择会话
+        """
+        with SessionPool.lock:
+            session_list = [x for x in SessionPool.session_list if not x.retired]
+            if not session_list:
+                return None
+            session = min(session_list, key=lambda x: x.next_time)
+            now = time.time()
+            wait = session.next_time - now
+            session.next_time = max(now, session.next_time) + Config.session_interval
+        if wait > 0:
+            time.sleep(wait)
+        return session
+
+    @staticmethod
+    def report(session, status):
+        u"""
+        记录请求结果
+        *   status
+            *   ok/failed/rate_limited/login_wall
+        """
+        if not session:
+            return
+        with SessionPool.lock:
+            session.request_count += 1
+            if status == 'failed':
+                session.failed_count += 1
+            elif status == 'rate_limited':
+                session.rate_limited_count += 1
+                session.next_time = max(session.next_time, time.time() + SessionPool.backoff)
+            elif status == 'login_wall' and not session.retired:
+                session.retired = True
+                Debug.logger.info(u'账号{}的登录状态已失效，不再使用该账号抓取'.format(session.account))
+                if all(x.retired for x in SessionPool.session_list):
+                    Debug.logger.info(u'所有账号的登录状态均已失效，之后将以未登录状态抓取')
+        if status in ('rate_limited', 'login_wall'):
+            Metrics.count('session.' + status)
+        return
+
+    @staticmethod
+    def get_summary():
+        u"""
+        各会话的请求数、失败数、被限流次数与是否失效，每个会话一行
+        """
+        line_list = []
+        with SessionPool.lock:
+            for session in SessionPool.session_list:
+                line_list.append(u'{:<32}请求{:>6}次  失败{:>4}次  被限流{:>4}次  {}'.format(
+                    session.account, session.request_count, session.failed_count, session.rate_limited_count,
+                    u'已失效' if session.retired else u'正常'))
+        return line_list
+
+    @staticmethod
+    def print_summary():
+        if not SessionPool.is_enabled():
+            return
+        print u'账号使用情况'
+        for line in SessionPool.get_summary():
+            print u'    ' + line
+        return
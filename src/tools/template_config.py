@@ -29,5 +29,7 @@ class TemplateConfig(object):
     front_page_question_uri = front_page_info_template_path + u'/question.html'
     front_page_answer_uri = front_page_info_template_path + u'/answer.html'
     front_page_article_uri = front_page_info_template_path + u'/article.html'
+    front_page_search_uri = front_page_info_template_path + u'/question.html'
+    front_page_search_article_uri = front_page_info_template_path + u'/article.html'
 
     front_page_base_uri = front_page_template_path + u'/base.html'
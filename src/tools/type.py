@@ -7,6 +7,8 @@ class Type(object):
     author = 'author'
     column = 'column'
     article = 'article'
+    search = 'search'  # 在已抓取的答案中搜索
+    search_article = 'search_article'  # 在已抓取的专栏文章中搜索，由search指令一并生成
 
     topic_index = 'topic_index'
     collection_index = 'collection_index'
@@ -17,8 +19,9 @@ class Type(object):
     column_info = 'column_info'
 
     question_answer_type_list = ['answer', 'question']
-    article_type_list = ['article', 'column', ]
-    question_type_list = ['answer', 'question', 'author', 'collection', 'topic', ]
+    article_type_list = ['article', 'column', 'search_article', ]
+    question_type_list = ['search', 'answer', 'question', 'author', 'collection', 'topic', ]  # search需最先检测，以免关键词中的网址被识别为其他类别
+    search_type_list = ['search', 'search_article', ]
     type_list = question_type_list + article_type_list  # 文章必须放在专栏之前（否则检测类别的时候就一律检测为专栏了）
     info_table = {
         column: column_info,
@@ -26,4 +29,15 @@ class Type(object):
         collection: collection_info,
         topic: topic_info,
     }
+    table_name = {
+        answer: 'Answer',
+        question: 'Question',
+        article: 'Article',
+        author_info: 'AuthorInfo',
+        collection_info: 'CollectionInfo',
+        topic_info: 'TopicInfo',
+        column_info: 'ColumnInfo',
+        collection_index: 'CollectionIndex',
+        topic_index: 'TopicIndex',
+    }
     pass
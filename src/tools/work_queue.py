@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import sqlite3
+import time
+
+
+class WorkQueue(object):
+    u"""
+    分布式抓取使用的共享任务队列，以sqlite文件为后端，同一台机器或挂载了同一共享目录的多台机器上的进程可同时使用
+    *   item_type
+        *   task    ReadList中的一个待抓取网址，由worker抓取信息并计算页数，生成page
+        *   page    一个待抓取的网页
+    *   租约
+        *   lease取出任务时将其标记为leased，并记录领取者与租约到期时间
+        *   完成后由ack标记为done，失败时由release放回队列，立即可被重新领取
+        *   进程中断等原因导致租约到期仍未ack的任务会被重新领取
+        *   领取次数达到max_attempt的任务不再分发，标记为failed
+    *   同一批次中item_type与payload均相同的任务只保留一个
+    """
+    schema = '''
+        create table if not exists WorkQueue (
+            id integer primary key autoincrement,
+            batch text not null,
+            item_type text not null,
+            payload text not null,
+            status text not null default 'pending',
+            owner text not null default '',
+            lease_expire real not null default 0,
+            attempt integer not null default 0,
+            unique (batch, item_type, payload)
+        );
+        create index if not exists WorkQueueStatus on WorkQueue (status, lease_expire);
+    '''
+
+    def __init__(self, path, max_attempt=5):
+        # 自行管理事务，领取任务时使用begin immediate，保证同一任务不会被两个进程同时领取
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(WorkQueue.schema)
+        self.max_attempt = max_attempt
+        return
+
+    @staticmethod
+    def get_owner():
+        return u'{}:{}'.format(socket.gethostname(), os.getpid())
+
+    def put(self, batch, item_type, payload_list):
+        self.conn.execute('begin immediate')
+        try:
+            for payload in payload_list:
+                self.conn.execute('insert or ignore into WorkQueue (batch, item_type, payload) values (?, ?, ?)',
+                                  (batch, item_type, json.dumps(payload, sort_keys=True)))
+        finally:
+            self.conn.execute('commit')
+        return
+
+    def lease(self, owner, count, lease_timeout):
+        u"""
+        领取最多count个任务，返回[{'id', 'batch', 'item_type', 'payload'}]，没有可领取的任务时返回空列表
+        """
+        now = time.time()
+        self.conn.execute('begin immediate')
+        try:
+            self.conn.execute(
+                "update WorkQueue set status = 'failed' where status in ('pending', 'leased') and attempt >= ? and "
+                "(status = 'pending' or lease_expire < ?)", (self.max_attempt, now))
+            row_list = self.conn.execute(
+                "select id, batch, item_type, payload from WorkQueue where status = 'pending' or "
+                "(status = 'leased' and lease_expire < ?) order by id limit ?", (now, count)).fetchall()
+            for row in row_list:
+                self.conn.execute(
+                    "update WorkQueue set status = 'leased', owner = ?, lease_expire = ?, attempt = attempt + 1 "
+                    "where id = ?", (owner, now + lease_timeout, row[0]))
+        finally:
+            self.conn.execute('commit')
+        return [{'id': row[0], 'batch': row[1], 'item_type': row[2], 'payload': json.loads(row[3])} for row in
+                row_list]
+
+    def ack(self, item_id, owner):
+        u"""
+        标记任务完成，租约已过期并被其它进程领取的任务不受影响
+        """
+        self.conn.execute("update WorkQueue set status = 'done' where id = ? and owner = ? and status = 'leased'",
+                          (item_id, owner))
+        return
+
+    def release(self, item_id, owner):
+        self.conn.execute("update WorkQueue set status = 'pending' where id = ? and owner = ? and status = 'leased'",
+                          (item_id, owner))
+        return
+
+    def get_stat(self, batch=None):
+        u"""
+        返回 状态 => 任务数，batch为None时统计所有批次
+        """
+        if batch is None:
+            row_list = self.conn.execute('select status, count(*) from WorkQueue group by status').fetchall()
+        else:
+            row_list = self.conn.execute('select status, count(*) from WorkQueue where batch = ? group by status',
+                                         (batch,)).fetchall()
+        return dict(row_list)
+
+    def get_owner_stat(self, batch=None):
+        u"""
+        返回 领取者 => 由其完成的任务数
+        """
+        sql = "select owner, count(*) from WorkQueue where status = 'done'"
+        if batch is None:
+            return dict(self.conn.execute(sql + ' group by owner').fetchall())
+        return dict(self.conn.execute(sql + ' and batch = ? group by owner', (batch,)).fetchall())
+
+    def is_finished(self, batch=None):
+        stat = self.get_stat(batch)
+        return not (stat.get('pending') or stat.get('leased'))
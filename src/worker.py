@@ -2,15 +2,21 @@
 
 import json  # 用于JsonWorker
 
+from src.container.image import ImageContainer
 from src.lib.zhihu_parser.author import AuthorParser
 from src.lib.zhihu_parser.collection import CollectionParser
 from src.lib.zhihu_parser.question import QuestionParser
 from src.lib.zhihu_parser.topic import TopicParser
+from src.tools.content_compressor import ContentCompressor
+from src.tools.config import Config
 from src.tools.controler import Control
 from src.tools.db import DB
 from src.tools.debug import Debug
+from src.tools.html_creator import HtmlCreator
 from src.tools.http import Http
 from src.tools.match import Match
+from src.tools.metrics import Metrics
+from src.tools.profiler import Profiler
 
 
 class PageWorker(object):
@@ -29,7 +35,7 @@ class PageWorker(object):
         self.info_url_complete_set = set()
 
         self.add_property()  # 添加扩展属性
-        Http.set_cookie()
+        Http.set_cookie()  # 已载入cookie时直接返回，各Worker共用同一个cookie jar
 
     def add_property(self):
 
@@ -59,10 +65,19 @@ class PageWorker(object):
         """
         return
 
-    def save(self):
-        self.clear_index()
+    def save(self, clear=True):
+        u"""
+        *   clear
+            *   是否先清除原有的话题索引等缓存，分布式抓取中单独抓取的网页只追加数据，不清除
+        """
+        if clear:
+            self.clear_index()
         save_config = self.create_save_config()
         for key in save_config:
+            if key in ContentCompressor.table_list:
+                inserted, updated, unchanged = DB.save_batch(save_config[key], key)
+                Debug.logger.info(u'{}表：新增{}条，更新{}条，未变化{}条'.format(key, inserted, updated, unchanged))
+                continue
             for item in save_config[key]:
                 if item:
                     DB.save(item, key)
@@ -70,21 +85,27 @@ class PageWorker(object):
         return
 
     def start(self):
-        self.start_catch_info()
-        self.start_create_work_list()
-        self.start_worker()
-        self.save()
+        with Profiler.stage('start_catch_info'):
+            self.start_catch_info()
+        with Profiler.stage('start_create_work_list'):
+            self.start_create_work_list()
+        with Profiler.stage('start_worker'):
+            self.start_worker()
+        with Profiler.stage('save'):
+            self.save()
         return
 
     def create_work_set(self, target_url):
         if target_url in self.task_complete_set:
             return
-        content = Http.get_content(target_url + '?nr=1&sort=created')
+        discover_url = target_url + '?nr=1&sort=created'
+        content = Http.get_shared_content(discover_url)
         if not content:
             return
         self.task_complete_set.add(target_url)
         max_page = self.parse_max_page(content)
-        for page in range(max_page):
+        self.work_set.add(discover_url)  # 第一页即为探测页，直接复用已抓取的内容
+        for page in range(1, max_page):
             url = '{}?nr=1&sort=created&page={}'.format(target_url, page + 1)
             self.work_set.add(url)
         return
@@ -105,7 +126,7 @@ class PageWorker(object):
             return
 
         Debug.logger.info(u'开始抓取{}的内容'.format(target_url))
-        content = Http.get_content(target_url)
+        content = Http.get_shared_content(target_url, keep=False)
         if not content:
             return
         content = Match.fix_html(content)  # 需要修正其中的<br>标签，避免爆栈
@@ -131,10 +152,25 @@ class PageWorker(object):
         for content in self.content_list:
             i += 1
             Debug.print_in_single_line(u"正在解析第{}/{}张页面".format(i, self.content_list.__len__()))
-            self.parse_content(content)
+            answer_count = len(self.answer_list)
+            with Metrics.timer('worker.parse_content'):
+                self.parse_content(content)
+            Metrics.count('worker.page')
+            Metrics.count('worker.answer', len(self.answer_list) - answer_count)
+            self.prefetch_image(self.answer_list[answer_count:])
         Debug.logger.info(u"网页内容解析完毕")
         return
 
+    @staticmethod
+    def prefetch_image(answer_list):
+        u"""
+        提取刚解析出的答案/文章中的图片，交由ImageContainer在后台下载
+        """
+        for answer in answer_list:
+            if answer:
+                ImageContainer.prefetch(HtmlCreator.get_image_href_list(answer.get('content') or ''))
+        return
+
     def catch_info(self, target_url):
         return
 
@@ -151,6 +187,20 @@ class QuestionWorker(PageWorker):
         return
 
 
+class AnswerWorker(PageWorker):
+    u"""
+    单个答案
+    *   答案页面中已包含问题信息，只需抓取答案页面本身，不用计算页数、抓取问题下的全部答案
+    """
+
+    def create_work_set(self, target_url):
+        if target_url in self.task_complete_set:
+            return
+        self.task_complete_set.add(target_url)
+        self.work_set.add(target_url)
+        return
+
+
 class AuthorWorker(PageWorker):
     def parse_content(self, content):
         parser = AuthorParser(content)
@@ -161,12 +211,14 @@ class AuthorWorker(PageWorker):
     def create_work_set(self, target_url):
         if target_url in self.task_complete_set:
             return
-        content = Http.get_content(target_url + '/answers?order_by=vote_num')
+        discover_url = target_url + '/answers?order_by=vote_num'
+        content = Http.get_shared_content(discover_url)
         if not content:
             return
         self.task_complete_set.add(target_url)
         max_page = self.parse_max_page(content)
-        for page in range(max_page):
+        self.work_set.add(discover_url)
+        for page in range(1, max_page):
             url = '{}/answers?order_by=vote_num&page={}'.format(target_url, page + 1)
             self.work_set.add(url)
         return
@@ -195,12 +247,13 @@ class CollectionWorker(PageWorker):
     def create_work_set(self, target_url):
         if target_url in self.task_complete_set:
             return
-        content = Http.get_content(target_url)
+        content = Http.get_shared_content(target_url)
         if not content:
             return
         self.task_complete_set.add(target_url)
         max_page = self.parse_max_page(content)
-        for page in range(max_page):
+        self.work_set.add(target_url)
+        for page in range(1, max_page):
             url = '{}?page={}'.format(target_url, page + 1)
             self.work_set.add(url)
         return
@@ -208,7 +261,7 @@ class CollectionWorker(PageWorker):
     def catch_info(self, target_url):
         if target_url in self.info_url_complete_set:
             return
-        content = Http.get_content(target_url)
+        content = Http.get_shared_content(target_url)
         if not content:
             return
         self.info_url_complete_set.add(target_url)
@@ -246,12 +299,14 @@ class TopicWorker(PageWorker):
     def create_work_set(self, target_url):
         if target_url in self.task_complete_set:
             return
-        content = Http.get_content(target_url + '/top-answers')
+        discover_url = target_url + '/top-answers'
+        content = Http.get_shared_content(discover_url)
         if not content:
             return
         self.task_complete_set.add(target_url)
         max_page = self.parse_max_page(content)
-        for page in range(max_page):
+        self.work_set.add(discover_url)
+        for page in range(1, max_page):
             url = '{}/top-answers?page={}'.format(target_url, page + 1)
             self.work_set.add(url)
         return
@@ -259,7 +314,7 @@ class TopicWorker(PageWorker):
     def catch_info(self, target_url):
         if target_url in self.info_url_complete_set:
             return
-        content = Http.get_content(target_url + '/top-answers')
+        content = Http.get_shared_content(target_url + '/top-answers')
         if not content:
             return
         self.info_url_complete_set.add(target_url)
@@ -289,7 +344,7 @@ class TopicWorker(PageWorker):
         return config
 
     def clear_index(self):
-        topic_id_tuple = tuple(set(x['topic_id'] for x in self.topic_index_list))
+        topic_id_tuple = tuple(set(x['topic_id'] for x in self.topic_index_list + self.info_list))
         sql = 'DELETE  from TopicIndex where topic_id in ({})'.format((' ?,' * len(topic_id_tuple))[:-1])
         DB.cursor.execute(sql, topic_id_tuple)
         DB.commit()
@@ -297,6 +352,14 @@ class TopicWorker(PageWorker):
 
 
 class ColumnWorker(PageWorker):
+    u"""
+    专栏
+    *   多个专栏在线程池中并行抓取，专栏id随每个请求的网址传递，不保存在实例上
+    *   文章列表接口每页Config.column_page_size篇，先请求第一页探测接口实际允许的数量，再按该数量分页，探测页作为第一页复用
+    """
+    api_url = 'https://zhuanlan.zhihu.com/api/columns/{}'
+    post_url = 'https://zhuanlan.zhihu.com/api/columns/{}/posts?limit={}&offset={}'
+
     def catch_info(self, target_url):
         return
 
@@ -304,8 +367,8 @@ class ColumnWorker(PageWorker):
         if target_url in self.task_complete_set:
             return
         result = Match.column(target_url)
-        self.column_id = result.group('column_id')
-        content = Http.get_content('https://zhuanlan.zhihu.com/api/columns/' + self.column_id)
+        column_id = result.group('column_id')
+        content = Http.get_content(ColumnWorker.api_url.format(column_id))
         if not content:
             return
         raw_info = json.loads(content)
@@ -324,14 +387,41 @@ class ColumnWorker(PageWorker):
         info['article'] = raw_info['postsCount']
         info['follower'] = raw_info['followersCount']
         info['description'] = raw_info['description']
+
+        page_size = Config.column_page_size
+        detect_url = ColumnWorker.post_url.format(column_id, page_size, 0)
+        content = Http.get_shared_content(detect_url)
+        if not content:
+            return
+        page_size = len(json.loads(content)) or page_size  # 接口可能限制每页数量，以实际返回的数量为准
+        if page_size < info['article']:
+            Debug.logger.info(u'专栏{}共{}篇文章，每页{}篇'.format(column_id, info['article'], page_size))
         self.info_list.append(info)
         self.task_complete_set.add(target_url)
-        detect_url = 'https://zhuanlan.zhihu.com/api/columns/{}/posts?limit=10&offset='.format(self.column_id)
-        for i in range(info['article'] / 10 + 1):
-            self.work_set.add(detect_url + str(i * 10))
+        self.work_set.add(detect_url)
+        for offset in range(page_size, info['article'], page_size):
+            self.work_set.add(ColumnWorker.post_url.format(column_id, page_size, offset))
+        return
+
+    def worker(self, target_url):
+        u"""
+        与PageWorker.worker相同，但将专栏id与接口返回的内容一同保存，供parse_content使用
+        """
+        if target_url in self.work_complete_set:
+            return
+
+        Debug.logger.info(u'开始抓取{}的内容'.format(target_url))
+        content = Http.get_shared_content(target_url, keep=False)
+        if not content:
+            return
+        column_id = Match.column_api(target_url).group('column_id')
+        self.content_list.append((column_id, content))
+        Debug.logger.debug(u'{}的内容抓取完成'.format(target_url))
+        self.work_complete_set.add(target_url)
         return
 
     def parse_content(self, content):
+        column_id, content = content
         article_list = json.loads(content)
         for info in article_list:
             article = {}
@@ -342,7 +432,7 @@ class ColumnWorker(PageWorker):
             article['author_logo'] = info['author']['avatar']['template'].replace('{id}', info['author']['avatar'][
                 'id']).replace('_{size}', '')
 
-            article['column_id'] = self.column_id #info['slug']
+            article['column_id'] = column_id
             article['name'] = info['title']
             article['article_id'] = info['slug']
             url = info['url']
@@ -361,11 +451,50 @@ class ColumnWorker(PageWorker):
         return config
 
 
+type_list = {'answer': AnswerWorker, 'question': QuestionWorker, 'author': AuthorWorker,
+             'collection': CollectionWorker, 'topic': TopicWorker, 'column': ColumnWorker,
+             'article': ColumnWorker, }
+
+
 def worker_factory(task):
-    type_list = {'answer': QuestionWorker, 'question': QuestionWorker, 'author': AuthorWorker,
-                 'collection': CollectionWorker, 'topic': TopicWorker, 'column': ColumnWorker,
-                 'article': ColumnWorker, }
     for key in task:
         worker = type_list[key](task[key])
         worker.start()
+        Http.clear_memo()
+        Http.save_cookie()
     return
+
+
+def discover_work(kind, target_url):
+    u"""
+    分布式抓取中的task：抓取信息、计算页数，信息直接入库
+    *   探测时已抓取过的网页(在Http.memo中)直接在本地解析入库，不再交给其它进程重新请求
+    *   返回
+        *   失败时返回None，成功时返回其余待抓取网页的列表
+    """
+    worker = type_list[kind]([target_url])
+    worker.start_catch_info()
+    worker.start_create_work_list()
+    if target_url not in worker.task_complete_set:
+        Http.clear_memo()
+        return None
+    url_list = sorted(worker.work_set)
+    worker.work_set = set(x for x in url_list if x in Http.memo)
+    worker.start_worker()
+    worker.save()
+    Http.clear_memo()
+    Http.save_cookie()
+    return [x for x in url_list if x not in worker.work_complete_set]
+
+
+def crawl_page(kind, url_list):
+    u"""
+    分布式抓取中的page：抓取并解析指定网页，返回抓取成功的网址集合
+    """
+    worker = type_list[kind]([])
+    worker.work_set = set(url_list)
+    worker.start_worker()
+    worker.save(clear=False)
+    Http.clear_memo()
+    Http.save_cookie()
+    return worker.work_complete_set
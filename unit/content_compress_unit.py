@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.book import Book
+from src.read_list_parser import ReadListParser
+from src.tools.config import Config
+from src.tools.content_compressor import ContentCompressor
+from src.tools.db import DB
+from src.tools.path import Path
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class ContentCompressBenchmark(unittest.TestCase):
+    u"""
+    对比正文压缩前后的数据库大小与生成电子书时读取数据的耗时
+    *   生成电子书的耗时只统计读取元数据、分卷、逐卷读取正文的部分，不含渲染与打包epub
+    """
+    question_count = 200
+    answer_count = 10  # 每个问题下的答案数
+    phrase_list = [u'知乎', u'问题', u'回答', u'我们', u'因为', u'所以', u'但是', u'这个', u'一个', u'可以', u'没有', u'时候',
+                   u'自己', u'什么', u'如果', u'已经', u'事情', u'世界', u'历史', u'科学', u'经济', u'社会', u'文化', u'技术']
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.db_path = Path.db_path
+        self.compress_content = Config.compress_content
+        self.max_answer = Config.max_answer
+        Path.db_path = self.work_path + u'/benchmark.db'
+        Config.max_answer = 600
+        return
+
+    def tearDown(self):
+        DB.conn.close()
+        shutil.rmtree(self.work_path)
+        Path.db_path = self.db_path
+        Config.compress_content = self.compress_content
+        Config.max_answer = self.max_answer
+        return
+
+    def create_content(self, generator):
+        paragraph_list = []
+        for _ in range(generator.randint(5, 20)):
+            paragraph = u''.join(generator.choice(self.phrase_list) for _ in range(generator.randint(20, 80)))
+            paragraph_list.append(u'<p>{}</p>'.format(paragraph))
+        return u''.join(paragraph_list)
+
+    def create_database(self, compress):
+        Config.compress_content = compress
+        if os.path.isfile(Path.db_path):
+            DB.conn.close()
+            os.remove(Path.db_path)
+        DB.set_conn(sqlite3.connect(Path.db_path))
+        for sql_path in [u'db/zhihuhelp.sql', u'db/index.sql']:
+            with open(currentPath + sql_path) as sql_script:
+                DB.cursor.executescript(sql_script.read())
+        generator = random.Random(20161019)
+        for question_index in range(self.question_count):
+            question_id = 30000000 + question_index
+            DB.save({'question_id': question_id, 'title': u'问题{}'.format(question_index), 'description': u'',
+                     'comment': 0, 'views': 0, 'answers': self.answer_count, 'followers': 0}, 'Question')
+            for answer_index in range(self.answer_count):
+                answer_id = question_id * 100 + answer_index
+                DB.save({'author_id': 'author', 'author_sign': u'', 'author_logo': '', 'author_name': u'作者',
+                         'agree': generator.randint(0, 10000), 'content': self.create_content(generator),
+                         'question_id': question_id, 'answer_id': answer_id, 'commit_date': '2016-01-01',
+                         'edit_date': '2016-01-01', 'comment': 0, 'no_record_flag': 0,
+                         'href': 'https://www.zhihu.com/question/{}/answer/{}'.format(question_id, answer_id)},
+                        'Answer')
+        DB.commit()
+        DB.conn.execute('vacuum')
+        return
+
+    def load_book(self):
+        u"""
+        *   返回
+            *   (耗时, {href: 正文})
+        """
+        command = '$'.join('https://www.zhihu.com/question/{}'.format(30000000 + index) for index in
+                           range(self.question_count))
+        start = time.time()
+        content = {}
+        book = Book(ReadListParser.get_task(command).book_list)
+        for volume in book.book_list:
+            for raw_book in volume:
+                raw_book.catch_content()
+                for item in raw_book.get_content_item_list():
+                    content[item['href']] = item['content']
+                raw_book.release_content()
+        return time.time() - start, content
+
+    def test_compress_benchmark(self):
+        self.create_database(compress=False)
+        raw_size = os.path.getsize(Path.db_path)
+        raw_time, raw_content = self.load_book()
+
+        self.create_database(compress=True)
+        compress_size = os.path.getsize(Path.db_path)
+        compress_time, compress_content = self.load_book()
+
+        print u''
+        print u'未压缩: 数据库{:.2f}MB，读取数据耗时{:.3f}秒'.format(raw_size / 1024.0 / 1024, raw_time)
+        print u'压缩后: 数据库{:.2f}MB，读取数据耗时{:.3f}秒'.format(compress_size / 1024.0 / 1024, compress_time)
+        self.assertEqual(len(raw_content), self.question_count * self.answer_count)
+        self.assertEqual(raw_content, compress_content)
+        self.assertLess(compress_size, raw_size)
+        return
+
+    def test_migrate(self):
+        self.create_database(compress=False)
+        raw_size = os.path.getsize(Path.db_path)
+        _, raw_content = self.load_book()
+        ContentCompressor.migrate(DB.conn, compress=True)
+        self.assertLess(os.path.getsize(Path.db_path), raw_size)
+        self.assertEqual(DB.conn.execute('select count(*) from Answer where content_format = ?',
+                                         (ContentCompressor.format_raw,)).fetchone()[0], 0)
+        _, compress_content = self.load_book()
+        self.assertEqual(raw_content, compress_content)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
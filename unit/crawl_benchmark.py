@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+u"""
+离线抓取基准测试
+使用本地桩服务器(stub_server.py)代替知乎，完整执行 抓取 => 解析 => 入库 => 生成电子书 的流程，
+统计吞吐量、内存峰值与各阶段耗时，不需要联网与登录
+
+用法示例
+    python crawl_benchmark.py
+    python crawl_benchmark.py --kind question,author --page-count 10 --page-size 20 --latency 100
+"""
+import argparse
+import cookielib
+import json
+import logging
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加库路径
+currentPath = os.path.abspath(sys.path[0]).replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from stub_server import StubConfig, StubHandler, StubZhihuServer
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+sys.setrecursionlimit(100000)
+
+# 各类别对应的ReadList指令
+command_list = {
+    'question': 'https://www.zhihu.com/question/30000001',
+    'answer': 'https://www.zhihu.com/question/30000002/answer/40000002',
+    'author': 'https://www.zhihu.com/people/stub-author',
+    'collection': 'https://www.zhihu.com/collection/10000001',
+    'topic': 'https://www.zhihu.com/topic/10000002',
+    'column': 'https://zhuanlan.zhihu.com/stubcolumn$https://zhuanlan.zhihu.com/stubcolumn2',  # 两个专栏并行抓取
+}
+
+
+class StageTimer(object):
+    u"""
+    统计各阶段累计耗时
+    *   通过替换类方法实现，stage相同的方法耗时累加
+    """
+    stage_list = []
+    cost = {}
+
+    @staticmethod
+    def wrap(cls, method_name, stage):
+        method = cls.__dict__[method_name]
+
+        def timer(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                StageTimer.cost[stage] = StageTimer.cost.get(stage, 0) + time.time() - start
+
+        setattr(cls, method_name, timer)
+        if stage not in StageTimer.stage_list:
+            StageTimer.stage_list.append(stage)
+        return
+
+    @staticmethod
+    def install():
+        from src.book import Book
+        from src.container.image import ImageContainer
+        from src import worker
+
+        StageTimer.wrap(worker.PageWorker, 'start_catch_info', 'catch_info')
+        StageTimer.wrap(worker.PageWorker, 'start_create_work_list', 'work_list')
+        StageTimer.wrap(worker.PageWorker, 'start_worker', 'fetch_and_parse')
+        for cls in [worker.PageWorker, worker.QuestionWorker, worker.AnswerWorker, worker.AuthorWorker,
+                    worker.CollectionWorker, worker.TopicWorker, worker.ColumnWorker]:
+            if 'parse_content' in cls.__dict__:
+                StageTimer.wrap(cls, 'parse_content', 'parse')
+        StageTimer.wrap(worker.PageWorker, 'save', 'save')
+        StageTimer.wrap(Book, 'create_book_package', 'render')
+        StageTimer.wrap(ImageContainer, 'start_download', 'image')
+        StageTimer.wrap(Book, 'create_book', 'epub')
+        StageTimer.wrap(Book, 'create_single_html_book', 'html')
+        return
+
+    @staticmethod
+    def get_report():
+        u"""
+        parse包含在fetch_and_parse中，image包含在epub中，输出时拆开
+        """
+        cost = dict(StageTimer.cost)
+        cost['fetch_and_parse'] = cost.get('fetch_and_parse', 0) - cost.get('parse', 0)
+        cost['epub'] = cost.get('epub', 0) - cost.get('image', 0)
+        name = {'fetch_and_parse': 'fetch'}
+        return [(name.get(stage, stage), cost.get(stage, 0)) for stage in StageTimer.stage_list]
+
+
+def get_peak_rss():
+    u"""
+    进程的内存峰值，单位为MB(Linux下ru_maxrss单位为KB)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def get_token(index):
+    return 'stub-token-{}'.format(index)
+
+
+def init_work_path(work_path, session_count):
+    u"""
+    在临时目录中运行，数据库、图片池与生成的电子书都不会影响正式目录
+    *   TemplateConfig等在导入时即读取当前目录，需在导入src下的模块前切换目录
+    *   为每个会话写入一条登录记录，cookie中的z_c0用于桩服务器区分会话
+    """
+    for name in ['db', 'www']:
+        os.symlink(currentPath + name, os.path.join(work_path, name))
+    os.chdir(work_path)
+
+    from src.main import ZhihuHelp
+    from src.tools.db import DB
+    from src.tools.http import Http
+    from src.tools.image_pool import ImagePool
+    from src.tools.path import Path
+
+    Path.init_base_path()
+    Path.init_work_directory()
+    ZhihuHelp.init_database()
+    ImagePool.init()
+    for index in range(session_count):
+        jar = cookielib.LWPCookieJar()
+        jar.set_cookie(Http.make_cookie(name='z_c0', value=get_token(index), domain='www.zhihu.com'))
+        jar.set_cookie(Http.make_cookie(name='z_c0', value=get_token(index), domain='zhuanlan.zhihu.com'))
+        DB.save({'account': 'stub-{}'.format(index), 'password': '', 'recordDate': '2016-01-01',
+                 'cookieStr': Http.dump_cookie(jar)}, 'LoginRecord')
+    DB.commit()
+    return
+
+
+def run(kind_list, rebuild=False):
+    from src.book import Book
+    from src.read_list_parser import ReadListParser
+    from src.tools.metrics import Metrics
+    from src.tools.path import Path
+    from src.tools.profiler import Profiler
+    from src.worker import worker_factory
+
+    report = []
+    for kind in kind_list:
+        Path.reset_path()
+        task_package = ReadListParser.get_task(command_list[kind])
+        Profiler.start_book()
+        start = time.time()
+        worker_factory(task_package.work_list)
+        crawl_cost = time.time() - start
+        with Profiler.stage('Book.__init__'):
+            book = Book(task_package.book_list)
+        with Profiler.stage('Book.create'):
+            book.create()
+        report.append((kind, crawl_cost, time.time() - start - crawl_cost))
+        Metrics.finish_book(Path.metrics_path + u'/{}.json'.format(kind), {'command': command_list[kind]})
+        Profiler.finish_book(Path.profile_path + u'/' + kind)
+    if rebuild:
+        # 不再抓取，直接以数据库中的数据重新生成电子书，内容未变化的页面使用渲染缓存
+        for kind in kind_list:
+            Path.reset_path()
+            start = time.time()
+            Book(ReadListParser.get_task(command_list[kind]).book_list).create()
+            report.append((kind + '(rebuild)', 0, time.time() - start))
+            Metrics.finish_book(Path.metrics_path + u'/{}_rebuild.json'.format(kind), {'command': command_list[kind]})
+    return report
+
+
+def run_distributed(kind_list, worker_count, argv):
+    u"""
+    分布式抓取：另外启动worker_count个worker进程，本进程作为协调进程，各进程共用桩服务器、任务队列与数据库
+    *   协调进程在全部任务完成后才生成电子书，因此只输出总耗时
+    *   有worker进程异常退出或没有完成任何任务时以返回值1退出，避免协调进程独自完成全部任务时仍被视为分布式抓取
+    """
+    from src.main import ZhihuHelp
+    from src.tools.path import Path
+    from src.tools.work_queue import WorkQueue
+
+    with open('ReadList.txt', 'w') as read_list:
+        read_list.write('\n'.join(command_list[kind] for kind in kind_list))
+    command = [sys.executable, currentPath + 'unit/crawl_benchmark.py', '--queue-worker',
+               Path.work_queue_path.encode('utf-8'), '--stub-address', StubHandler.address, '--picture-quality',
+               str(argv.picture_quality)]
+    if argv.verbose:
+        command.append('--verbose')
+    output = None if argv.verbose else open(os.devnull, 'w')
+    start = time.time()
+    process_list = [subprocess.Popen(command, cwd=Path.base_path.encode('utf-8'), stdout=output) for _ in
+                    range(worker_count)]
+    ZhihuHelp().coordinate()
+    cost = time.time() - start
+    for process in process_list:
+        process.wait()
+
+    owner_stat = WorkQueue(Path.work_queue_path).get_owner_stat()
+    for process in process_list:
+        done_count = owner_stat.get(u'{}:{}'.format(socket.gethostname(), process.pid), 0)
+        print u'worker进程{}完成{}个任务，返回值{}'.format(process.pid, done_count, process.returncode)
+        if process.returncode or not done_count:
+            sys.exit(u'worker进程{}未能正常参与抓取'.format(process.pid))
+    return [('distributed', cost, 0)]
+
+
+def run_queue_worker(argv):
+    u"""
+    --distributed启动的worker进程，工作目录(已初始化)与桩服务器地址由协调进程指定
+    """
+    StubHandler.install(argv.stub_address)
+
+    from src.main import ZhihuHelp
+    from src.tools.config import Config
+    from src.tools.debug import Debug
+
+    helper = ZhihuHelp()
+    Config.picture_quality = argv.picture_quality
+    Config.queue_idle_timeout = 1
+    Debug.logger.setLevel(logging.INFO if argv.verbose else logging.WARNING)
+    helper.work(argv.queue_worker)
+    return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'使用本地桩服务器进行离线抓取基准测试')
+    parser.add_argument('--kind', default=','.join(sorted(command_list)),
+                        help=u'测试的类别，以逗号分隔，可选{}'.format('/'.join(sorted(command_list))))
+    parser.add_argument('--page-count', type=int, default=StubConfig.page_count, help=u'列表页数')
+    parser.add_argument('--page-size', type=int, default=StubConfig.page_size, help=u'每页答案数')
+    parser.add_argument('--answer-length', type=int, default=StubConfig.answer_length, help=u'每个答案的字数')
+    parser.add_argument('--image-count', type=int, default=StubConfig.image_count, help=u'每个答案中的图片数')
+    parser.add_argument('--image-size', type=int, default=StubConfig.image_size / 1024, help=u'每张图片的大小，单位KB')
+    parser.add_argument('--latency', type=int, default=int(StubConfig.latency * 1000), help=u'网页响应延迟，单位毫秒')
+    parser.add_argument('--image-latency', type=int, default=int(StubConfig.image_latency * 1000),
+                        help=u'图片响应延迟，单位毫秒')
+    parser.add_argument('--session', type=int, default=1, help=u'使用的账号(会话)数')
+    parser.add_argument('--session-interval', type=int, default=0,
+                        help=u'桩服务器对同一会话限流的最小请求间隔，单位毫秒，抓取时按此间隔的1.2倍控制请求频率')
+    parser.add_argument('--expired-session', type=int, default=0, help=u'其中登录状态已失效的会话数')
+    parser.add_argument('--no-compress', action='store_true', help=u'桩服务器不压缩网页/接口内容')
+    parser.add_argument('--picture-quality', type=int, default=1, help=u'图片质量，0/1/2，为0时不下载图片')
+    parser.add_argument('--profile', action='store_true', help=u'按阶段输出cProfile分析结果，需配合--keep查看')
+    parser.add_argument('--profile-thread', action='store_true', help=u'同时采样线程池中各线程的调用栈')
+    parser.add_argument('--rebuild', action='store_true', help=u'抓取完成后不再抓取，重新生成一遍电子书，用于测试页面缓存')
+    parser.add_argument('--no-page-cache', action='store_true', help=u'不使用页面缓存')
+    parser.add_argument('--distributed', type=int, default=0,
+                        help=u'以分布式抓取方式运行，指定除协调进程外另外启动的worker进程数')
+    parser.add_argument('--queue-worker', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--stub-address', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--output', default='', help=u'将结果以json格式写入指定文件')
+    parser.add_argument('--verbose', action='store_true', help=u'输出抓取日志')
+    parser.add_argument('--keep', action='store_true', help=u'保留临时目录，便于检查生成的电子书')
+    argv = parser.parse_args()
+    if argv.queue_worker:
+        run_queue_worker(argv)
+        return
+
+    kind_list = [x for x in argv.kind.split(',') if x]
+    for kind in kind_list:
+        if kind not in command_list:
+            parser.error(u'未知类别:{}'.format(kind))
+
+    StubConfig.page_count = argv.page_count
+    StubConfig.page_size = argv.page_size
+    StubConfig.answer_length = argv.answer_length
+    StubConfig.image_count = argv.image_count
+    StubConfig.image_size = argv.image_size * 1024
+    StubConfig.latency = argv.latency / 1000.0
+    StubConfig.image_latency = argv.image_latency / 1000.0
+    StubConfig.compress = not argv.no_compress
+    StubConfig.session_interval = argv.session_interval / 1000.0
+    StubConfig.expired_token_list = [get_token(x) for x in range(argv.expired_session)]
+
+    server = StubZhihuServer(StubConfig)
+    server.start()
+    StubHandler.install(server.get_address())
+
+    work_path = tempfile.mkdtemp()
+    try:
+        init_work_path(work_path, max(argv.session, 1))
+        StageTimer.install()
+
+        from src.tools.config import Config
+        from src.tools.db import DB
+        from src.tools.debug import Debug
+        from src.tools.metrics import Metrics
+        from src.tools.session_pool import SessionPool
+
+        Config.picture_quality = argv.picture_quality
+        Config.page_cache = not argv.no_page_cache
+        Config.max_session = argv.session
+        Config.session_interval = StubConfig.session_interval * 1.2  # 留出余量，避免线程调度的误差触发限流
+        Config.profile = argv.profile or argv.profile_thread
+        Config.profile_thread = argv.profile_thread
+        # epub库导入时会重设日志级别，需放在所有导入之后
+        Debug.logger.setLevel(logging.INFO if argv.verbose else logging.WARNING)
+        start = time.time()
+        if argv.distributed:
+            kind_report = run_distributed(kind_list, argv.distributed, argv)
+        else:
+            kind_report = run(kind_list, argv.rebuild)
+        total_cost = time.time() - start
+        answer_count = DB.get_result('select count(*) from Answer')[0] + DB.get_result('select count(*) from Article')[0]
+        DB.conn.close()
+    finally:
+        server.stop()
+        os.chdir(currentPath)
+        if argv.keep:
+            print u'临时目录:{}'.format(work_path)
+        else:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    crawl_cost = sum(x[1] for x in kind_report)
+    page_count, page_bytes = [sum(server.stat.get(kind, (0, 0))[i] for kind in ['html', 'api']) for i in range(2)]
+    image_count, image_bytes = server.stat.get('image', (0, 0))
+    result = {
+        'total_seconds': total_cost,
+        'crawl_seconds': crawl_cost,
+        'pages': page_count,
+        'answers': answer_count,
+        'images': image_count,
+        'missing': server.stat.get('missing', (0, 0))[0],
+        'rate_limited': server.stat.get('rate_limited', (0, 0))[0],
+        'login_wall': server.stat.get('login_wall', (0, 0))[0],
+        'pages_per_second': page_count / crawl_cost if crawl_cost else 0,
+        'answers_per_second': answer_count / crawl_cost if crawl_cost else 0,
+        'mb_per_second': (page_bytes + image_bytes) / 1024.0 / 1024 / total_cost if total_cost else 0,
+        'peak_rss_mb': get_peak_rss(),
+        'stage_seconds': StageTimer.get_report(),
+        'kind_seconds': [{'kind': kind, 'crawl': crawl, 'book': book} for (kind, crawl, book) in kind_report],
+    }
+
+    print u'共{pages}个网页/接口请求，{answers}个答案/文章，{images}张图片，{missing}个未知请求'.format(**result)
+    print u'总耗时{total_seconds:.2f}秒，其中抓取{crawl_seconds:.2f}秒'.format(**result)
+    print u'pages/s: {pages_per_second:.1f}  answers/s: {answers_per_second:.1f}  MB/s: {mb_per_second:.2f}  峰值内存: {peak_rss_mb:.1f}MB'.format(
+        **result)
+    print u'各阶段耗时'
+    for (stage, cost) in result['stage_seconds']:
+        print u'    {:<12}{:>8.2f}s'.format(stage, cost)
+    for item in result['kind_seconds']:
+        print u'    {kind:<12}抓取{crawl:>8.2f}s  生成电子书{book:>8.2f}s'.format(**item)
+    if result['rate_limited'] or result['login_wall']:
+        print u'被限流{rate_limited}次，被重定向至登录页{login_wall}次'.format(**result)
+    Metrics.print_summary()
+    SessionPool.print_summary()
+    if argv.output:
+        with open(argv.output, 'w') as output:
+            json.dump(result, output, indent=4)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import httplib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.daemon import JobManager, create_job_server
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+    def __init__(self, path):
+        httplib.HTTPConnection.__init__(self, 'localhost')
+        self.path = path
+        return
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        return
+
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.thread_name_list = []
+        self.release = threading.Event()
+        self.manager = JobManager(self.run_job, self.init, max_queue=2)
+        self.manager.start()
+        self.server_list = []
+        return
+
+    def tearDown(self):
+        self.release.set()
+        for server in self.server_list:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.work_path)
+        return
+
+    def init(self):
+        self.thread_name_list.append(threading.current_thread().name)
+        return
+
+    def run_job(self, job):
+        self.release.wait()
+        self.thread_name_list.append(threading.current_thread().name)
+        if job.command == 'fail':
+            raise ValueError('fail')
+        return [job.command + '.epub']
+
+    def start_server(self, address):
+        server = create_job_server(address, self.manager)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.server_list.append(server)
+        return server
+
+    @staticmethod
+    def request(connection, method, path, data=None):
+        body = json.dumps(data) if data is not None else None
+        connection.request(method, path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def wait_job(self, connection, job_id, status_list=('done', 'failed')):
+        for _ in range(100):
+            status, job = self.request(connection, 'GET', '/jobs/{}'.format(job_id))
+            if job['status'] in status_list:
+                return job
+            time.sleep(0.02)
+        self.fail(u'任务{}未完成'.format(job_id))
+        return
+
+    def test_tcp(self):
+        server = self.start_server('127.0.0.1:0')
+        connection = httplib.HTTPConnection(*server.server_address)
+        status, job = self.request(connection, 'POST', '/jobs', {'command': ' question '})
+        self.assertEqual((status, job['command']), (202, 'question'))
+        self.assertEqual(self.wait_job(connection, 1, ['running'])['status'], 'running')
+        status, job = self.request(connection, 'POST', '/jobs', {'command': 'fail'})
+        self.assertEqual((status, job['status']), (202, 'queued'))
+        self.release.set()
+        self.assertEqual(self.wait_job(connection, 1)['result_list'], ['question.epub'])
+        job = self.wait_job(connection, 2)
+        self.assertEqual((job['status'], job['error']), ('failed', 'ValueError: fail'))
+        status, job_list = self.request(connection, 'GET', '/jobs')
+        self.assertEqual([x['id'] for x in job_list], [1, 2])
+        # 初始化与所有任务均在同一个线程中执行
+        self.assertEqual(len(set(self.thread_name_list)), 1)
+        return
+
+    def test_queue_limit(self):
+        server = self.start_server('127.0.0.1:0')
+        connection = httplib.HTTPConnection(*server.server_address)
+        self.request(connection, 'POST', '/jobs', {'command': '0'})
+        self.wait_job(connection, 1, ['running'])
+        status_list = [self.request(connection, 'POST', '/jobs', {'command': str(x)})[0] for x in range(1, 4)]
+        # 第一个任务已在执行，其后两个任务等待，第四个任务被拒绝
+        self.assertEqual(status_list, [202, 202, 503])
+        self.assertEqual(self.request(connection, 'POST', '/jobs', {'command': ''})[0], 400)
+        self.assertEqual(self.request(connection, 'POST', '/jobs', ['question'])[0], 400)
+        self.assertEqual(self.request(connection, 'GET', '/jobs/10')[0], 404)
+        return
+
+    def test_unix_socket(self):
+        path = self.work_path + '/daemon.sock'
+        self.start_server(path)
+        connection = UnixHTTPConnection(path)
+        self.release.set()
+        self.assertEqual(self.request(connection, 'POST', '/jobs', {'command': 'column'})[0], 202)
+        self.assertEqual(self.wait_job(connection, 1)['status'], 'done')
+        return
+
+    def test_unix_socket_existing_file(self):
+        path = self.work_path + '/daemon.sock'
+        with open(path, 'w') as f:
+            f.write('data')
+        self.assertRaises(OSError, create_job_server, path, self.manager)
+        with open(path) as f:
+            self.assertEqual(f.read(), 'data')
+        return
+
+    def test_expire(self):
+        self.manager.max_queue, self.manager.max_finished = 10, 2
+        server = self.start_server('127.0.0.1:0')
+        connection = httplib.HTTPConnection(*server.server_address)
+        for index in range(4):
+            self.request(connection, 'POST', '/jobs', {'command': str(index)})
+        self.release.set()
+        self.wait_job(connection, 4)
+        status, job_list = self.request(connection, 'GET', '/jobs')
+        self.assertEqual([x['id'] for x in job_list], [3, 4])
+        self.assertEqual(self.request(connection, 'GET', '/jobs/1')[0], 404)
+        self.assertEqual(self.request(connection, 'POST', '/jobs', {'command': '4'})[1]['id'], 5)
+        return
+
+    def test_redirected_output(self):
+        u"""
+        以nohup/systemd等方式运行时输出被重定向，sys.stdout.encoding为None，后台服务仍应能正常启动
+        """
+        for name in ['db', 'src', 'www', 'zhihuHelp.py']:
+            os.symlink(currentPath + name, os.path.join(self.work_path, name))
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        env = dict((key, value) for (key, value) in os.environ.items() if key != 'PYTHONIOENCODING')
+        with open(os.path.join(self.work_path, 'daemon.log'), 'w') as log:
+            process = subprocess.Popen([sys.executable, 'zhihuHelp.py', 'daemon', '127.0.0.1:{}'.format(port)],
+                                       cwd=self.work_path, stdout=log, stderr=subprocess.STDOUT, env=env)
+        try:
+            status = None
+            for _ in range(100):
+                if process.poll() is not None:
+                    break
+                try:
+                    status = self.request(httplib.HTTPConnection('127.0.0.1', port), 'GET', '/jobs')[0]
+                    break
+                except socket.error:
+                    time.sleep(0.1)
+            with open(os.path.join(self.work_path, 'daemon.log')) as log:
+                self.assertEqual(status, 200, log.read())
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from xml.etree import ElementTree
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.lib.epub.directory import Directory
+from src.lib.epub.opf import OPF
+from src.lib.epub.toc import TOC
+from src.lib.epub.tools.epub_path import EpubPath
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class EpubTocBenchmark(unittest.TestCase):
+    u"""
+    用20000个条目的虚拟电子书检查toc.ncx/content.opf/index.xhtml的生成速度与结构
+    每个章节含1个章节页与9个答案页，与Book.create_book生成的目录结构一致
+    """
+    entry_count = 20000
+    chapter_size = 10
+    time_limit = 5  # 秒，原先逐条拼接字符串的实现在该规模下需要数秒，且随条目数平方增长
+
+    def setUp(self):
+        self.oebps_path = EpubPath.oebps_path
+        EpubPath.oebps_path = tempfile.mkdtemp()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(EpubPath.oebps_path)
+        EpubPath.oebps_path = self.oebps_path
+        return
+
+    def create_book(self, entry_count):
+        toc = TOC()
+        opf = OPF()
+        directory = Directory()
+        toc.set_title(u'测试')
+        toc.set_uid()
+        opf.set_title(u'测试')
+        opf.set_book_id()
+        for chapter_index in range(entry_count // self.chapter_size):
+            href = u'html/{}_info.xhtml'.format(chapter_index)
+            resource_id = opf.add_title_page_html(href)
+            toc.create_chapter(resource_id, href, u'章节{}'.format(chapter_index))
+            directory.create_chapter(href, u'章节{}'.format(chapter_index))
+            for index in range(self.chapter_size - 1):
+                href = u'html/{}_{}.xhtml'.format(chapter_index, index)
+                resource_id = opf.add_html(href)
+                toc.add_item(resource_id, href, u'问题{}'.format(index))
+                directory.add_html(href, u'问题{}'.format(index))
+            toc.finish_chapter()
+            directory.finish_chapter()
+        opf.create()
+        toc.create()
+        with open(EpubPath.oebps_path + u'/index.xhtml', 'w') as index:
+            directory.write_content(index)
+        return
+
+    def test_toc_generation_time(self):
+        start = time.time()
+        self.create_book(self.entry_count)
+        cost = time.time() - start
+        print u'生成{}个条目的目录耗时{:.3f}秒'.format(self.entry_count, cost)
+        self.assertLess(cost, self.time_limit)
+        return
+
+    def test_toc_structure(self):
+        self.create_book(self.entry_count)
+        namespace = '{http://www.daisy.org/z3986/2005/ncx/}'
+        nav_map = ElementTree.parse(EpubPath.oebps_path + u'/toc.ncx').getroot().find(namespace + 'navMap')
+        chapter_list = nav_map.findall(namespace + 'navPoint')
+        self.assertEqual(len(chapter_list), self.entry_count // self.chapter_size)
+        for chapter in chapter_list[:3]:
+            self.assertEqual(len(chapter.findall(namespace + 'navPoint')), self.chapter_size - 1)
+
+        namespace = '{http://www.idpf.org/2007/opf}'
+        package = ElementTree.parse(EpubPath.oebps_path + u'/content.opf').getroot()
+        # manifest中额外包含toc.ncx
+        self.assertEqual(len(package.find(namespace + 'manifest')), self.entry_count + 1)
+        self.assertEqual(len(package.find(namespace + 'spine')), self.entry_count)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
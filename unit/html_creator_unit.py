@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+# 模板路径在导入时按当前目录确定
+os.chdir(currentPath)
+
+from src.tools.config import Config
+from src.tools.html_creator import HtmlCreator
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class CanonicalizeImageHrefTest(unittest.TestCase):
+    def setUp(self):
+        self.picture_quality = Config.picture_quality
+        return
+
+    def tearDown(self):
+        Config.picture_quality = self.picture_quality
+        return
+
+    def test_host(self):
+        # pic1~pic4及不带序号的域名均为同一图床，统一为https://pic1.zhimg.com
+        Config.picture_quality = 1
+        for host in ['pic1', 'pic2', 'pic3', 'pic4', 'pic']:
+            for scheme in ['http:', 'https:', '']:
+                self.assertEqual(HtmlCreator.canonicalize_image_href('{}//{}.zhimg.com/v2-abc_b.jpg'.format(
+                    scheme, host)), 'https://pic1.zhimg.com/v2-abc_b.jpg')
+        return
+
+    def test_picture_quality(self):
+        for (picture_quality, expect) in [(1, 'https://pic1.zhimg.com/v2-abc_b.jpg'),
+                                          (2, 'https://pic1.zhimg.com/v2-abc.jpg')]:
+            Config.picture_quality = picture_quality
+            for suffix in ['_b', '_r', '_m']:
+                self.assertEqual(HtmlCreator.canonicalize_image_href(
+                    'https://pic3.zhimg.com/v2-abc{}.jpg'.format(suffix)), expect)
+        return
+
+    def test_other(self):
+        Config.picture_quality = 1
+        # 无尺寸后缀的图片只统一域名，带查询参数的地址与其它站点的图片保持不变
+        self.assertEqual(HtmlCreator.canonicalize_image_href('https://pic2.zhimg.com/v2-abc.png'),
+                         'https://pic1.zhimg.com/v2-abc.png')
+        for href in ['https://pic2.zhimg.com/v2-abc_r.jpg?source=1', 'https://www.zhihu.com/equation?tex=x_m',
+                     'https://example.com/a_r.jpg']:
+            self.assertEqual(HtmlCreator.canonicalize_image_href(href), href)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+import urllib2
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.db import DB
+from src.tools.http import Http
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class HttpCookieTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        os.chdir(self.work_path)
+        DB.set_conn(sqlite3.connect(u'cookie.db'))
+        with open(currentPath + u'db/zhihuhelp.sql') as sql_script:
+            DB.cursor.executescript(sql_script.read())
+        jar = Http.cookie_jar.__class__()
+        jar.set_cookie(Http.make_cookie(name='z_c0', value='token', domain='www.zhihu.com'))
+        self.cookie = Http.dump_cookie(jar)
+        DB.save({'account': 'test', 'password': '', 'recordDate': '2016-01-01', 'cookieStr': self.cookie},
+                'LoginRecord')
+        DB.commit()
+        Http.cookie_account = None
+        Http.cookie_jar.clear()
+        return
+
+    def tearDown(self):
+        DB.conn.close()
+        os.chdir(currentPath)
+        shutil.rmtree(self.work_path)
+        urllib2.install_opener(None)
+        return
+
+    def get_saved_cookie(self):
+        return DB.get_result("select cookieStr from LoginRecord where account = 'test'")[0]
+
+    def test_load_in_memory(self):
+        Http.set_cookie()
+        self.assertEqual([x.value for x in Http.cookie_jar], ['token'])
+        self.assertEqual(os.listdir(self.work_path), [u'cookie.db'])
+        return
+
+    def test_load_once(self):
+        Http.set_cookie()
+        opener = Http.cookie_opener
+        Http.cookie_jar.set_cookie(Http.make_cookie(name='q_c1', value='session', domain='www.zhihu.com'))
+        Http.set_cookie()
+        self.assertEqual(len(Http.cookie_jar), 2)
+        self.assertIs(Http.cookie_opener, opener)
+        return
+
+    def test_save_changed_only(self):
+        Http.set_cookie()
+        Http.save_cookie()
+        self.assertEqual(self.get_saved_cookie(), self.cookie)
+        Http.cookie_jar.set_cookie(Http.make_cookie(name='q_c1', value='session', domain='www.zhihu.com'))
+        Http.save_cookie()
+        Http.cookie_account = None
+        Http.cookie_jar.clear()
+        Http.set_cookie('test')
+        self.assertEqual(sorted(x.value for x in Http.cookie_jar), ['session', 'token'])
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import BaseHTTPServer
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.http import Http
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class RangeRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    u"""
+    支持Range/If-Range的文件服务，server.truncate为True时只发送一半内容后断开
+    """
+
+    def do_GET(self):
+        content, etag = self.server.content, self.server.etag
+        self.server.header_list.append(dict(self.headers.items()))
+        start = 0
+        result = re.match(r'^bytes=(\d+)-$', self.headers.get('Range', ''))
+        if result and self.headers.get('If-Range', etag) == etag:
+            start = int(result.group(1))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(len(content)))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(content) - 1, len(content)))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content) - start))
+        self.end_headers()
+        body = content[start:]
+        self.wfile.write(body[:len(body) / 2] if self.server.truncate else body)
+        return
+
+    def log_message(self, *args):
+        return
+
+
+class HttpDownloadTest(unittest.TestCase):
+    content = ''.join(chr(x % 256) for x in range(10000))
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.file_path = self.work_path + '/image.jpg.part'
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        self.server.content, self.server.etag, self.server.truncate = self.content, '"v1"', False
+        self.server.header_list = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:{}/image.jpg'.format(self.server.server_address[1])
+        return
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.work_path)
+        return
+
+    def prepare(self, content, validator=''):
+        with open(self.file_path, 'wb') as f:
+            f.write(content)
+        if validator:
+            with open(self.file_path + '.etag', 'w') as f:
+                f.write(validator)
+        return
+
+    def read(self):
+        with open(self.file_path, 'rb') as f:
+            return f.read()
+
+    def test_resume(self):
+        self.prepare(self.content[:1000], '"v1"')
+        self.assertTrue(Http.download(self.url, self.file_path))
+        self.assertEqual(self.read(), self.content)
+        header = self.server.header_list[-1]
+        self.assertEqual((header['range'], header['if-range']), ('bytes=1000-', '"v1"'))
+        self.assertFalse(os.path.exists(self.file_path + '.etag'))
+        return
+
+    def test_changed(self):
+        # 服务器上的文件已变化，If-Range不匹配时返回完整的新文件
+        self.prepare('x' * 1000, '"v0"')
+        self.assertTrue(Http.download(self.url, self.file_path))
+        self.assertEqual(self.read(), self.content)
+        return
+
+    def test_without_validator(self):
+        self.prepare('x' * 1000)
+        self.assertTrue(Http.download(self.url, self.file_path))
+        self.assertEqual(self.read(), self.content)
+        self.assertNotIn('range', self.server.header_list[-1])
+        return
+
+    def test_range_not_satisfiable(self):
+        self.prepare(self.content + 'x' * 10, '"v1"')
+        self.assertFalse(Http.download(self.url, self.file_path))
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertFalse(os.path.exists(self.file_path + '.etag'))
+        return
+
+    def test_truncated(self):
+        self.server.truncate = True
+        self.assertFalse(Http.download(self.url, self.file_path))
+        self.assertEqual(self.read(), self.content[:len(self.content) / 2])
+        self.server.truncate = False
+        self.assertTrue(Http.download(self.url, self.file_path))
+        self.assertEqual(self.read(), self.content)
+        self.assertEqual(self.server.header_list[-1]['range'], 'bytes={}-'.format(len(self.content) / 2))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
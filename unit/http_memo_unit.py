@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import time
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.http import Http
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class HttpMemoTest(unittest.TestCase):
+    def setUp(self):
+        self.request_list = []
+        self.response = {}
+        self.get_content = Http.get_content
+
+        def get_content(url):
+            self.request_list.append(url)
+            time.sleep(0.05)
+            return self.response.get(url, '')
+
+        Http.get_content = staticmethod(get_content)
+        Http.clear_memo()
+        return
+
+    def tearDown(self):
+        Http.get_content = self.get_content
+        Http.clear_memo()
+        return
+
+    def test_memo(self):
+        self.response['a'] = 'content'
+        self.assertEqual(Http.get_shared_content('a'), 'content')
+        self.assertEqual(Http.get_shared_content('a'), 'content')
+        self.assertEqual(Http.get_shared_content('a', keep=False), 'content')
+        self.assertEqual(self.request_list, ['a'])
+        self.assertNotIn('a', Http.memo)
+        return
+
+    def test_coalesce(self):
+        self.response['a'] = 'content'
+        result_list = []
+        thread_list = [threading.Thread(target=lambda: result_list.append(Http.get_shared_content('a', keep=False)))
+                       for _ in range(5)]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+        self.assertEqual(result_list, ['content'] * 5)
+        self.assertEqual(self.request_list, ['a'])
+        self.assertEqual(Http.in_flight, {})
+        return
+
+    def test_failed_not_cached(self):
+        self.assertEqual(Http.get_shared_content('b'), '')
+        self.response['b'] = 'content'
+        self.assertEqual(Http.get_shared_content('b'), 'content')
+        self.assertEqual(self.request_list, ['b', 'b'])
+        return
+
+    def test_clear_memo(self):
+        self.response['a'] = 'content'
+        Http.get_shared_content('a')
+        Http.clear_memo()
+        Http.get_shared_content('a')
+        self.assertEqual(self.request_list, ['a', 'a'])
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
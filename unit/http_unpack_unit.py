@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import StringIO
+import sys
+import unittest
+import zlib
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.http import Http
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class FakeResponse(StringIO.StringIO):
+    def __init__(self, content, encoding=''):
+        StringIO.StringIO.__init__(self, content)
+        self.header = {'Content-Encoding': encoding} if encoding else {}
+        return
+
+    def info(self):
+        return self.header
+
+
+class HttpUnpackTest(unittest.TestCase):
+    content = u'<p>知乎答案内容</p>'.encode('utf-8') * 20000
+
+    def setUp(self):
+        self.chunk_size = Http.chunk_size
+        Http.chunk_size = 1024  # 保证内容被分为多块读取
+        return
+
+    def tearDown(self):
+        Http.chunk_size = self.chunk_size
+        return
+
+    def unpack(self, content, encoding=''):
+        return Http._Http__unpack(FakeResponse(content, encoding))
+
+    def test_plain(self):
+        self.assertEqual(self.unpack(self.content), self.content)
+        return
+
+    def test_gzip(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.assertEqual(self.unpack(compressor.compress(self.content) + compressor.flush(), 'gzip'), self.content)
+        return
+
+    def test_deflate(self):
+        self.assertEqual(self.unpack(zlib.compress(self.content), 'deflate'), self.content)
+        return
+
+    def test_raw_deflate(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.assertEqual(self.unpack(compressor.compress(self.content) + compressor.flush(), 'deflate'), self.content)
+        return
+
+    def test_broken(self):
+        self.assertEqual(self.unpack(self.content, 'gzip'), '')
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.config import Config
+from src.tools.image_pool import ImagePool
+from src.tools.path import Path
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class ImagePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.image_pool_path = Path.image_pool_path
+        self.image_pool_db_path = Path.image_pool_db_path
+        self.image_pool_max_size = Config.image_pool_max_size
+        Path.image_pool_path = self.work_path + u'/pool'
+        Path.image_pool_db_path = self.work_path + u'/image_pool.db'
+        Config.image_pool_max_size = 0
+        os.mkdir(Path.image_pool_path)
+        ImagePool.conn = None
+        return
+
+    def tearDown(self):
+        if ImagePool.conn:
+            ImagePool.conn.close()
+        ImagePool.conn = None
+        ImagePool.shard_set = set()
+        shutil.rmtree(self.work_path)
+        Path.image_pool_path = self.image_pool_path
+        Path.image_pool_db_path = self.image_pool_db_path
+        Config.image_pool_max_size = self.image_pool_max_size
+        return
+
+    @staticmethod
+    def write(file_path, size=100):
+        with open(file_path, 'wb') as image:
+            image.write('x' * size)
+        return
+
+    def add(self, filename, size=100, last_access=0):
+        u"""
+        直接在子目录中放入图片并写入索引
+        """
+        self.write(ImagePool.get_path(filename), size)
+        ImagePool.get_conn().execute('insert into ImagePool (filename, size, last_access) values (?, ?, ?)',
+                                     (filename, size, last_access))
+        ImagePool.get_conn().commit()
+        return
+
+    def get_filename_list(self):
+        return sorted(row[0] for row in ImagePool.get_conn().execute('select filename from ImagePool'))
+
+    def test_shard(self):
+        ImagePool.get_conn()
+        self.assertEqual(ImagePool.get_path(u'ab01.jpg'), Path.image_pool_path + u'/ab/ab01.jpg')
+        self.assertTrue(os.path.isdir(Path.image_pool_path + u'/ab'))
+        return
+
+    def test_import_flat_file(self):
+        # 旧版图片池中图片直接放在图片池目录下，首次打开索引时移入子目录
+        for filename in [u'ab01.jpg', u'cd01.jpg']:
+            self.write(Path.image_pool_path + u'/' + filename)
+        self.assertTrue(ImagePool.contains(u'ab01.jpg'))
+        self.assertEqual(self.get_filename_list(), [u'ab01.jpg', u'cd01.jpg'])
+        self.assertEqual(sorted(os.listdir(Path.image_pool_path)), [u'ab', u'cd'])
+        self.assertTrue(os.path.isfile(Path.image_pool_path + u'/cd/cd01.jpg'))
+        return
+
+    def test_add_file(self):
+        # 地址不同、内容相同的图片只保存一份，两个文件名都映射到以内容md5命名的同一文件
+        for (filename, content) in [(u'url01.jpg', 'a'), (u'url02.jpg', 'a'), (u'url03.jpg', 'b')]:
+            with open(self.work_path + u'/download.part', 'wb') as image:
+                image.write(content)
+            ImagePool.add_file(filename, self.work_path + u'/download.part')
+            self.assertFalse(os.path.exists(self.work_path + u'/download.part'))
+        image = hashlib.md5('a').hexdigest() + u'.jpg'
+        self.assertEqual((ImagePool.resolve(u'url01.jpg'), ImagePool.resolve(u'url02.jpg')), (image, image))
+        self.assertEqual(ImagePool.resolve(u'url03.jpg'), hashlib.md5('b').hexdigest() + u'.jpg')
+        self.assertEqual(len(self.get_filename_list()), 2)
+        with open(ImagePool.get_path(image), 'rb') as f:
+            self.assertEqual(f.read(), 'a')
+        # 旧版图片以地址的md5命名，没有映射记录，直接按文件名查找
+        self.add(u'ab01.jpg')
+        self.assertEqual(ImagePool.resolve(u'ab01.jpg'), u'ab01.jpg')
+        self.assertEqual(ImagePool.resolve(u'url04.jpg'), u'')
+        return
+
+    def test_evict(self):
+        for (filename, last_access) in [(u'aa01.jpg', 1), (u'bb01.jpg', 2), (u'cc01.jpg', 2), (u'dd01.jpg', 3)]:
+            self.add(filename, last_access=last_access)
+        # 最近使用时间相同时，被引用次数少的图片先被删除
+        ImagePool.get_conn().execute('update ImagePool set ref_count = 5 where filename = ?', (u'bb01.jpg',))
+        ImagePool.get_conn().execute('replace into ImageAlias (filename, image) values (?, ?)',
+                                     (u'url01.jpg', u'cc01.jpg'))
+        Config.image_pool_max_size = 200
+        self.assertEqual(ImagePool.evict(), 2)
+        self.assertEqual(self.get_filename_list(), [u'bb01.jpg', u'dd01.jpg'])
+        self.assertFalse(os.path.exists(Path.image_pool_path + u'/aa/aa01.jpg'))
+        self.assertFalse(ImagePool.contains(u'url01.jpg'))
+        self.assertEqual(ImagePool.evict(), 0)
+        return
+
+    def test_compact(self):
+        self.add(u'aa01.jpg')
+        self.add(u'bb01.jpg')
+        os.remove(ImagePool.get_path(u'bb01.jpg'))  # 文件已丢失的记录
+        self.write(ImagePool.get_path(u'cc01.jpg'))  # 未记录的图片
+        self.write(Path.image_pool_path + u'/dd01.jpg')  # 未归入子目录的图片
+        for filename in [u'ee01.jpg.part', u'ee01.jpg.part.etag']:
+            self.write(ImagePool.get_path(filename))
+        ImagePool.compact()
+        self.assertEqual(self.get_filename_list(), [u'aa01.jpg', u'cc01.jpg', u'dd01.jpg'])
+        self.assertEqual(os.listdir(Path.image_pool_path + u'/ee'), [])
+        self.assertTrue(os.path.isfile(Path.image_pool_path + u'/dd/dd01.jpg'))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
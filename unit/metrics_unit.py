@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.config import Config
+from src.tools.metrics import Metrics, MetricsHistogram
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.record_metrics = Config.record_metrics
+        Config.record_metrics = True
+        Metrics.counter, Metrics.histogram, Metrics.total_counter, Metrics.total_histogram = {}, {}, {}, {}
+        return
+
+    def tearDown(self):
+        Config.record_metrics = self.record_metrics
+        Metrics.counter, Metrics.histogram, Metrics.total_counter, Metrics.total_histogram = {}, {}, {}, {}
+        shutil.rmtree(self.work_path)
+        return
+
+    def test_exact(self):
+        for value in range(1, 101):
+            Metrics.observe('stage', float(value))
+        summary = Metrics.get_report({}, Metrics.histogram)['histogram']['stage']
+        self.assertEqual((summary['count'], summary['total'], summary['min'], summary['max']), (100, 5050, 1, 100))
+        self.assertEqual((summary['p50'], summary['p90'], summary['p99']), (50, 90, 99))
+        return
+
+    def test_bounded(self):
+        for book in range(3):
+            for value in range(MetricsHistogram.sample_size * 2):
+                Metrics.observe('stage', float(value))
+            self.assertEqual(len(Metrics.histogram['stage'].sample), MetricsHistogram.sample_size)
+            Metrics.finish_book(os.path.join(self.work_path, '{}.json'.format(book)))
+        histogram = Metrics.total_histogram['stage']
+        self.assertEqual(len(histogram.sample), MetricsHistogram.sample_size)
+        self.assertEqual((histogram.count, histogram.min, histogram.max),
+                         (MetricsHistogram.sample_size * 6, 0, MetricsHistogram.sample_size * 2 - 1))
+        summary = Metrics.summarize(histogram)
+        # 样本为均匀抽取，中位数应接近真实值
+        self.assertLess(abs(summary['p50'] - MetricsHistogram.sample_size), MetricsHistogram.sample_size * 0.2)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+# 模板路径在导入时按当前目录确定
+os.chdir(currentPath)
+
+from src.book import Book
+from src.read_list_parser import ReadListParser
+from src.tools.config import Config
+from src.tools.db import DB
+from src.tools.html_creator import HtmlCreator
+from src.tools.page_cache import PageCache
+from src.tools.path import Path
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class PageCacheTest(unittest.TestCase):
+    question_count = 3
+    answer_count = 2  # 每个问题下的答案数
+
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.db_path = Path.db_path
+        self.page_cache_db_path = Path.page_cache_db_path
+        self.config = {key: getattr(Config, key) for key in ['page_cache', 'page_cache_max_size', 'picture_quality']}
+        self.create_question = HtmlCreator.__dict__['create_question']
+        Path.db_path = self.work_path + u'/test.db'
+        Path.page_cache_db_path = self.work_path + u'/page_cache.db'
+        Config.page_cache = True
+        Config.picture_quality = 1
+        PageCache.conn = None
+        self.render_list = []
+
+        def create_question(creator, package, prefix=''):
+            self.render_list.append(package['question']['question_id'])
+            return self.create_question(creator, package, prefix)
+
+        HtmlCreator.create_question = create_question
+        self.create_database()
+        return
+
+    def tearDown(self):
+        HtmlCreator.create_question = self.create_question
+        DB.conn.close()
+        PageCache.conn.close()
+        PageCache.conn = None
+        shutil.rmtree(self.work_path)
+        Path.db_path = self.db_path
+        Path.page_cache_db_path = self.page_cache_db_path
+        for (key, value) in self.config.items():
+            setattr(Config, key, value)
+        return
+
+    def create_database(self):
+        DB.set_conn(sqlite3.connect(Path.db_path))
+        for sql_path in [u'db/zhihuhelp.sql', u'db/index.sql']:
+            with open(currentPath + sql_path) as sql_script:
+                DB.cursor.executescript(sql_script.read())
+        for question_index in range(self.question_count):
+            question_id = 30000000 + question_index
+            DB.save({'question_id': question_id, 'title': u'问题{}'.format(question_index), 'description': u'',
+                     'comment': 0, 'views': 0, 'answers': self.answer_count, 'followers': 0}, 'Question')
+            for answer_index in range(self.answer_count):
+                answer_id = question_id * 100 + answer_index
+                content = u'<p>答案{}</p><img src="https://pic2.zhimg.com/{}_r.jpg">'.format(answer_id, answer_id)
+                DB.save({'author_id': 'author', 'author_sign': u'', 'author_logo': '', 'author_name': u'作者',
+                         'agree': answer_index, 'content': content, 'question_id': question_id,
+                         'answer_id': answer_id, 'commit_date': '2016-01-01', 'edit_date': '2016-01-01',
+                         'comment': 0, 'no_record_flag': 0,
+                         'href': 'https://www.zhihu.com/question/{}/answer/{}'.format(question_id, answer_id)},
+                        'Answer')
+        DB.commit()
+        return
+
+    def render(self):
+        u"""
+        *   返回
+            *   ({文件名: 页面内容}, 图片地址列表)
+        """
+        command = '$'.join('https://www.zhihu.com/question/{}'.format(30000000 + index) for index in
+                           range(self.question_count))
+        self.render_list = []
+        page_map = {}
+        href_list = []
+        book = Book(ReadListParser.get_task(command).book_list)
+        for volume in book.book_list:
+            book_package = book.create_book_package(volume)
+            for raw_book in book_package.book_list:
+                for page in raw_book.page_list:
+                    page_map[page.filename] = (page.title, str(page.content))
+            href_list += book_package.image_container.get_href_list()
+        return page_map, sorted(href_list)
+
+    def test_rebuild(self):
+        page_map, href_list = self.render()
+        self.assertEqual(len(self.render_list), self.question_count)
+        self.assertEqual(len([x for x in href_list if 'zhimg.com' in x]), self.question_count * self.answer_count)
+        self.assertEqual(self.render(), (page_map, href_list))
+        self.assertEqual(self.render_list, [])
+        return
+
+    def test_changed_answer(self):
+        page_map, _ = self.render()
+        DB.cursor.execute('update Answer set agree = 100 where answer_id = ?', (3000000101,))
+        DB.commit()
+        new_page_map, _ = self.render()
+        self.assertEqual(self.render_list, [30000001])
+        self.assertEqual([x for x in page_map if page_map[x] != new_page_map[x]], ['0_30000001.xhtml'])
+        return
+
+    def test_picture_quality(self):
+        self.render()
+        Config.picture_quality = 2
+        _, href_list = self.render()
+        self.assertEqual(len(self.render_list), self.question_count)
+        self.assertNotIn('_b.jpg', ''.join(href_list))
+        return
+
+    def test_disabled(self):
+        Config.page_cache = False
+        self.render()
+        self.render()
+        self.assertEqual(len(self.render_list), self.question_count)
+        return
+
+    def test_missing_fingerprint(self):
+        u"""
+        旧版数据库中的答案没有正文指纹，所在页面每次都重新渲染
+        """
+        DB.cursor.execute("update Answer set fingerprint = '' where question_id = ?", (30000002,))
+        DB.commit()
+        self.render()
+        self.render()
+        self.assertEqual(self.render_list, [30000002])
+        return
+
+    def test_evict(self):
+        for (index, key) in enumerate(['a', 'b', 'c']):
+            PageCache.put(key, u'页面' * 100, [])
+            PageCache.get_conn().execute('update PageCache set last_access = ? where key = ?', (index, key))
+        PageCache.commit()
+        Config.page_cache_max_size = PageCache.get_conn().execute('select size from PageCache').fetchone()[0]
+        self.assertEqual(PageCache.evict(), 2)
+        self.assertEqual(PageCache.get_batch(['a', 'b', 'c']).keys(), ['c'])
+        Config.page_cache_max_size = 0
+        self.assertEqual(PageCache.evict(), 0)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.content_compressor import ContentCompressor
+from src.tools.db import DB
+from src.tools.search_index import SearchIndex
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def create_answer(index, **kwargs):
+    answer = {'author_id': 'author', 'author_sign': u'', 'author_logo': '', 'author_name': u'作者',
+              'agree': 10, 'content': u'<p>第{}个回答</p>'.format(index), 'question_id': 30000000,
+              'answer_id': index, 'commit_date': '2016-01-01', 'edit_date': '2016-01-01', 'comment': 0,
+              'no_record_flag': 0, 'href': u'https://www.zhihu.com/question/30000000/answer/{}'.format(index)}
+    answer.update(kwargs)
+    return answer
+
+
+class SaveBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        DB.set_conn(sqlite3.connect(self.work_path + u'/save_batch.db'))
+        for sql_path in [u'db/zhihuhelp.sql', u'db/index.sql']:
+            with open(currentPath + sql_path) as sql_script:
+                DB.cursor.executescript(sql_script.read())
+        SearchIndex.init(DB.cursor)
+        DB.save({'question_id': 30000000, 'title': u'问题', 'description': u'', 'comment': 0, 'views': 0,
+                 'answers': 3, 'followers': 0}, 'Question')
+        self.assertEqual(DB.save_batch([create_answer(x) for x in range(3)], 'Answer'), (3, 0, 0))
+        return
+
+    def tearDown(self):
+        DB.conn.close()
+        shutil.rmtree(self.work_path)
+        return
+
+    def get_answer(self, index, column):
+        row = DB.cursor.execute('select {}, content_format from Answer where answer_id = ?'.format(column),
+                                (index,)).fetchone()
+        if column == 'content':
+            return ContentCompressor.decode(row[0], row[1])
+        return row[0]
+
+    def search(self, keyword):
+        sql = u'select count(*) from {}'.format(SearchIndex.get_search_source('Answer', keyword))
+        return DB.cursor.execute(sql).fetchone()[0]
+
+    def test_unchanged(self):
+        self.assertEqual(DB.save_batch([create_answer(x) for x in range(3)], 'Answer'), (0, 0, 3))
+        self.assertEqual(self.get_answer(0, 'fingerprint'),
+                         ContentCompressor.get_fingerprint(create_answer(0)['content']))
+        return
+
+    def test_update_extra_info(self):
+        answer_list = [create_answer(0, agree=20), create_answer(1, agree='10'), create_answer(3)]
+        self.assertEqual(DB.save_batch(answer_list, 'Answer'), (1, 1, 1))
+        self.assertEqual(self.get_answer(0, 'agree'), 20)
+        self.assertEqual(self.get_answer(0, 'content'), create_answer(0)['content'])
+        return
+
+    def test_update_content(self):
+        answer_list = [create_answer(0, content=u'<p>修改后的回答</p>'), create_answer(1, edit_date='2016-02-01')]
+        self.assertEqual(DB.save_batch(answer_list, 'Answer'), (0, 2, 0))
+        self.assertEqual(self.get_answer(0, 'content'), u'<p>修改后的回答</p>')
+        self.assertEqual(self.get_answer(1, 'edit_date'), '2016-02-01')
+        if SearchIndex.fts:
+            self.assertEqual(self.search(u'修改后'), 1)
+            self.assertEqual(self.search(u'第0个'), 0)
+        return
+
+    def test_update_author_name(self):
+        self.assertEqual(DB.save_batch([create_answer(0, author_name=u'新作者')], 'Answer'), (0, 1, 0))
+        if SearchIndex.fts:
+            self.assertEqual(self.search(u'新作者'), 1)
+        return
+
+    def test_duplicate_href(self):
+        answer_list = [create_answer(3), create_answer(3), create_answer(3, agree=30)]
+        self.assertEqual(DB.save_batch(answer_list, 'Answer'), (1, 1, 1))
+        self.assertEqual(self.get_answer(3, 'agree'), 30)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
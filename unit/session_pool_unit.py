@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import cookielib
+import sys
+import time
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from stub_server import StubConfig, StubHandler, StubZhihuServer
+from src.tools.config import Config
+from src.tools.http import Http
+from src.tools.session_pool import Session, SessionPool
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class TestConfig(StubConfig):
+    page_count = 1
+    page_size = 1
+    answer_length = 100
+    image_count = 0
+    latency = 0
+    session_interval = 0.1
+    expired_token_list = ['token-expired']
+    forbidden_token_list = ['token-forbidden']
+
+
+class SessionPoolTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubZhihuServer(TestConfig)
+        cls.server.start()
+        StubHandler.install(cls.server.get_address())
+        return
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        return
+
+    def setUp(self):
+        self.session_interval = Config.session_interval
+        self.backoff = SessionPool.backoff
+        Config.session_interval = 0.12
+        self.server.stat = {}
+        self.server.last_request = {}
+        SessionPool.clear()
+        return
+
+    def tearDown(self):
+        Config.session_interval = self.session_interval
+        SessionPool.backoff = self.backoff
+        SessionPool.clear()
+        return
+
+    @staticmethod
+    def add_session(token):
+        jar = cookielib.LWPCookieJar()
+        jar.set_cookie(Http.make_cookie(name='z_c0', value=token, domain='www.zhihu.com'))
+        session = Session(token, jar, '')
+        SessionPool.add(session)
+        return session
+
+    @staticmethod
+    def fetch(index):
+        return Http.get_content('https://www.zhihu.com/question/{}'.format(30000000 + index))
+
+    def test_spread(self):
+        session_list = [self.add_session('token-{}'.format(x)) for x in range(3)]
+        start = time.time()
+        for index in range(9):
+            self.assertTrue(self.fetch(index))
+        self.assertEqual([x.request_count for x in session_list], [3, 3, 3])
+        self.assertNotIn('rate_limited', self.server.stat)
+        self.assertLess(time.time() - start, 9 * Config.session_interval)
+        return
+
+    def test_rate_limited(self):
+        session = self.add_session('token-0')
+        Config.session_interval = 0
+        self.assertTrue(self.fetch(0))
+        self.assertEqual(self.fetch(1), '')
+        self.assertEqual(session.rate_limited_count, 1)
+        self.assertGreater(session.next_time, time.time() + SessionPool.backoff / 2.0)
+        self.assertFalse(session.retired)
+        return
+
+    def test_retire_login_wall(self):
+        expired = self.add_session('token-expired')
+        session = self.add_session('token-0')
+        self.assertEqual(self.fetch(0), '')
+        self.assertTrue(expired.retired)
+        self.assertTrue(self.fetch(1))
+        self.assertTrue(self.fetch(2))
+        self.assertEqual((expired.request_count, session.request_count), (1, 2))
+        return
+
+    def test_forbidden(self):
+        # 403不代表登录状态失效，只记为失败，账号继续使用
+        session = self.add_session('token-forbidden')
+        self.assertEqual(self.fetch(0), '')
+        self.assertEqual(self.fetch(1), '')
+        self.assertEqual((session.failed_count, session.retired), (2, False))
+        self.assertIs(SessionPool.acquire(), session)
+        return
+
+    def test_all_retired(self):
+        self.add_session('token-expired')
+        self.fetch(0)
+        self.assertIsNone(SessionPool.acquire())
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
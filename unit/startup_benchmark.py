@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+u"""
+启动耗时基准测试
+在临时目录中多次启动新进程，统计 导入src.main => 初始化ZhihuHelp 的耗时，以及包含解释器启动在内的进程总耗时
+*   同时检查启动阶段没有载入bs4、没有创建抓取线程池
+*   总耗时的中位数超过--target时以返回值1退出
+
+用法示例
+    python startup_benchmark.py
+    python startup_benchmark.py --repeat 20 --target 300
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# 添加库路径
+currentPath = os.path.abspath(sys.path[0]).replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def run_child():
+    u"""
+    --child启动的子进程，在临时目录中完成启动并输出各阶段耗时
+    """
+    start = time.time()
+    from src.main import ZhihuHelp
+    imported = time.time()
+    ZhihuHelp()
+    initialized = time.time()
+
+    from src.tools.controler import Control
+
+    print json.dumps({'import': imported - start, 'init': initialized - imported, 'bs4': 'bs4' in sys.modules,
+                      'thread_pool': Control.thread_pool is not None, 'thread': threading.active_count()})
+    return
+
+
+def measure(work_path):
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        # 子进程输出被重定向，显式指定编码，与终端中运行时一致
+        output = subprocess.check_output([sys.executable, currentPath + 'unit/startup_benchmark.py', '--child'],
+                                         cwd=work_path, stderr=devnull, env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+        total = time.time() - start
+    result = json.loads(output.strip().split('\n')[-1])
+    result['total'] = total
+    return result
+
+
+def get_median(value_list):
+    value_list = sorted(value_list)
+    return value_list[len(value_list) / 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'统计程序启动耗时')
+    parser.add_argument('--repeat', type=int, default=10, help=u'启动次数，取中位数')
+    parser.add_argument('--target', type=int, default=200, help=u'进程总耗时的目标值，单位毫秒')
+    parser.add_argument('--output', default='', help=u'将结果以json格式写入指定文件')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    argv = parser.parse_args()
+    if argv.child:
+        run_child()
+        return
+
+    # 在临时目录中运行，数据库等不会影响正式目录，首次启动需要建立数据库，不计入统计
+    work_path = tempfile.mkdtemp()
+    try:
+        for name in ['db', 'www']:
+            os.symlink(currentPath + name, os.path.join(work_path, name))
+        measure(work_path)
+        run_list = [measure(work_path) for _ in range(argv.repeat)]
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    result = dict((key, get_median([x[key] for x in run_list])) for key in ['import', 'init', 'total'])
+    result.update({
+        'repeat': argv.repeat,
+        'target': argv.target / 1000.0,
+        'bs4': any(x['bs4'] for x in run_list),
+        'thread_pool': any(x['thread_pool'] for x in run_list),
+        'thread': max(x['thread'] for x in run_list),
+    })
+    print u'启动{repeat}次，耗时中位数'.format(**result)
+    print u'    导入src.main    {:>8.1f}ms'.format(result['import'] * 1000)
+    print u'    初始化ZhihuHelp {:>8.1f}ms'.format(result['init'] * 1000)
+    print u'    进程总耗时      {:>8.1f}ms  目标{:.0f}ms'.format(result['total'] * 1000, argv.target)
+    if result['bs4']:
+        print u'启动阶段载入了bs4'
+    if result['thread_pool']:
+        print u'启动阶段创建了抓取线程池'
+    print u'启动后线程数:{thread}'.format(**result)
+    if argv.output:
+        with open(argv.output, 'w') as f:
+            json.dump(result, f, indent=4)
+    if result['total'] > result['target']:
+        print u'进程总耗时超过目标值'
+        sys.exit(1)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+import BaseHTTPServer
+import Cookie
+import SocketServer
+import cgi
+import httplib
+import json
+import random
+import re
+import threading
+import time
+import urllib
+import urllib2
+import urlparse
+import zlib
+
+
+class StubConfig(object):
+    u"""
+    本地桩服务器生成数据的规模与延迟
+    *   列表类页面(问题/用户/收藏夹/话题/专栏)均为page_count页，每页page_size个答案
+    """
+    page_count = 5
+    page_size = 20
+    answer_length = 2000  # 每个答案的字数
+    image_count = 2  # 每个答案中的图片数
+    image_size = 30 * 1024  # 每张图片的字节数
+    latency = 0.05  # 网页/接口的响应延迟，单位为秒
+    image_latency = 0.02  # 图片的响应延迟
+    column_limit = 20  # 专栏文章接口每页最多返回的文章数
+    compress = True  # 请求头中带有Accept-Encoding时是否压缩网页/接口内容
+    session_interval = 0  # 同一cookie(z_c0)两次请求网页/接口的最小间隔，单位为秒，请求过快时返回429，0为不限制
+    expired_token_list = []  # 登录状态已失效的z_c0，请求网页/接口时重定向至登录页
+    forbidden_token_list = []  # 请求网页/接口时返回403的z_c0
+    seed = 20161019
+
+
+class StubPage(object):
+    u"""
+    按zhihu_parser所用的页面结构生成网页
+    *   unit/unit_html下的样例页面为空文件，无法直接复用，因此按解析器读取的标签与class拼出最小可解析的页面
+    *   同一网址每次生成的内容相同，以便重试与对比
+    """
+    phrase_list = [u'知乎', u'问题', u'回答', u'我们', u'因为', u'所以', u'但是', u'这个', u'一个', u'可以', u'没有', u'时候',
+                   u'自己', u'什么', u'如果', u'已经', u'事情', u'世界', u'历史', u'科学', u'经济', u'社会', u'文化', u'技术']
+
+    html = u'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="mobile-agent" content="format=html5;url={mobile_url}">
+<link rel="canonical" href="{canonical_url}"><title>{title}</title></head>
+<body>{body}</body></html>'''
+
+    pager = u'''<div class="zm-invite-pager"><span><a href="?page=1">1</a></span><span>...</span><span><a href="?page={page_count}">{page_count}</a></span><span><a href="?page={next_page}">下一页</a></span></div>'''
+
+    answer = u'''<div class="zm-item-answer">
+<div class="zm-item-answer-author-info"><a class="zm-item-link-avatar" href="/people/{author_id}"><img src="https://pic1.zhimg.com/{author_id}_s.jpg"></a><a class="author-link" href="/people/{author_id}">{author_name}</a><span class="bio" title="{author_sign}">{author_sign}</span></div>
+<div class="zm-item-vote-info" data-votecount="{agree}"></div>
+{body}
+<div class="zm-meta-panel">{date_link}<a href="#" name="addcomment">{comment} 条评论</a><a class="copyright">作者保留权利</a></div>
+</div>'''
+
+    date_link = u'''<a class="answer-date-link" data-tip="发布于 {commit_date}" href="/question/{question_id}/answer/{answer_id}">编辑于 {edit_date}</a>'''
+
+    list_item = u'''<div class="{item_class}"><h2 class="zm-item-title"><a class="question_link" target="_blank" href="/question/{question_id}">{title}</a></h2>
+{answer}</div>'''
+
+    question_body = u'''<div id="zh-question-title"><h2>{title}</h2></div>
+<div id="zh-question-detail"><div class="zm-editable-content">{description}</div></div>
+<div id="zh-question-meta-wrap"><a href="#" name="addcomment">{comment} 条评论</a></div>
+<div id="zh-question-answer-wrap">{answer_list}</div>{pager}
+<div class="zu-main-sidebar"><div class="zm-side-section"><div class="zh-question-followers-sidebar"><div class="zg-gray-normal"><strong>{followers}</strong> 人关注该问题</div></div></div>
+<div class="zm-side-section"><div class="zm-side-section-inner">被浏览 <strong>{views}</strong> 次</div></div></div>'''
+
+    author_body = u'''<div class="zm-profile-header"><div class="title-section"><a class="name" href="/people/{author_id}">{name}</a><span class="bio" title="{sign}">{sign}</span></div>
+<div class="zm-profile-header-avatar-container"><img class="avatar" src="https://pic1.zhimg.com/{author_id}_l.jpg"></div>
+<div class="description"><span class="content">{description}</span></div>
+<div class="profile-navbar"><a class="item" href="/people/{author_id}">主页</a><a class="item" href="/people/{author_id}/asks">提问<span class="num">{asks}</span></a><a class="item" href="/people/{author_id}/answers">回答<span class="num">{answers}</span></a><a class="item" href="/people/{author_id}/posts">文章<span class="num">0</span></a><a class="item" href="/people/{author_id}/collections">收藏<span class="num">0</span></a><a class="item" href="/people/{author_id}/logs">公共编辑<span class="num">0</span></a></div></div>
+<div class="zm-profile-details-wrap"><div class="zm-profile-module-desc"><span><strong>{agree}</strong>赞同</span><span><strong>{thanks}</strong>感谢</span><span><strong>0</strong>收藏</span><span><strong>0</strong>分享</span></div></div>
+<div class="zu-main-sidebar"><div class="zm-profile-side-following"><a href="/people/{author_id}/followees"><strong>{followee}</strong></a><a href="/people/{author_id}/followers"><strong>{follower}</strong></a></div></div>'''
+
+    collection_body = u'''<h2 id="zh-fav-head-title">{title}</h2><div id="zh-fav-head-description-source">{description}</div>
+<div id="zh-list-meta-wrap"><a href="#" name="addcomment">{comment} 条评论</a></div>
+<div id="zh-list-answer-wrap">{answer_list}</div>{pager}
+<div class="zm-side-section"><div class="zm-side-section-inner"><div class="zg-gray-normal"><a href="/collection/{collection_id}/followers">{follower}</a> 人关注</div></div></div>'''
+
+    topic_body = u'''<div id="zh-topic-title"><h1 class="zm-editable-content">{title}</h1></div>
+<img class="zm-avatar-editor-preview" src="https://pic1.zhimg.com/topic_{topic_id}_l.jpg">
+<div id="zh-topic-desc"><div class="zm-editable-content">{description}</div></div>
+<div class="zm-topic-side-followers-info"><a href="/topic/{topic_id}/followers"><strong>{follower}</strong></a> 人关注了该话题</div>
+<div id="zh-topic-top-page-list">{answer_list}<div class="content"></div></div>{pager}'''
+
+    def __init__(self, config=StubConfig):
+        self.config = config
+        return
+
+    def get_random(self, key):
+        return random.Random('{}_{}'.format(self.config.seed, key))
+
+    def create_text(self, generator, length):
+        text = []
+        while len(text) < length:
+            text += generator.choice(self.phrase_list)
+        return u''.join(text[:length])
+
+    def create_content(self, answer_id):
+        u"""
+        答案正文，由若干段落与图片组成，图片文件名按答案id生成，不同答案的图片互不相同
+        """
+        generator = self.get_random(answer_id)
+        paragraph_count = max(self.config.image_count + 1, self.config.answer_length / 200 or 1)
+        paragraph_length = self.config.answer_length / paragraph_count or 1
+        paragraph_list = []
+        for index in range(paragraph_count):
+            paragraph_list.append(u'<p>{}</p>'.format(self.create_text(generator, paragraph_length)))
+            if index < self.config.image_count:
+                paragraph_list.append(u'<img src="https://pic1.zhimg.com/{}_{}_b.jpg">'.format(answer_id, index))
+        return u''.join(paragraph_list)
+
+    def create_answer(self, question_id, answer_id, simple=False, author_id=''):
+        u"""
+        *   simple
+            *   用户/收藏夹/话题页面中的答案正文放在textarea中，日期链接在p.visible-expanded中
+        *   author_id
+            *   为空时随机选择作者
+        """
+        generator = self.get_random(answer_id)
+        info = {
+            'question_id': question_id,
+            'answer_id': answer_id,
+            'author_id': author_id or 'stub-author-{}'.format(generator.randint(1, 50)),
+            'agree': generator.randint(0, 100000),
+            'comment': generator.randint(0, 1000),
+            'commit_date': '2016-{:02}-{:02}'.format(generator.randint(1, 6), generator.randint(1, 28)),
+            'edit_date': '2016-{:02}-{:02}'.format(generator.randint(7, 12), generator.randint(1, 28)),
+        }
+        info['author_name'] = info['author_sign'] = info['author_id']
+        date_link = self.date_link.format(**info)
+        content = self.create_content(answer_id)
+        if simple:
+            body = u'<textarea class="content">{}</textarea><p class="visible-expanded">{}</p>'.format(
+                cgi.escape(content), date_link)
+            date_link = u''
+        else:
+            body = u'<div class="zm-editable-content">{}</div>'.format(content)
+        return self.answer.format(body=body, date_link=date_link, **info)
+
+    def create_pager(self, page):
+        if self.config.page_count <= 1:
+            return u''
+        return self.pager.format(page_count=self.config.page_count, next_page=min(page + 1, self.config.page_count))
+
+    def create_page(self, title, mobile_url, body):
+        return self.html.format(title=title, mobile_url=mobile_url, canonical_url=mobile_url, body=body)
+
+    def get_question_id(self, key, page, index):
+        u"""
+        用户/收藏夹/话题中第page页第index个答案所属的问题，问题id与答案id均为8位数字
+        """
+        offset = (zlib.crc32(key) & 0xfff) * self.config.page_count * self.config.page_size
+        return 31000000 + (offset + (page - 1) * self.config.page_size + index) % 9000000
+
+    def question(self, question_id, page=1, answer_id=None):
+        question_id = int(question_id)
+        if answer_id:
+            answer_list = [self.create_answer(question_id, int(answer_id))]
+            pager = u''
+        else:
+            first_id = 40000000 + ((question_id % 10000) * self.config.page_count + page - 1) * self.config.page_size
+            answer_list = [self.create_answer(question_id, first_id + x) for x in range(self.config.page_size)]
+            pager = self.create_pager(page)
+        generator = self.get_random(question_id)
+        title = u'问题{}：{}'.format(question_id, self.create_text(generator, 12))
+        body = self.question_body.format(title=title, description=self.create_text(generator, 100),
+                                         comment=generator.randint(0, 100), answer_list=u''.join(answer_list),
+                                         pager=pager, followers=generator.randint(0, 10000),
+                                         views=generator.randint(0, 1000000))
+        return self.create_page(title, u'https://www.zhihu.com/question/{}'.format(question_id), body)
+
+    def create_answer_list(self, key, page, item_class, author_id=''):
+        item_list = []
+        for index in range(self.config.page_size):
+            question_id = self.get_question_id(key, page, index)
+            answer = self.create_answer(question_id, question_id + 20000000, simple=True, author_id=author_id)
+            item_list.append(self.list_item.format(item_class=item_class, question_id=question_id, answer=answer,
+                                                   title=u'问题{}'.format(question_id)))
+        return u''.join(item_list)
+
+    def author(self, author_id, page=1):
+        answer_list = self.create_answer_list('author' + author_id, page, 'zm-item', author_id)
+        body = u'<div id="zh-profile-answer-list">{}</div>{}'.format(answer_list, self.create_pager(page))
+        return self.create_page(author_id, u'https://www.zhihu.com/people/{}'.format(author_id), body)
+
+    def author_info(self, author_id):
+        generator = self.get_random(author_id)
+        body = self.author_body.format(author_id=author_id, name=author_id, sign=self.create_text(generator, 10),
+                                       description=self.create_text(generator, 50),
+                                       asks=generator.randint(0, 100),
+                                       answers=self.config.page_count * self.config.page_size,
+                                       agree=generator.randint(0, 100000), thanks=generator.randint(0, 10000),
+                                       followee=generator.randint(0, 1000), follower=generator.randint(0, 100000))
+        return self.create_page(author_id, u'https://www.zhihu.com/people/{}'.format(author_id), body)
+
+    def collection(self, collection_id, page=1):
+        generator = self.get_random('collection' + collection_id)
+        body = self.collection_body.format(title=u'收藏夹{}'.format(collection_id),
+                                           description=self.create_text(generator, 50),
+                                           comment=generator.randint(0, 100), collection_id=collection_id,
+                                           follower=generator.randint(0, 10000), pager=self.create_pager(page),
+                                           answer_list=self.create_answer_list('collection' + collection_id, page,
+                                                                               'zm-item'))
+        return self.create_page(u'收藏夹{}'.format(collection_id),
+                                u'https://www.zhihu.com/collection/{}'.format(collection_id), body)
+
+    def topic(self, topic_id, page=1):
+        generator = self.get_random('topic' + topic_id)
+        body = self.topic_body.format(title=u'话题{}'.format(topic_id), topic_id=topic_id,
+                                      description=self.create_text(generator, 50),
+                                      follower=generator.randint(0, 10000), pager=self.create_pager(page),
+                                      answer_list=self.create_answer_list('topic' + topic_id, page, 'content'))
+        return self.create_page(u'话题{}'.format(topic_id), u'https://www.zhihu.com/topic/{}'.format(topic_id), body)
+
+    def create_column_author(self, column_id):
+        return {'slug': 'stub-author-{}'.format(column_id), 'hash': zlib.crc32(column_id) & 0xffffffff,
+                'bio': u'专栏作者', 'name': u'作者{}'.format(column_id),
+                'avatar': {'template': 'https://pic1.zhimg.com/{id}_{size}.jpg', 'id': 'column_' + column_id}}
+
+    def column_info(self, column_id):
+        info = {'creator': self.create_column_author(column_id), 'slug': column_id, 'name': u'专栏{}'.format(column_id),
+                'avatar': {'id': 'column_' + column_id}, 'postsCount': self.config.page_count * self.config.page_size,
+                'followersCount': 1000, 'description': u'专栏{}的介绍'.format(column_id)}
+        return json.dumps(info)
+
+    def column_post_list(self, column_id, offset, limit):
+        total = self.config.page_count * self.config.page_size
+        limit = min(limit, self.config.column_limit)
+        article_list = []
+        for index in range(offset, min(offset + limit, total)):
+            article_id = 60000000 + (zlib.crc32(column_id) & 0xfff) * 10000 + index
+            generator = self.get_random(article_id)
+            article_list.append({
+                'author': self.create_column_author(column_id),
+                'title': u'文章{}：{}'.format(article_id, self.create_text(generator, 12)),
+                'slug': article_id,
+                'url': '/{}/{}'.format(column_id, article_id),
+                'titleImage': '',
+                'content': self.create_content(article_id),
+                'commentsCount': generator.randint(0, 1000),
+                'likesCount': generator.randint(0, 100000),
+                'publishedTime': '2016-{:02}-{:02}T08:00:00+08:00'.format(generator.randint(1, 12),
+                                                                          generator.randint(1, 28)),
+            })
+        return json.dumps(article_list)
+
+    def signin(self):
+        return self.create_page(u'登录知乎', u'https://www.zhihu.com/signin', u'<form class="sign-form"></form>')
+
+    def image(self, filename):
+        u"""
+        以JPEG文件头开头的伪图片，内容按文件名生成，不同图片的内容互不相同
+        """
+        generator = self.get_random(filename)
+        head = '\xff\xd8\xff\xe0' + filename.encode('utf-8')
+        body = ''.join(chr(generator.randint(0, 255)) for _ in range(min(self.config.image_size, 256)))
+        content = head + body * (self.config.image_size / len(body) + 1)
+        return content[:max(self.config.image_size, len(head))]
+
+
+class StubHandler(urllib2.HTTPHandler):
+    u"""
+    将所有http/https请求改写为 http://桩服务器地址/原始域名/原始路径，保证测试过程中不会访问外网
+    *   替换urllib2中的HTTPHandler/HTTPSHandler后(见install)，build_opener生成的opener也会使用该类，抓取代码无需修改
+    """
+    address = ''
+
+    def http_open(self, request):
+        url = 'http://{}/{}{}'.format(StubHandler.address, request.get_host(), request.get_selector())
+        stub_request = urllib2.Request(url, data=request.get_data(), headers=dict(request.header_items()))
+        stub_request.timeout = request.timeout
+        return self.do_open(httplib.HTTPConnection, stub_request)
+
+    https_open = http_open
+
+    @staticmethod
+    def install(address):
+        StubHandler.address = address
+        urllib2.HTTPHandler = urllib2.HTTPSHandler = StubHandler
+        urllib2.install_opener(urllib2.build_opener())
+        return
+
+
+class StubRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    u"""
+    请求路径为 /原始域名/原始路径，由StubHandler改写而来
+    *   模板中引用的其它站点的图片(如默认头像)统一返回同一张图片
+    """
+    route_list = [
+        (r'^/www\.zhihu\.com/question/(\d+)/answer/(\d+)$', 'html', lambda page, x, y, query: page.question(
+            x, answer_id=y)),
+        (r'^/www\.zhihu\.com/question/(\d+)$', 'html', lambda page, x, query: page.question(x, get_page(query))),
+        (r'^/www\.zhihu\.com/people/([^/]+)/about$', 'html', lambda page, x, query: page.author_info(x)),
+        (r'^/www\.zhihu\.com/people/([^/]+)/answers$', 'html', lambda page, x, query: page.author(x, get_page(query))),
+        (r'^/www\.zhihu\.com/collection/(\d+)$', 'html', lambda page, x, query: page.collection(x, get_page(query))),
+        (r'^/www\.zhihu\.com/topic/(\d+)/top-answers$', 'html', lambda page, x, query: page.topic(x, get_page(query))),
+        (r'^/zhuanlan\.zhihu\.com/api/columns/([^/]+)$', 'api', lambda page, x, query: page.column_info(x)),
+        (r'^/zhuanlan\.zhihu\.com/api/columns/([^/]+)/posts$', 'api', lambda page, x, query: page.column_post_list(
+            x, int(query.get('offset', ['0'])[0] or 0), int(query.get('limit', ['10'])[0]))),
+        (r'^/www\.zhihu\.com/signin$', 'login', lambda page, query: page.signin()),
+        (r'^/pic\d?\.zhimg\.com/(.+)$', 'image', lambda page, x, query: page.image(x)),
+        (r'^/[^/]+/.+\.(?:jpg|jpeg|png|gif)$', 'image', lambda page, query: page.image(u'default')),
+    ]
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        for (pattern, kind, route) in self.route_list:
+            result = re.match(pattern, url.path)
+            if not result:
+                continue
+            status = self.server.check_session(self.get_token()) if kind in ('html', 'api') else 'ok'
+            if status == 'login_wall':
+                self.send_response(302)
+                self.send_header('Location', 'https://www.zhihu.com/signin?next=' + urllib.quote(self.path))
+                self.end_headers()
+                self.server.record(status, 0)
+                return
+            if status in ('rate_limited', 'forbidden'):
+                self.send_error(429 if status == 'rate_limited' else 403)
+                self.server.record(status, 0)
+                return
+            time.sleep(self.server.config.image_latency if kind == 'image' else self.server.config.latency)
+            content = route(self.server.page, *(result.groups() + (query,)))
+            if isinstance(content, unicode):
+                content = content.encode('utf-8')
+            encoding = self.get_encoding() if kind != 'image' else ''
+            if encoding == 'gzip':
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                content = compressor.compress(content) + compressor.flush()
+            elif encoding == 'deflate':
+                content = zlib.compress(content)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg' if kind == 'image' else 'text/html; charset=UTF-8')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            self.server.record(kind, len(content))
+            return
+        self.send_error(404)
+        self.server.record('missing', 0)
+        return
+
+    def get_token(self):
+        cookie = Cookie.SimpleCookie(self.headers.get('Cookie', ''))
+        return cookie['z_c0'].value if 'z_c0' in cookie else ''
+
+    def get_encoding(self):
+        if not self.server.config.compress:
+            return ''
+        accept = self.headers.get('Accept-Encoding', '')
+        for encoding in ['gzip', 'deflate']:
+            if encoding in accept:
+                return encoding
+        return ''
+
+    def log_message(self, *args):
+        return
+
+
+def get_page(query):
+    return int(query.get('page', ['1'])[0] or 1)
+
+
+class StubZhihuServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    u"""
+    本地知乎桩服务器，在后台线程中运行，监听127.0.0.1上的随机端口
+    *   stat中记录各类请求的次数与返回的字节数(压缩后)，kind为html/api/image/login/missing，
+        以及被限流(rate_limited)、被重定向至登录页(login_wall)的次数
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, config=StubConfig):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StubRequestHandler)
+        self.config = config
+        self.page = StubPage(config)
+        self.lock = threading.Lock()
+        self.stat = {}
+        self.last_request = {}  # z_c0 => 最近一次请求网页/接口的时间
+        self.thread = None
+        return
+
+    def get_address(self):
+        return '{}:{}'.format(*self.server_address)
+
+    def check_session(self, token):
+        u"""
+        按cookie中的z_c0模拟知乎的登录状态检查与限流，返回ok/rate_limited/login_wall/forbidden
+        """
+        if token in self.config.expired_token_list:
+            return 'login_wall'
+        if token in self.config.forbidden_token_list:
+            return 'forbidden'
+        if not self.config.session_interval:
+            return 'ok'
+        now = time.time()
+        with self.lock:
+            if now - self.last_request.get(token, 0) < self.config.session_interval:
+                return 'rate_limited'
+            self.last_request[token] = now
+        return 'ok'
+
+    def record(self, kind, size):
+        with self.lock:
+            count, total = self.stat.get(kind, (0, 0))
+            self.stat[kind] = (count + 1, total + size)
+        return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        return
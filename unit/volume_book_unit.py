@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import copy
+import random
+import sys
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.book import Book
+from src.container.initialbook import InitialBook
+from src.tools.config import Config
+
+
+def legacy_volume_book(raw_book_list):
+    u"""
+    原版Book.volume_book的实现，用作分卷结果的对照
+    原版将切分剩余的分卷放回了raw_book_list的队尾（pop的另一端），导致分卷顺序颠倒，
+    与其『保证顺序不变』的注释不符，此处按原意放回队首
+    """
+
+    def split(raw_book, surplus, index=1):
+        if (raw_book.epub.answer_count <= surplus) or (raw_book.epub.article_count <= 1):
+            raw_book.epub.split_index = index
+            return [raw_book]
+        article_list = []
+        while surplus > 0:
+            article = raw_book.article_list[0]
+            raw_book.article_list = raw_book.article_list[1:]
+            article_list.append(article)
+            surplus -= article['answer_count']
+            raw_book.epub.answer_count -= article['answer_count']
+        book = copy.deepcopy(raw_book)
+        book.set_article_list(article_list)
+        book.epub.split_index = index
+        return [book] + split(raw_book, Config.max_answer, index + 1)
+
+    counter = 0
+    book = []
+    book_list = []
+    raw_book_list.reverse()
+    while len(raw_book_list):
+        raw_book = raw_book_list.pop()
+        if not raw_book.epub.answer_count:
+            continue
+        if (counter + raw_book.epub.answer_count) < Config.max_answer:
+            book.append(raw_book)
+        elif (counter + raw_book.epub.answer_count) == Config.max_answer:
+            book.append(raw_book)
+            book_list.append(book)
+            book = []
+            counter = 0
+        elif (counter + raw_book.epub.answer_count) > Config.max_answer:
+            split_list = split(raw_book, Config.max_answer - counter)
+            book.append(split_list[0])
+            book_list.append(book)
+            book = []
+            counter = 0
+            raw_book_list += reversed(split_list[1:])
+    book_list.append(book)
+    return book_list
+
+
+def create_raw_book(book_id, answer_count_list):
+    book = InitialBook()
+    book.kind = 'question'
+    book.epub.id = book_id
+    book.epub.title = book_id
+    article_list = []
+    for index, answer_count in enumerate(answer_count_list):
+        article = {
+            'article_id': '{}_{}'.format(book_id, index),
+            'answer_count': answer_count,
+            'agree_count': answer_count * 10,
+            'char_count': answer_count * 100,
+        }
+        article_list.append(article)
+    book.set_article_list(article_list)
+    return book
+
+
+def get_boundary(book_list):
+    u"""
+    将分卷结果转为[[(书id, [文章id]), ...], ...]的形式，便于比较
+    """
+    boundary = []
+    for book in book_list:
+        volume = []
+        for raw_book in book:
+            if not raw_book.article_list:
+                continue
+            volume.append((raw_book.epub.id, [article['article_id'] for article in raw_book.article_list]))
+        boundary.append(volume)
+    return boundary
+
+
+class VolumeBookTest(unittest.TestCase):
+    def setUp(self):
+        self.max_answer = Config.max_answer
+        Config.max_answer = 10
+        return
+
+    def tearDown(self):
+        Config.max_answer = self.max_answer
+        return
+
+    def assert_same_boundary(self, answer_count_table):
+        legacy = [create_raw_book(book_id, count_list) for book_id, count_list in answer_count_table]
+        current = [create_raw_book(book_id, count_list) for book_id, count_list in answer_count_table]
+        self.assertEqual(get_boundary(legacy_volume_book(legacy)), get_boundary(Book.volume_book(current)))
+        return
+
+    def test_small_book(self):
+        self.assert_same_boundary([('a', [1, 2, 3]), ('b', [1]), ('c', [])])
+        return
+
+    def test_exact_book(self):
+        self.assert_same_boundary([('a', [5, 5]), ('b', [3]), ('c', [4, 6])])
+        return
+
+    def test_single_article_overflow(self):
+        self.assert_same_boundary([('a', [1]), ('b', [25]), ('c', [2])])
+        return
+
+    def test_split_book(self):
+        self.assert_same_boundary([('a', [1] * 95), ('b', [3, 8, 2, 9, 1, 1, 14, 2]), ('c', [1] * 10)])
+        return
+
+    def test_split_index(self):
+        book_list = Book.volume_book([create_raw_book('a', [1] * 25)])
+        split_index_list = [[raw_book.epub.split_index for raw_book in book] for book in book_list]
+        self.assertEqual(split_index_list, [[1], [2], [3]])
+        self.assertEqual([book[0].epub.answer_count for book in book_list], [10, 10, 5])
+        return
+
+    def test_random_book(self):
+        generator = random.Random(20161019)
+        for _ in range(200):
+            answer_count_table = []
+            for book_index in range(generator.randint(1, 6)):
+                count_list = [generator.choice([1, 1, 1, 2, 3, 7, 12]) for _ in range(generator.randint(0, 40))]
+                answer_count_table.append(('book_{}'.format(book_index), count_list))
+            self.assert_same_boundary(answer_count_table)
+        return
+
+    def test_volume_is_shallow(self):
+        raw_book = create_raw_book('a', [1] * 25)
+        book_list = Book.volume_book([raw_book])
+        self.assertIs(book_list[1][0].article_list[0], raw_book.article_list[10])
+        self.assertIs(book_list[1][0].info, raw_book.info)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
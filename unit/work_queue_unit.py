@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# 添加库路径
+currentPath = sys.path[0].replace('unit', '')
+sys.path.append(currentPath)
+sys.path.append(currentPath + r'src')
+sys.path.append(currentPath + r'src/lib')  # 扩展库地址
+
+from src.tools.work_queue import WorkQueue
+
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def lease_all(queue_path, owner, result_queue):
+    u"""
+    在子进程中不断领取任务直至队列为空，返回领取到的任务id
+    """
+    queue = WorkQueue(queue_path)
+    id_list = []
+    while True:
+        item_list = queue.lease(owner, 3, 60)
+        if not item_list:
+            break
+        for item in item_list:
+            id_list.append(item['id'])
+            queue.ack(item['id'], owner)
+    result_queue.put(id_list)
+    return
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.queue_path = self.work_path + u'/queue.db'
+        self.queue = WorkQueue(self.queue_path, max_attempt=2)
+        return
+
+    def tearDown(self):
+        self.queue.conn.close()
+        shutil.rmtree(self.work_path)
+        return
+
+    def put(self, count, batch='batch'):
+        self.queue.put(batch, 'page', [{'kind': 'question', 'url': str(x)} for x in range(count)])
+        return
+
+    def test_lease_and_ack(self):
+        self.put(3)
+        self.put(3)  # 重复的任务只保留一个
+        item_list = self.queue.lease('a', 2, 60)
+        self.assertEqual([x['payload']['url'] for x in item_list], ['0', '1'])
+        self.assertEqual([x['payload']['url'] for x in self.queue.lease('b', 5, 60)], ['2'])
+        self.assertEqual(self.queue.lease('b', 5, 60), [])
+        for item in item_list:
+            self.queue.ack(item['id'], 'a')
+        self.assertEqual(self.queue.get_stat('batch'), {'done': 2, 'leased': 1})
+        self.assertEqual(self.queue.get_owner_stat('batch'), {'a': 2})
+        self.assertFalse(self.queue.is_finished('batch'))
+        return
+
+    def test_release(self):
+        self.put(1)
+        item = self.queue.lease('a', 1, 60)[0]
+        self.queue.release(item['id'], 'a')
+        self.assertEqual(self.queue.lease('b', 1, 60)[0]['id'], item['id'])
+        return
+
+    def test_lease_timeout(self):
+        self.put(1)
+        item = self.queue.lease('a', 1, 0.1)[0]
+        self.assertEqual(self.queue.lease('b', 1, 60), [])
+        time.sleep(0.2)
+        self.assertEqual(self.queue.lease('b', 1, 60)[0]['id'], item['id'])
+        self.queue.ack(item['id'], 'a')  # 租约已过期，原领取者的ack无效
+        self.assertEqual(self.queue.get_stat(), {'leased': 1})
+        self.queue.ack(item['id'], 'b')
+        self.assertTrue(self.queue.is_finished())
+        return
+
+    def test_max_attempt(self):
+        self.put(1)
+        for owner in ['a', 'b']:
+            item = self.queue.lease(owner, 1, 60)[0]
+            self.queue.release(item['id'], owner)
+        self.assertEqual(self.queue.lease('c', 1, 60), [])
+        self.assertEqual(self.queue.get_stat(), {'failed': 1})
+        return
+
+    def test_multi_process(self):
+        self.put(200)
+        result_queue = multiprocessing.Queue()
+        process_list = [multiprocessing.Process(target=lease_all, args=(self.queue_path, str(x), result_queue)) for x
+                        in range(4)]
+        for process in process_list:
+            process.start()
+        id_list = []
+        for _ in process_list:
+            id_list += result_queue.get()
+        for process in process_list:
+            process.join()
+        self.assertEqual(sorted(id_list), range(1, 201))
+        self.assertEqual(self.queue.get_stat(), {'done': 200})
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
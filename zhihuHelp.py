@@ -2,8 +2,10 @@
 # 放置于首位
 import sys  # 修改默认编码
 import os  # 添加系统路径
+import locale
 
-base_path = unicode(os.path.abspath('.').decode(sys.stdout.encoding))
+# 输出被重定向(nohup/systemd/写入日志文件)时sys.stdout.encoding为None，改用系统默认编码
+base_path = unicode(os.path.abspath('.').decode(sys.stdout.encoding or locale.getpreferredencoding()))
 sys.path.append(base_path + u'/src/lib')
 
 reload(sys)
@@ -13,4 +15,18 @@ sys.setrecursionlimit(100000)  # 为BS解析知乎上的长答案增加递归深
 from src.main import ZhihuHelp
 
 helper = ZhihuHelp()
-helper.start()
+command = sys.argv[1] if len(sys.argv) > 1 else ''
+if command == 'compact':
+    helper.compact()  # python zhihuHelp.py compact，整理图片池
+elif command == 'compress_content':
+    helper.migrate_content(compress=True)  # 压缩数据库中已有的正文
+elif command == 'decompress_content':
+    helper.migrate_content(compress=False)  # 还原为未压缩的正文
+elif command == 'coordinator':
+    helper.coordinate(*sys.argv[2:3])  # python zhihuHelp.py coordinator [队列文件]，分布式抓取的协调进程
+elif command == 'worker':
+    helper.work(*sys.argv[2:3])  # python zhihuHelp.py worker [队列文件]，分布式抓取的worker进程
+elif command == 'daemon':
+    helper.serve(*sys.argv[2:3])  # python zhihuHelp.py daemon [地址]，后台服务模式
+else:
+    helper.start()